@@ -0,0 +1,246 @@
+import pandas as pd
+import numpy as np
+
+import os
+import time
+import sys
+import shutil
+import tempfile
+import subprocess
+import argparse
+
+from itertools import product
+
+from xbbg.io import files, formats
+
+PKG_PATH = files.abspath(__file__, 0)
+
+CODECS = [
+    ('snappy', None),
+    ('lz4', None),
+    ('zstd', 1),
+    ('zstd', 3),
+    ('zstd', 9),
+    (None, None),
+]
+PKL_CODECS = [None, 'gzip', 'bz2', 'xz']
+
+# Import time of xbbg modules on top of heavy dependencies loaded first -
+#   pandas / numpy alone take several hundred ms and are not counted,
+#   use `--cold` (base=[]) to measure cold start including them
+IMPORT_BUDGET_MS = 100.
+BASE_MODULES = ['pandas', 'numpy']
+
+
+def sample_data(typ: str) -> pd.DataFrame:
+    """
+    Sample data for benchmarks
+
+    Args:
+        typ: bar, tick or ref
+
+    Returns:
+        pd.DataFrame
+
+    Examples:
+        >>> sample_data('bar').shape
+        (871, 6)
+        >>> sample_data('tick').shape
+        (8710, 5)
+        >>> sample_data('ref').shape
+        (505, 1)
+    """
+    data_path = f'{PKG_PATH}/tests/data'
+    if typ == 'ref':
+        return pd.read_pickle(f'{data_path}/sample_indx_members_raw.pkl')
+
+    bars = (
+        pd.concat([
+            pd.read_pickle(f'{data_path}/sample_rms_ib0.pkl'),
+            pd.read_pickle(f'{data_path}/sample_rms_ib1.pkl'),
+        ], sort=False)
+        .droplevel(axis=1, level=0)
+        .rename_axis(columns=None)
+    )
+    if typ == 'bar': return bars
+
+    # Ticks are simulated from bars - 10 ticks per bar
+    rnd = np.random.RandomState(seed=0)
+    idx = bars.index.repeat(10) + pd.to_timedelta(np.tile(np.arange(10) * 6, bars.shape[0]), unit='s')
+    return pd.DataFrame(
+        index=idx,
+        data={
+            'typ': rnd.choice(['TRADE', 'BID', 'ASK'], size=idx.size),
+            'value': bars.close.values.repeat(10) + rnd.randint(-5, 6, size=idx.size) / 10.,
+            'volume': rnd.randint(1, 500, size=idx.size),
+            'cond': rnd.choice(['', 'OL', 'AU'], size=idx.size),
+            'exch': 'FP',
+        },
+    )
+
+
+def cache_matrix(path=None, typs=None, repeat=3, **kwargs) -> pd.DataFrame:
+    """
+    Benchmark cache writer settings
+
+    Args:
+        path: folder to write test files - use the same mount as `BBG_ROOT`,
+              e.g., NFS vs local NVMe; default is a temp folder
+        typs: data types to test - [bar, tick, ref]
+        repeat: number of runs for each setting - best timing is reported
+        **kwargs:
+            codecs: list of (codec, level) for parquet files
+            pkl_codecs: list of codecs for pickle files
+            row_groups: list of row group sizes
+            downcasts: list of downcast flags
+
+    Returns:
+        pd.DataFrame: write / read time (ms) and bytes on disk for each setting
+
+    Examples:
+        >>> res = cache_matrix(
+        ...     typs=['bar', 'ref'], repeat=1,
+        ...     codecs=[('snappy', None)], pkl_codecs=[None], row_groups=[None],
+        ... )
+        >>> res.columns.tolist()
+        ['typ', 'codec', 'codec_level', 'row_group', 'downcast', 'write_ms', 'read_ms', 'bytes']
+        >>> res.typ.tolist()
+        ['bar', 'bar', 'ref', 'ref']
+    """
+    if typs is None: typs = ['bar', 'tick', 'ref']
+    tmp_path = path if path else tempfile.mkdtemp(prefix='xbbg_bench_')
+    files.create_folder(tmp_path)
+
+    res = []
+    try:
+        for typ in typs:
+            data = sample_data(typ=typ)
+            if typ == 'ref':
+                settings = product(
+                    [(c, None) for c in kwargs.get('pkl_codecs', PKL_CODECS)],
+                    [None], kwargs.get('downcasts', [False, True]),
+                )
+            else:
+                settings = product(
+                    kwargs.get('codecs', CODECS),
+                    kwargs.get('row_groups', [None, 60]),
+                    kwargs.get('downcasts', [False, True]),
+                )
+            for (codec, level), row_group, down in settings:
+                res.append(dict(
+                    typ=typ, codec=codec, codec_level=level,
+                    row_group=row_group, downcast=down,
+                    **_time_io_(
+                        data=data, path=tmp_path, ext='pkl' if typ == 'ref' else 'parq',
+                        repeat=repeat, codec=codec, codec_level=level,
+                        pkl_codec=codec, row_group=row_group, downcast=down,
+                    ),
+                ))
+    finally:
+        if not path: shutil.rmtree(tmp_path, ignore_errors=True)
+
+    return pd.DataFrame(res)
+
+
+def _time_io_(data: pd.DataFrame, path: str, ext: str, repeat=3, **kwargs) -> dict:
+    """
+    Best write / read timing of given settings
+    """
+    data_file = f'{path}/bench.{ext}'
+    write_ms, read_ms = [], []
+    for _ in range(max(repeat, 1)):
+        t0 = time.perf_counter()
+        if ext == 'pkl': formats.save_pickle(data=data, data_file=data_file, **kwargs)
+        else: formats.save_parquet(data=data, data_file=data_file, **kwargs)
+        t1 = time.perf_counter()
+        if ext == 'pkl': formats.load_pickle(data_file)
+        else: pd.read_parquet(data_file)
+        t2 = time.perf_counter()
+        write_ms.append((t1 - t0) * 1e3)
+        read_ms.append((t2 - t1) * 1e3)
+
+    size = os.path.getsize(data_file)
+    os.remove(data_file)
+    return dict(write_ms=min(write_ms), read_ms=min(read_ms), bytes=size)
+
+
+def import_time(module='xbbg.blp', base=None, repeat=3) -> pd.DataFrame:
+    """
+    Import time of module in fresh interpreters (`python -X importtime`) -
+    base modules are imported beforehand and not counted
+
+    Args:
+        module: module to import
+        base: modules imported beforehand - default `BASE_MODULES`, [] for cold start
+        repeat: number of runs - best timing is reported
+
+    Returns:
+        pd.DataFrame: self / total import time (ms) of each module imported,
+            sorted by total time
+
+    Examples:
+        >>> res = import_time(repeat=1)
+        >>> res.columns.tolist()
+        ['self_ms', 'total_ms']
+        >>> res.index[0]
+        'xbbg.blp'
+        >>> print(f'{res.total_ms.iloc[0]:.1f}ms')  # doctest: +SKIP
+        13.9ms
+        >>> 'pytest' in res.index
+        False
+    """
+    if base is None: base = BASE_MODULES
+    code = '; '.join([f'import {mod}' for mod in base] + ['import sys', 'sys.stderr.write("|--|\\n")'])
+    res = []
+    for _ in range(max(repeat, 1)):
+        out = subprocess.run(
+            [sys.executable, '-X', 'importtime', '-c', f'{code}; import {module}'],
+            stderr=subprocess.PIPE, universal_newlines=True, check=True,
+        ).stderr
+        rows = []
+        for line in out.split('|--|')[-1].splitlines():
+            if not line.startswith('import time:'): continue
+            cols = line[len('import time:'):].split('|')
+            if not cols[0].strip().isdigit(): continue
+            rows.append(dict(
+                module=cols[2].strip(),
+                self_ms=int(cols[0]) / 1e3,
+                total_ms=int(cols[1]) / 1e3,
+            ))
+        res.append(pd.DataFrame(rows, columns=['module', 'self_ms', 'total_ms']).set_index('module'))
+
+    return (
+        pd.concat(res)
+        .groupby(level=0).min()
+        .sort_values('total_ms', ascending=False)
+    )
+
+
+def main():
+
+    parser = argparse.ArgumentParser(description='xbbg benchmarks')
+    parser.add_argument('--path', default=None, help='folder to write test files')
+    parser.add_argument('--repeat', type=int, default=3, help='runs per setting')
+    parser.add_argument('--import-time', action='store_true', help='benchmark import time instead')
+    parser.add_argument('--budget', type=float, default=IMPORT_BUDGET_MS, help='import time budget (ms)')
+    parser.add_argument('--cold', action='store_true', help='count pandas / numpy in import time')
+    args = parser.parse_args()
+
+    pd.options.display.width = 120
+    pd.options.display.max_rows = 500
+    if args.import_time:
+        res = import_time(base=[] if args.cold else None, repeat=args.repeat)
+        print(res.head(30).to_string())
+        total = res.total_ms.iloc[0]
+        print(f'\n{res.index[0]}: {total:.1f}ms (budget {args.budget:.0f}ms)')
+        sys.exit(int(total > args.budget))
+    print(cache_matrix(path=args.path, repeat=args.repeat).to_string(index=False))
+
+
+if __name__ == '__main__':
+
+    # Example:
+    #   python -m xbbg.bench --path=/mnt/nfs/tmp
+    #   python -m xbbg.bench --import-time
+    #   python -m xbbg.bench --import-time --cold --budget=1000
+    main()
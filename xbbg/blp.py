@@ -1,12 +1,13 @@
 import pandas as pd
+import numpy as np
 
 from functools import partial
 from itertools import product
 from contextlib import contextmanager
 
-from xbbg import __version__, const, pipeline
-from xbbg.io import logs, files, storage
-from xbbg.core import utils, conn, process
+from xbbg import __version__, const, pipeline, server
+from xbbg.io import logs, storage, backends
+from xbbg.core import utils, conn, process, trials, sessions, timezone
 from xbbg.core.conn import connect
 
 __all__ = [
@@ -41,9 +42,16 @@ def bdp(tickers, flds, **kwargs) -> pd.DataFrame:
     """
     logger = logs.get_logger(bdp, **kwargs)
 
+    shared = server.query('bdp', tickers=tickers, flds=flds, **kwargs)
+    if shared is not None: return shared
+
     if isinstance(tickers, str): tickers = [tickers]
     if isinstance(flds, str): flds = [flds]
 
+    empty = trials.no_data(func='bdp', tickers=tickers, flds=flds, **kwargs)
+    tickers = [t for t in tickers if any((t, fld) not in empty for fld in flds)]
+    if not tickers: return pd.DataFrame()
+
     request = process.create_request(
         service='//blp/refdata',
         request='ReferenceDataRequest',
@@ -53,8 +61,14 @@ def bdp(tickers, flds, **kwargs) -> pd.DataFrame:
     logger.debug(f'Sending request to Bloomberg ...\n{request}')
     conn.send_request(request=request, **kwargs)
 
-    res = pd.DataFrame(process.rec_events(func=process.process_ref, **kwargs))
+    status = dict()
+    res = pd.DataFrame(process.rec_events(func=process.process_ref, status=status, **kwargs))
     if kwargs.get('raw', False): return res
+    # Only complete responses tell that data is not available
+    if status['complete'] and kwargs.get('empty_ttl', trials.EMPTY_TTL):
+        trials.update_no_data(
+            func='bdp', pairs=trials.empty_pairs(tickers=tickers, flds=flds, data=res), **kwargs
+        )
     if res.empty or any(fld not in res for fld in ['ticker', 'field']):
         return pd.DataFrame()
 
@@ -84,6 +98,9 @@ def bds(tickers, flds, use_port=False, **kwargs) -> pd.DataFrame:
     """
     logger = logs.get_logger(bds, **kwargs)
 
+    shared = server.query('bds', tickers=tickers, flds=flds, use_port=use_port, **kwargs)
+    if shared is not None: return shared
+
     part = partial(_bds_, fld=flds, logger=logger, use_port=use_port, **kwargs)
     if isinstance(tickers, str): tickers = [tickers]
     return pd.DataFrame(pd.concat(map(part, tickers), sort=False))
@@ -101,35 +118,48 @@ def _bds_(
     """
     if 'has_date' not in kwargs: kwargs['has_date'] = True
     data_file = storage.ref_file(ticker=ticker, fld=fld, ext='pkl', **kwargs)
-    if files.exists(data_file):
+    cache_backend = backends.current()
+    if cache_backend.exists(data_file):
         logger.debug(f'Loading Bloomberg data from: {data_file}')
-        return pd.DataFrame(pd.read_pickle(data_file))
+        return cache_backend.get(data_file)
 
-    request = process.create_request(
-        service='//blp/refdata',
-        request='PortfolioDataRequest' if use_port else 'ReferenceDataRequest',
-        **kwargs,
-    )
-    process.init_request(request=request, tickers=ticker, flds=fld, **kwargs)
-    logger.debug(f'Sending request to Bloomberg ...\n{request}')
-    conn.send_request(request=request, **kwargs)
-
-    res = pd.DataFrame(process.rec_events(func=process.process_ref, **kwargs))
-    if kwargs.get('raw', False): return res
-    if res.empty or any(fld not in res for fld in ['ticker', 'field']):
+    if trials.no_data(func='bds', tickers=[ticker], flds=[fld], **kwargs):
+        logger.debug(f'No data for {ticker} / {fld} in previous queries')
         return pd.DataFrame()
 
-    data = (
-        res
-        .set_index(['ticker', 'field'])
-        .droplevel(axis=0, level=1)
-        .rename_axis(index=None)
-        .pipe(pipeline.standard_cols, col_maps=kwargs.get('col_maps', None))
-    )
-    if data_file:
-        logger.debug(f'Saving Bloomberg data to: {data_file}')
-        files.create_folder(data_file, is_file=True)
-        data.to_pickle(data_file)
+    with cache_backend.lock(data_file, **kwargs):
+        # Data may be saved by other processes while waiting for the lock
+        if cache_backend.exists(data_file):
+            logger.debug(f'Loading Bloomberg data from: {data_file}')
+            return cache_backend.get(data_file)
+
+        request = process.create_request(
+            service='//blp/refdata',
+            request='PortfolioDataRequest' if use_port else 'ReferenceDataRequest',
+            **kwargs,
+        )
+        process.init_request(request=request, tickers=ticker, flds=fld, **kwargs)
+        logger.debug(f'Sending request to Bloomberg ...\n{request}')
+        conn.send_request(request=request, **kwargs)
+
+        status = dict()
+        res = pd.DataFrame(process.rec_events(func=process.process_ref, status=status, **kwargs))
+        if kwargs.get('raw', False): return res
+        if res.empty or any(fld not in res for fld in ['ticker', 'field']):
+            if status['complete']: trials.update_no_data(func='bds', pairs=[(ticker, fld)], **kwargs)
+            return pd.DataFrame()
+
+        data = (
+            res
+            .set_index(['ticker', 'field'])
+            .droplevel(axis=0, level=1)
+            .rename_axis(index=None)
+            .pipe(pipeline.standard_cols, col_maps=kwargs.get('col_maps', None))
+        )
+        if data_file:
+            logger.debug(f'Saving Bloomberg data to: {data_file}')
+            cache_backend.put(data_file, data, **kwargs)
+            storage.index_key(storage.ref_key(**kwargs), **kwargs)
 
     return data
 
@@ -159,25 +189,45 @@ def bdh(
     """
     logger = logs.get_logger(bdh, **kwargs)
 
+    shared = server.query(
+        'bdh', tickers=tickers, flds=flds, start_date=start_date,
+        end_date=end_date, adjust=adjust, **kwargs,
+    )
+    if shared is not None: return shared
+
     if flds is None: flds = ['Last_Price']
     e_dt = utils.fmt_dt(end_date, fmt='%Y%m%d')
     if start_date is None: start_date = pd.Timestamp(e_dt) - pd.Timedelta(weeks=8)
     s_dt = utils.fmt_dt(start_date, fmt='%Y%m%d')
 
+    empty_kw = dict(func='bdh', start_dt=s_dt, end_dt=e_dt, adjust=adjust, **kwargs)
+    empty = trials.no_data(tickers=tickers, flds=flds, **empty_kw)
+    q_tickers = [
+        t for t in utils.flatten(tickers)
+        if any((t, fld) not in empty for fld in utils.flatten(flds))
+    ]
+    if not q_tickers: return pd.DataFrame()
+
     request = process.create_request(
         service='//blp/refdata',
         request='HistoricalDataRequest',
         **kwargs,
     )
     process.init_request(
-        request=request, tickers=tickers, flds=flds,
+        request=request, tickers=q_tickers, flds=flds,
         start_date=s_dt, end_date=e_dt, adjust=adjust, **kwargs
     )
     logger.debug(f'Sending request to Bloomberg ...\n{request}')
     conn.send_request(request=request, **kwargs)
 
-    res = pd.DataFrame(process.rec_events(process.process_hist, **kwargs))
+    status = dict()
+    res = pd.DataFrame(process.rec_events(process.process_hist, status=status, **kwargs))
     if kwargs.get('raw', False): return res
+    if status['complete'] and kwargs.get('empty_ttl', trials.EMPTY_TTL):
+        trials.update_no_data(
+            pairs=trials.empty_pairs(tickers=q_tickers, flds=flds, data=_hist_fields_(res)),
+            **empty_kw,
+        )
     if res.empty or any(fld not in res for fld in ['ticker', 'date']):
         return pd.DataFrame()
 
@@ -192,6 +242,16 @@ def bdh(
     )
 
 
+def _hist_fields_(res: pd.DataFrame) -> pd.DataFrame:
+    """
+    Tickers and fields with data in raw historical results
+    """
+    if res.empty or any(col not in res for col in ['ticker', 'date']):
+        return pd.DataFrame(columns=['ticker', 'field'])
+    cnt = res.drop(columns='date').groupby('ticker').count().stack()
+    return cnt[cnt > 0].rename_axis(['ticker', 'field']).reset_index()[['ticker', 'field']]
+
+
 def bdib(ticker: str, dt, session='allday', typ='TRADE', **kwargs) -> pd.DataFrame:
     """
     Bloomberg intraday bar data
@@ -210,24 +270,21 @@ def bdib(ticker: str, dt, session='allday', typ='TRADE', **kwargs) -> pd.DataFra
     Returns:
         pd.DataFrame
     """
-    from xbbg.core import trials
-
     logger = logs.get_logger(bdib, **kwargs)
 
     ex_info = const.exch_info(ticker=ticker, **kwargs)
     if ex_info.empty: raise KeyError(f'Cannot find exchange info for {ticker}')
+    # No requests (or trials) for weekends and holidays in batch mode
+    if kwargs.get('batch', False) and (not sessions.is_trading_day(exch=ex_info.name, dt=dt)):
+        logger.info(f'{ex_info.name} is not trading on {pd.Timestamp(dt):%Y-%m-%d} ...')
+        return pd.DataFrame()
 
     ss_rng = process.time_range(dt=dt, ticker=ticker, session=session, tz=ex_info.tz, **kwargs)
     data_file = storage.bar_file(ticker=ticker, dt=dt, typ=typ)
-    if files.exists(data_file) and kwargs.get('cache', True) and (not kwargs.get('reload', False)):
-        res = (
-            pd.read_parquet(data_file)
-            .pipe(pipeline.add_ticker, ticker=ticker)
-            .loc[ss_rng[0]:ss_rng[1]]
-        )
-        if not res.empty:
-            logger.debug(f'Loading Bloomberg intraday data from: {data_file}')
-            return res
+    use_cache = kwargs.get('cache', True) and (not kwargs.get('reload', False))
+    if use_cache:
+        res = _load_bars_(data_file=data_file, ticker=ticker, ss_rng=ss_rng, tz=ex_info.tz, logger=logger)
+        if not res.empty: return res
 
     if not process.check_current(dt=dt, logger=logger, **kwargs): return pd.DataFrame()
 
@@ -243,48 +300,68 @@ def bdib(ticker: str, dt, session='allday', typ='TRADE', **kwargs) -> pd.DataFra
 
     info_log = f'{q_tckr} / {cur_dt} / {typ}'
     trial_kw = dict(ticker=ticker, dt=dt, typ=typ, func='bdib')
-    num_trials = trials.num_trials(**trial_kw)
-    if num_trials >= 2:
-        if kwargs.get('batch', False): return pd.DataFrame()
-        logger.info(f'{num_trials} trials with no data {info_log}')
-        return pd.DataFrame()
+    with backends.current().lock(data_file, **kwargs):
+        # Data may be saved by other processes while waiting for the lock
+        if use_cache:
+            res = _load_bars_(data_file=data_file, ticker=ticker, ss_rng=ss_rng, tz=ex_info.tz, logger=logger)
+            if not res.empty: return res
+
+        num_trials = trials.num_trials(**trial_kw)
+        if num_trials >= trials.MAX_TRIALS:
+            if kwargs.get('batch', False): return pd.DataFrame()
+            logger.info(f'{num_trials} trials with no data {info_log}')
+            return pd.DataFrame()
+
+        while conn.bbg_session(**kwargs).tryNextEvent(): pass
+        time_rng = process.time_range(dt=dt, ticker=ticker, session='allday', **kwargs)
+        request = process.create_request(
+            service='//blp/refdata',
+            request='IntradayBarRequest',
+            settings=[
+                ('security', ticker),
+                ('eventType', typ),
+                ('interval', kwargs.get('interval', 1)),
+                ('startDateTime', time_rng[0]),
+                ('endDateTime', time_rng[1]),
+            ],
+            **kwargs,
+        )
+        logger.debug(f'Sending request to Bloomberg ...\n{request}')
+        conn.send_request(request=request, **kwargs)
+
+        res = pd.DataFrame(process.rec_events(func=process.process_bar, **kwargs))
+        if res.empty or ('time' not in res):
+            logger.warning(f'No data for {info_log} ...')
+            trials.update_trials(cnt=num_trials + 1, **trial_kw)
+            return pd.DataFrame()
+
+        data = (
+            res
+            .set_index('time')
+            .rename_axis(index=None)
+            .rename(columns={'numEvents': 'num_trds'})
+            .pipe(timezone.tz_convert_many, to_tz=ex_info.tz, from_tz='UTC')
+            .pipe(pipeline.add_ticker, ticker=ticker)
+        )
+        if kwargs.get('cache', True):
+            storage.save_intraday(data=data[ticker], ticker=ticker, dt=dt, typ=typ, **kwargs)
 
-    while conn.bbg_session(**kwargs).tryNextEvent(): pass
-    time_rng = process.time_range(dt=dt, ticker=ticker, session='allday', **kwargs)
-    request = process.create_request(
-        service='//blp/refdata',
-        request='IntradayBarRequest',
-        settings=[
-            ('security', ticker),
-            ('eventType', typ),
-            ('interval', kwargs.get('interval', 1)),
-            ('startDateTime', time_rng[0]),
-            ('endDateTime', time_rng[1]),
-        ],
-        **kwargs,
-    )
-    logger.debug(f'Sending request to Bloomberg ...\n{request}')
-    conn.send_request(request=request, **kwargs)
+    return data.loc[ss_rng[0]:ss_rng[1]]
 
-    res = pd.DataFrame(process.rec_events(func=process.process_bar, **kwargs))
-    if res.empty or ('time' not in res):
-        logger.warning(f'No data for {info_log} ...')
-        trials.update_trials(cnt=num_trials + 1, **trial_kw)
-        return pd.DataFrame()
 
-    data = (
-        res
-        .set_index('time')
-        .rename_axis(index=None)
-        .rename(columns={'numEvents': 'num_trds'})
-        .tz_localize('UTC')
-        .tz_convert(ex_info.tz)
+def _load_bars_(data_file: str, ticker: str, ss_rng, tz, logger) -> pd.DataFrame:
+    """
+    Load intraday bars within session from cache
+    """
+    cache_backend = backends.current()
+    if not cache_backend.exists(data_file): return pd.DataFrame()
+    res = (
+        cache_backend.get(data_file, start=ss_rng[0], end=ss_rng[1], tz=tz)
         .pipe(pipeline.add_ticker, ticker=ticker)
     )
-    if kwargs.get('cache', True):
-        storage.save_intraday(data=data[ticker], ticker=ticker, dt=dt, typ=typ, **kwargs)
-
-    return data.loc[ss_rng[0]:ss_rng[1]]
+    if not res.empty:
+        logger.debug(f'Loading Bloomberg intraday data from: {data_file}')
+    return res
 
 
 def bdtick(ticker, dt, session='allday', time_range=None, types=None, **kwargs) -> pd.DataFrame:
@@ -313,15 +390,10 @@ def bdtick(ticker, dt, session='allday', time_range=None, types=None, **kwargs)
 
     if isinstance(time_range, (tuple, list)) and (len(time_range) == 2):
         cur_dt = pd.Timestamp(dt).strftime('%Y-%m-%d')
-        time_rng = (
-            pd.DatetimeIndex([
-                f'{cur_dt} {time_range[0]}',
-                f'{cur_dt} {time_range[1]}',
-            ])
-            .tz_localize(exch.tz)
-            .tz_convert(process.DEFAULT_TZ)
-            .tz_convert('UTC')
-        )
+        time_rng = timezone.tz_convert_many([
+            f'{cur_dt} {time_range[0]}',
+            f'{cur_dt} {time_range[1]}',
+        ], to_tz='UTC', from_tz=exch.tz)
     else:
         time_rng = process.time_range(dt=dt, ticker=ticker, session=session, **kwargs)
 
@@ -357,8 +429,7 @@ def bdtick(ticker, dt, session='allday', time_range=None, types=None, **kwargs)
         res
         .set_index('time')
         .rename_axis(index=None)
-        .tz_localize('UTC')
-        .tz_convert(exch.tz)
+        .pipe(timezone.tz_convert_many, to_tz=exch.tz, from_tz='UTC')
         .pipe(pipeline.add_ticker, ticker=ticker)
         .rename(columns={
             'size': 'volume',
@@ -696,7 +767,8 @@ def fut_ticker(gen_ticker: str, dt, freq: str, **kwargs) -> str:
 
 def adjust_ccy(data: pd.DataFrame, ccy: str = 'USD') -> pd.DataFrame:
     """
-    Adjust
+    Adjust - FX rates of all currencies are downloaded in one request
+    and applied to all tickers at once
 
     Args:
         data: daily price / turnover / etc. to adjust
@@ -708,46 +780,61 @@ def adjust_ccy(data: pd.DataFrame, ccy: str = 'USD') -> pd.DataFrame:
     if data.empty: return pd.DataFrame()
     if ccy.lower() == 'local': return data
     tickers = data.columns.get_level_values(level=0).unique()
-    start_date = data.index[0]
-    end_date = data.index[-1]
 
+    # Product of fields of each ticker - missing if any field is missing
+    values = np.ones((data.shape[0], tickers.size))
+    np.multiply.at(
+        values.T, tickers.get_indexer(data.columns.get_level_values(level=0)),
+        data.to_numpy(dtype=float).T,
+    )
+
+    # FX pairs and factors of each ticker - resolved once per currency
+    pairs, factors = np.full(tickers.size, '', dtype=object), np.ones(tickers.size)
     uccy = bdp(tickers=tickers, flds='crncy')
     if not uccy.empty:
-        adj = (
-            uccy.crncy
-            .map(lambda v: {
-                'ccy': None if v.upper() == ccy else f'{ccy}{v.upper()} Curncy',
-                'factor': 100. if v[-1].islower() else 1.,
-            })
-            .apply(pd.Series)
-            .dropna(subset=['ccy'])
-        )
-    else: adj = pd.DataFrame()
-
-    if not adj.empty:
+        local = uccy.crncy.reindex(tickers)
+        for cur in local.dropna().unique():
+            if cur.upper() == ccy: continue
+            is_cur = (local == cur).to_numpy()
+            pairs[is_cur] = f'{ccy}{cur.upper()} Curncy'
+            factors[is_cur] = 100. if cur[-1].islower() else 1.
+
+    index = data.index[~np.isnan(values).all(axis=1)]
+    to_adj = pairs != ''
+    if to_adj.any():
         fx = (
-            bdh(tickers=adj.ccy.unique(), start_date=start_date, end_date=end_date)
+            bdh(tickers=pd.unique(pairs[to_adj]), start_date=data.index[0], end_date=data.index[-1])
             .xs('Last_Price', axis=1, level=1)
         )
-    else: fx = pd.DataFrame()
+        index = index.union(fx.index)
+        fx = fx.reindex(index=index, columns=pairs[to_adj]).to_numpy(dtype=float)
 
-    return (
-        pd.concat([
-            pd.Series(
-                (
-                    data[t]
-                    .dropna()
-                    .prod(axis=1)
-                    .div(
-                        (fx[adj.loc[t, 'ccy']] * adj.loc[t, 'factor'])
-                        if t in adj.index else 1.,
-                    )
-                ),
-                name=t,
-            )
-            for t in tickers
-        ], axis=1)
-    )
+    pos = data.index.get_indexer(index)
+    values = values[pos]
+    values[pos < 0] = np.nan
+    divisor = np.ones(values.shape)
+    if to_adj.any(): divisor[:, to_adj] = fx * factors[to_adj]
+    return pd.DataFrame(values / divisor, index=index, columns=tickers)
+
+
+def _has_data_(data: pd.DataFrame, tickers, fld: str) -> list:
+    """
+    Tickers with any value of field in historical data -
+    columns of all NaN values (from tickers without data) do not count
+
+    Examples:
+        >>> panel_ = pd.DataFrame({
+        ...     ('AAA US Equity', 'Turnover'): [1e6, 2e6],
+        ...     ('BBB US Equity', 'Turnover'): [np.nan, np.nan],
+        ...     ('BBB US Equity', 'volume'): [100., 200.],
+        ... }, index=pd.to_datetime(['2020-01-02', '2020-01-03']))
+        >>> _has_data_(panel_, tickers=['AAA US Equity', 'BBB US Equity', 'CCC US Equity'], fld='Turnover')
+        ['AAA US Equity']
+    """
+    if data.empty: return []
+    found = data.loc[:, data.columns.get_level_values(level=1) == fld].notna().any()
+    found = set(found.index[found].get_level_values(level=0))
+    return [t for t in tickers if t in found]
 
 
 def turnover(
@@ -779,21 +866,22 @@ def turnover(
     if isinstance(tickers, str): tickers = [tickers]
 
     data = bdh(tickers=tickers, flds=flds, start_date=start_date, end_date=end_date)
-    cols = data.columns.get_level_values(level=0).unique()
 
-    # If turnover is not available, use volume and vwap for calculation
-    use_volume = pd.DataFrame()
+    # If turnover is not available, use volume and vwap for calculation -
+    #   only requested for tickers without turnover
     if isinstance(flds, str) and (flds.lower() == 'turnover'):
-        vol_tcks = [t for t in tickers if t not in cols]
+        trd_tcks = _has_data_(data=data, tickers=tickers, fld=flds)
+        has_trd = set(trd_tcks)
+        vol_tcks = [t for t in tickers if t not in has_trd]
+        vol_data = pd.DataFrame()
         if vol_tcks:
-            use_volume = turnover(
-                tickers=vol_tcks,
-                flds=['eqy_weighted_avg_px', 'volume'],
-                start_date=start_date,
-                end_date=end_date,
-                ccy=ccy,
-                factor=factor,
+            vol_data = bdh(
+                tickers=vol_tcks, flds=['eqy_weighted_avg_px', 'volume'],
+                start_date=start_date, end_date=end_date,
             )
+        parts = [data.loc[:, [(t, flds) for t in trd_tcks]]] if trd_tcks else []
+        if not vol_data.empty: parts.append(vol_data)
+        data = pd.concat(parts, axis=1).dropna(how='all') if parts else pd.DataFrame()
 
-    if data.empty and use_volume.empty: return pd.DataFrame()
-    return pd.concat([adjust_ccy(data=data, ccy=ccy).div(factor), use_volume], axis=1)
+    if data.empty: return pd.DataFrame()
+    return adjust_ccy(data=data, ccy=ccy).div(factor)
@@ -1,5 +1,6 @@
 import pandas as pd
 
+from types import MappingProxyType
 from collections import namedtuple
 from xbbg.core import timezone
 from xbbg.io import files, logs, param
@@ -10,15 +11,12 @@ Futures = dict(
 )
 CurrencyPair = namedtuple('CurrencyPair', ['ticker', 'factor', 'power'])
 ValidSessions = ['allday', 'day', 'am', 'pm', 'night', 'pre', 'post']
+# Trading calendar of exchanges - see `sessions.trading_calendar`
+CalendarKeys = ['weekmask', 'holidays', 'calendar']
 
 PKG_PATH = files.abspath(__file__, 0)
 
-ASSET_INFO = {
-    'Index': ['tickers'],
-    'Comdty': ['tickers', 'key_month'],
-    'Curncy': ['tickers'],
-    'Equity': ['exch_codes'],
-}
+ASSET_INFO = param.ASSET_INFO
 
 DVD_TPYES = {
     'all': 'DVD_Hist_All',
@@ -164,38 +162,76 @@ def exch_info(ticker: str, **kwargs) -> pd.Series:
     if kwargs.get('ref', ''):
         return exch_info(ticker=kwargs['ref'], **{k: v for k, v in kwargs.items() if k != 'ref'})
 
-    exch = kwargs.get('config', param.load_config(cat='exch'))
+    res = resolver()
+    exch = compile_exch(kwargs['config']) if 'config' in kwargs else res.exch
     original = kwargs.get('original', '')
 
     # Case 1: Use exchange directly
-    if ticker in exch.index:
-        info = exch.loc[ticker].dropna()
+    if ticker in exch:
+        info = exch[ticker]
 
         # Check required info
-        if info.reindex(['allday', 'tz']).dropna().size < 2:
+        if info.empty:
             logger.error(
                 f'required info (allday + tz) cannot be found in '
                 f'{original if original else ticker} ...'
             )
-            return pd.Series(dtype=object)
-
-        # Fill day session info if not provided
-        if 'day' not in info:
-            info['day'] = info['allday']
-
-        return info.dropna().apply(param.to_hours)
+        return info.copy()
 
     if original:
         logger.error(f'exchange info cannot be found in {original} ...')
         return pd.Series(dtype=object)
 
     # Case 2: Use ticker to find exchange
-    exch_name = market_info(ticker=ticker).get('exch', '')
+    exch_name = res.exch_name(ticker=ticker)
     if not exch_name: return pd.Series(dtype=object)
     return exch_info(
         ticker=exch_name,
         original=ticker,
-        config=exch,
+        **{k: v for k, v in kwargs.items() if k == 'config'},
+    )
+
+
+def exch_info_many(tickers, ref=None) -> pd.DataFrame:
+    """
+    Exchange info for many tickers at once
+
+    Args:
+        tickers: list of tickers or exchanges
+        ref: reference ticker or exchange - str for all tickers or dict of ticker -> ref
+
+    Returns:
+        pd.DataFrame: one row per ticker with exchange name, tz and sessions -
+            empty exchange name if not found
+
+    Examples:
+        >>> exch_info_many([
+        ...     'SPY US Equity', 'ES1 Index', 'ESM0 Index', 'TESTTICKER Corp', 'US',
+        ... ], ref={'ESM0 Index': 'ES1 Index'}).loc[:, ['exch', 'tz', 'day']]
+                             exch                tz             day
+        SPY US Equity    EquityUS  America/New_York  [09:30, 16:00]
+        ES1 Index             CME  America/New_York  [08:00, 17:00]
+        ESM0 Index            CME  America/New_York  [08:00, 17:00]
+        TESTTICKER Corp                         NaN             NaN
+        US               EquityUS  America/New_York  [09:30, 16:00]
+    """
+    if isinstance(tickers, str): tickers = [tickers]
+    if not isinstance(ref, dict): ref = dict.fromkeys(tickers, ref)
+
+    res = resolver()
+    names = dict()
+    for ticker in tickers:
+        if ticker in names: continue
+        key = ref.get(ticker) or ticker
+        names[ticker] = key if key in res.exch else res.exch_name(ticker=key)
+
+    exch = [names[ticker] for ticker in tickers]
+    return (
+        res.exch_table
+        .reindex(exch)
+        .set_axis(tickers, axis=0)
+        .assign(exch=exch)
+        .pipe(lambda df: df.loc[:, ['exch'] + [c for c in df.columns if c != 'exch']])
     )
 
 
@@ -227,40 +263,143 @@ def market_info(ticker: str) -> pd.Series:
         >>> pd.concat([market_info(_) for _ in incorrect_tickers])
         Series([], dtype: object)
     """
-    t_info = ticker.split()
-    exch_only = len(ticker) == 2
-    if (not exch_only) and (t_info[-1] not in ['Equity', 'Comdty', 'Curncy', 'Index']):
-        return pd.Series(dtype=object)
+    info = resolver().market_row(ticker=ticker)
+    if info is None: return pd.Series(dtype=object)
+    return info.copy()
 
-    a_info = asset_config(asset='Equity' if exch_only else t_info[-1])
 
-    # =========================================== #
-    #           Equity / Equity Futures           #
-    # =========================================== #
+class Resolver(object):
+    """
+    Ticker to exchange resolver compiled from asset and exchange configs,
+    with dict indices on exchange codes (equities) and tickers (other assets)
 
-    if (t_info[-1] == 'Equity') or exch_only:
-        is_fut = '==' if '=' in ticker else '!='
-        exch_sym = ticker if exch_only else t_info[-2]
-        return take_first(
-            data=a_info,
-            query=f'exch_codes == "{exch_sym}" and is_fut {is_fut} True',
+    Examples:
+        >>> res_ = resolver()
+        >>> res_.exch_name('7974 JT Equity'), res_.exch_name('ES1 Index')
+        ('EquityJapan', 'CME')
+        >>> res_.exch_name('ICICIC=1 IS Equity'), res_.exch_name('XYZ Index')
+        ('EquityFuturesIndia', '')
+        >>> res_ is resolver()
+        True
+    """
+
+    def __init__(self, assets: dict, exch: pd.DataFrame):
+        """
+        Args:
+            assets: asset -> config from `asset_config`
+            exch: exchange config from `param.load_config('exch')`
+        """
+        self.assets = assets
+        self.exch = MappingProxyType(compile_exch(exch))
+        self.exch_table = pd.DataFrame.from_dict(
+            {name: info.to_dict() for name, info in self.exch.items() if not info.empty},
+            orient='index',
         )
 
-    # ================================================ #
-    #           Currency / Commodity / Index           #
-    # ================================================ #
-
-    if t_info[0] in a_info.tickers.values:
-        symbol = t_info[0]
-    elif t_info[0][-1].isdigit():
-        end_idx = 2 if t_info[-2].isdigit() else 1
-        symbol = t_info[0][:-end_idx].strip()
-        # Special contracts
-        if (symbol[:2] == 'UX') and (t_info[-1] == 'Index'):
-            symbol = 'UX'
-    else:
-        symbol = t_info[0].split('+')[0]
-    return take_first(data=a_info, query=f'tickers == "{symbol}"')
+        # Equities: (exchange code, is futures) -> info
+        self._codes_ = dict()
+        # Other assets: asset -> ticker -> info
+        self._tickers_ = dict()
+        for asset, config in assets.items():
+            if config.empty: continue
+            rows = [row.rename(0) for _, row in config.iterrows()]
+            if asset == 'Equity':
+                for row in rows:
+                    key = (row.get('exch_codes'), _is_true_(row.get('is_fut')))
+                    self._codes_.setdefault(key, row)
+            else:
+                idx = self._tickers_.setdefault(asset, dict())
+                for row in rows: idx.setdefault(row.get('tickers'), row)
+        self._codes_ = MappingProxyType(self._codes_)
+        self._tickers_ = MappingProxyType({
+            asset: MappingProxyType(idx) for asset, idx in self._tickers_.items()
+        })
+
+    def market_row(self, ticker: str):
+        """
+        Asset config of ticker - see `market_info`
+
+        Returns:
+            pd.Series or None if not found
+        """
+        t_info = ticker.split()
+        exch_only = len(ticker) == 2
+        if (not exch_only) and (t_info[-1] not in ['Equity', 'Comdty', 'Curncy', 'Index']):
+            return None
+
+        # Equity / Equity Futures
+        if (t_info[-1] == 'Equity') or exch_only:
+            exch_sym = ticker if exch_only else t_info[-2]
+            return self._codes_.get((exch_sym, '=' in ticker))
+
+        # Currency / Commodity / Index
+        idx = self._tickers_.get(t_info[-1], dict())
+        if t_info[0] in idx:
+            symbol = t_info[0]
+        elif t_info[0][-1].isdigit():
+            end_idx = 2 if t_info[-2].isdigit() else 1
+            symbol = t_info[0][:-end_idx].strip()
+            # Special contracts
+            if (symbol[:2] == 'UX') and (t_info[-1] == 'Index'):
+                symbol = 'UX'
+        else:
+            symbol = t_info[0].split('+')[0]
+        return idx.get(symbol)
+
+    def exch_name(self, ticker: str) -> str:
+        """
+        Exchange name of ticker - empty if not found
+        """
+        info = self.market_row(ticker=ticker)
+        if info is None: return ''
+        exch = info.get('exch', '')
+        return exch if isinstance(exch, str) else ''
+
+
+def _is_true_(value) -> bool:
+    """
+    Flag of config value - numpy bools from YAML / DataFrame rows
+    count as well, missing values do not
+
+    Examples:
+        >>> import numpy as np
+        >>>
+        >>> _is_true_(np.bool_(True)), _is_true_(True), _is_true_(np.nan), _is_true_(None)
+        (True, True, False, False)
+    """
+    return (value is not None) and bool(pd.notna(value)) and bool(value)
+
+
+def compile_exch(config: pd.DataFrame) -> dict:
+    """
+    Exchange info with sessions in hours, day session filled by allday session -
+    empty for exchanges without required info (allday + tz), trading calendar excluded
+
+    Args:
+        config: exchange config from `param.load_config('exch')`
+
+    Returns:
+        dict: exchange name -> pd.Series
+    """
+    res = dict()
+    for name, info in config.iterrows():
+        info = info.drop(CalendarKeys, errors='ignore').dropna()
+        if info.reindex(['allday', 'tz']).dropna().size < 2:
+            res[name] = pd.Series(dtype=object)
+            continue
+        if 'day' not in info: info['day'] = info['allday']
+        res[name] = info.dropna().apply(param.to_hours).rename(name)
+    return res
+
+
+def resolver() -> Resolver:
+    """
+    Resolver of current config files - shared by all callers
+    """
+    return param.registry('resolver', cats=['assets', 'exch'], loader=lambda: Resolver(
+        assets={asset: _asset_config_(asset=asset) for asset in ASSET_INFO},
+        exch=param.load_config(cat='exch'),
+    ))
 
 
 def take_first(data: pd.DataFrame, query: str) -> pd.Series:
@@ -282,34 +421,29 @@ def take_first(data: pd.DataFrame, query: str) -> pd.Series:
 
 def asset_config(asset: str) -> pd.DataFrame:
     """
-    Load info for given asset
+    Load info for given asset - shared by all callers and read-only
 
     Args:
         asset: asset name
 
     Returns:
         pd.DataFrame
+
+    Examples:
+        >>> asset_config('Equity').query('exch_codes == "US"').exch.iloc[0]
+        'EquityUS'
     """
-    cfg_files = param.config_files('assets')
-    cache_cfg = f'{PKG_PATH}/markets/cached/{asset}_cfg.pkl'
-    last_mod = max(map(files.modified_time, cfg_files))
-    if files.exists(cache_cfg) and files.modified_time(cache_cfg) > last_mod:
-        return pd.read_pickle(cache_cfg)
-
-    config = (
-        pd.concat([
-            explode(
-                data=pd.DataFrame(param.load_yaml(cf).get(asset, [])),
-                columns=ASSET_INFO[asset],
-            )
-            for cf in cfg_files
-        ], sort=False)
-        .drop_duplicates(keep='last')
-        .reset_index(drop=True)
+    return param.registry(
+        f'assets/{asset}', cats=['assets'],
+        loader=lambda: param.read_only(_asset_config_(asset=asset)),
     )
-    files.create_folder(cache_cfg, is_file=True)
-    config.to_pickle(cache_cfg)
-    return config
+
+
+def _asset_config_(asset: str) -> pd.DataFrame:
+    """
+    Load asset info from compiled market info
+    """
+    return pd.DataFrame(param.load_markets()['assets'].get(asset, []))
 
 
 def explode(data: pd.DataFrame, columns: list) -> pd.DataFrame:
@@ -15,8 +15,8 @@ try:
     else:
         import blpapi
 except (ImportError, AttributeError):
-    import pytest
-    blpapi = pytest.importorskip('blpapi')
+    # Only required to connect to Bloomberg - see `require_blpapi`
+    blpapi = None
 
 from xbbg.io import logs
 
@@ -24,7 +24,18 @@ _CON_SYM_ = '_xcon_'
 _PORT_ = 8194
 
 
-def connect(max_attempt=3, auto_restart=True, **kwargs) -> blpapi.session.Session:
+def require_blpapi():
+    """
+    Raise if blpapi is not installed
+    """
+    if blpapi is None:
+        raise ImportError(
+            'blpapi is required to connect to Bloomberg: '
+            'pip install blpapi --index-url=https://bcms.bloomberg.com/pip/simple/'
+        )
+
+
+def connect(max_attempt=3, auto_restart=True, **kwargs) -> 'blpapi.session.Session':
     """
     Use alternative method to connect to blpapi. If a session object is passed, arguments
     max_attempt and auto_restart will be ignored.
@@ -32,6 +43,7 @@ def connect(max_attempt=3, auto_restart=True, **kwargs) -> blpapi.session.Sessio
     referecing to blpapi example for full lists of available authentication methods:
         https://github.com/msitt/blpapi-python/blob/master/examples/ConnectionAndAuthExample.py
     """
+    require_blpapi()
     if isinstance(kwargs.get('sess', None), blpapi.session.Session):
         return bbg_session(sess=kwargs['sess'])
 
@@ -77,10 +89,11 @@ def connect(max_attempt=3, auto_restart=True, **kwargs) -> blpapi.session.Sessio
     return bbg_session(sess=blpapi.Session(sess_opts))
 
 
-def connect_bbg(**kwargs) -> blpapi.session.Session:
+def connect_bbg(**kwargs) -> 'blpapi.session.Session':
     """
     Create Bloomberg session and make connection
     """
+    require_blpapi()
     logger = logs.get_logger(connect_bbg, **kwargs)
 
     if isinstance(kwargs.get('sess', None), blpapi.session.Session):
@@ -97,7 +110,7 @@ def connect_bbg(**kwargs) -> blpapi.session.Session:
     else: raise ConnectionError('Cannot connect to Bloomberg')
 
 
-def bbg_session(**kwargs) -> blpapi.session.Session:
+def bbg_session(**kwargs) -> 'blpapi.session.Session':
     """
     Bloomberg session - initiate if not given
 
@@ -122,7 +135,7 @@ def bbg_session(**kwargs) -> blpapi.session.Session:
     return globals()[con_sym]
 
 
-def bbg_service(service: str, **kwargs) -> blpapi.service.Service:
+def bbg_service(service: str, **kwargs) -> 'blpapi.service.Service':
     """
     Initiate service
 
@@ -157,13 +170,14 @@ def event_types() -> dict:
     """
     Bloomberg event types
     """
+    require_blpapi()
     return {
         getattr(blpapi.Event, ev_typ): ev_typ
         for ev_typ in dir(blpapi.Event) if ev_typ.isupper()
     }
 
 
-def send_request(request: blpapi.request.Request, **kwargs):
+def send_request(request: 'blpapi.request.Request', **kwargs):
     """
     Send request to Bloomberg session
 
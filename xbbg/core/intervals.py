@@ -1,6 +1,6 @@
 import pandas as pd
-import numpy as np
 
+from functools import lru_cache
 from collections import namedtuple
 
 from xbbg import const
@@ -9,6 +9,9 @@ from xbbg.io import logs, param
 Session = namedtuple('Session', ['start_time', 'end_time'])
 SessNA = Session(None, None)
 
+SessionSpec = namedtuple('SessionSpec', ['session', 'kind', 'args'])
+SPEC_KINDS = ['open', 'close', 'normal', 'exact']
+
 
 def get_interval(ticker, session, **kwargs) -> Session:
     """
@@ -49,11 +52,116 @@ def get_interval(ticker, session, **kwargs) -> Session:
         >>> get_interval('GBP Curncy', 'day')
         Session(start_time='17:02', end_time='17:00')
     """
+    if 'config' in kwargs:
+        return exch_interval(exch=const.exch_info(ticker=ticker, **kwargs), spec=parse_spec(session))
+
+    # Memoized per ticker / ref / session until exchange configs change
+    cache = param.registry('intervals', cats=['assets', 'exch'], loader=dict)
+    key = (ticker, kwargs.get('ref', ''), session)
+    if key not in cache:
+        exch = const.exch_info(ticker=ticker, **kwargs)
+        cache[key] = exch_interval(exch=exch, spec=parse_spec(session)) if not exch.empty else SessNA
+    return cache[key]
+
+
+@lru_cache(maxsize=None)
+def parse_spec(session: str) -> SessionSpec:
+    """
+    Parse session spec, e.g., `day`, `am_open_30`, `day_normal_30_20`,
+    `allday_exact_2130_2230` - times in minutes
+
+    Args:
+        session: session spec
+
+    Returns:
+        SessionSpec
+
+    Examples:
+        >>> parse_spec('day')
+        SessionSpec(session='day', kind='normal', args=(0, 0))
+        >>> parse_spec('am_open_30')
+        SessionSpec(session='am', kind='open', args=(30,))
+        >>> parse_spec('allday_exact_2130_0230')
+        SessionSpec(session='allday', kind='exact', args=(1290, 150))
+        >>> parse_spec('day_exact__1500')
+        SessionSpec(session='day', kind='exact', args=(None, 900))
+    """
     if '_' not in session:
         session = f'{session}_normal_0_0'
-    interval = Intervals(ticker=ticker, **kwargs)
     ss_info = session.split('_')
-    return getattr(interval, f'market_{ss_info.pop(1)}')(*ss_info)
+    kind = ss_info.pop(1)
+    if kind not in SPEC_KINDS: raise ValueError(f'unknown session spec: {session}')
+    if kind == 'exact':
+        args = tuple(to_mins(param.to_hours(int(hm))) if hm else None for hm in ss_info[1:])
+    else:
+        args = tuple(int(mins) for mins in ss_info[1:])
+    return SessionSpec(session=ss_info[0], kind=kind, args=args)
+
+
+def exch_interval(exch: pd.Series, spec: SessionSpec) -> Session:
+    """
+    Interval of session spec for exchange
+
+    Args:
+        exch: exchange info from `const.exch_info`
+        spec: session spec from `parse_spec`
+
+    Returns:
+        Session of start_time and end_time
+    """
+    if spec.session not in exch: return SessNA
+    ss = to_mins(exch[spec.session][0]), to_mins(exch[spec.session][-1])
+    if spec.kind == 'open':
+        return to_session(ss[0], ss[0] + spec.args[0])
+    if spec.kind == 'close':
+        return to_session(ss[1] - spec.args[0] + 1, ss[1])
+    if spec.kind == 'normal':
+        s_time, e_time = ss[0] + spec.args[0] + 1, ss[1] - spec.args[1]
+        if ((s_time % 1440) >= (e_time % 1440)) and (ss[0] < ss[1]):
+            logs.get_logger(exch_interval).warning(
+                f'end time {to_hhmm(e_time)} is earlier than {to_hhmm(s_time)} ...'
+            )
+            return SessNA
+        return to_session(s_time, e_time)
+
+    # Exact times
+    same_day = ss[0] < ss[1]
+    s_time, e_time = spec.args
+    if s_time is None: s_time = ss[0]
+    elif same_day: s_time = max(s_time, ss[0])
+    if e_time is None: e_time = ss[1]
+    elif same_day: e_time = min(e_time, ss[1])
+    if same_day and (s_time > e_time): return SessNA
+    return to_session(s_time, e_time)
+
+
+def to_mins(hhmm: str) -> int:
+    """
+    Minutes after midnight
+
+    Examples:
+        >>> to_mins('09:30')
+        570
+    """
+    return int(hhmm[:-3]) * 60 + int(hhmm[-2:])
+
+
+def to_hhmm(mins: int) -> str:
+    """
+    Time of day from minutes after midnight - wrapped around midnight
+
+    Examples:
+        >>> to_hhmm(570), to_hhmm(-10), to_hhmm(1450)
+        ('09:30', '23:50', '00:10')
+    """
+    return f'{(mins % 1440) // 60:02d}:{mins % 60:02d}'
+
+
+def to_session(start: int, end: int) -> Session:
+    """
+    Session from minutes after midnight
+    """
+    return Session(to_hhmm(start), to_hhmm(end))
 
 
 def shift_time(start_time, mins) -> str:
@@ -66,10 +174,12 @@ def shift_time(start_time, mins) -> str:
 
     Returns:
         end time in terms of HH:MM string
+
+    Examples:
+        >>> shift_time('23:50', 30)
+        '00:20'
     """
-    s_time = pd.Timestamp(start_time)
-    e_time = s_time + np.sign(mins) * pd.Timedelta(f'00:{abs(mins)}:00')
-    return e_time.strftime('%H:%M')
+    return to_hhmm(to_mins(start_time) + int(mins))
 
 
 class Intervals(object):
@@ -93,9 +203,7 @@ class Intervals(object):
         Returns:
             Session of start_time and end_time
         """
-        if session not in self.exch: return SessNA
-        start_time = self.exch[session][0]
-        return Session(start_time, shift_time(start_time, int(mins)))
+        return exch_interval(exch=self.exch, spec=SessionSpec(session, 'open', (int(mins),)))
 
     def market_close(self, session, mins) -> Session:
         """
@@ -108,9 +216,7 @@ class Intervals(object):
         Returns:
             Session of start_time and end_time
         """
-        if session not in self.exch: return SessNA
-        end_time = self.exch[session][-1]
-        return Session(shift_time(end_time, -int(mins) + 1), end_time)
+        return exch_interval(exch=self.exch, spec=SessionSpec(session, 'close', (int(mins),)))
 
     def market_normal(self, session, after_open, before_close) -> Session:
         """
@@ -124,21 +230,9 @@ class Intervals(object):
         Returns:
             Session of start_time and end_time
         """
-        logger = logs.get_logger(self.market_normal)
-
-        if session not in self.exch: return SessNA
-        ss = self.exch[session]
-
-        s_time = shift_time(ss[0], int(after_open) + 1)
-        e_time = shift_time(ss[-1], -int(before_close))
-
-        request_cross = pd.Timestamp(s_time) >= pd.Timestamp(e_time)
-        session_cross = pd.Timestamp(ss[0]) >= pd.Timestamp(ss[1])
-        if request_cross and (not session_cross):
-            logger.warning(f'end time {e_time} is earlier than {s_time} ...')
-            return SessNA
-
-        return Session(s_time, e_time)
+        return exch_interval(exch=self.exch, spec=SessionSpec(
+            session, 'normal', (int(after_open), int(before_close)),
+        ))
 
     def market_exact(self, session, start_time: str, end_time: str) -> Session:
         """
@@ -152,20 +246,6 @@ class Intervals(object):
         Returns:
             Session of start_time and end_time
         """
-        if session not in self.exch: return SessNA
-        ss = self.exch[session]
-
-        same_day = ss[0] < ss[-1]
-
-        if not start_time: s_time = ss[0]
-        else:
-            s_time = param.to_hours(int(start_time))
-            if same_day: s_time = max(s_time, ss[0])
-
-        if not end_time: e_time = ss[-1]
-        else:
-            e_time = param.to_hours(int(end_time))
-            if same_day: e_time = min(e_time, ss[-1])
-
-        if same_day and (s_time > e_time): return SessNA
-        return Session(start_time=s_time, end_time=e_time)
+        return exch_interval(exch=self.exch, spec=SessionSpec(session, 'exact', tuple(
+            to_mins(param.to_hours(int(hm))) if hm else None for hm in [start_time, end_time]
+        )))
@@ -5,6 +5,8 @@ BBG_ROOT = 'BBG_ROOT'
 PRSV_COLS = [
     'raw', 'has_date', 'cache', 'cache_days', 'col_maps',
     'keep_one', 'price_only', 'port', 'log', 'timeout', 'sess',
+    'codec', 'codec_level', 'use_dict', 'row_group', 'downcast', 'pkl_codec',
+    'lock_timeout', 'empty_ttl', 'reload',
 ]
 
 ELEMENTS = [
@@ -1,24 +1,29 @@
 import pandas as pd
 import numpy as np
 
-import pytest
-try: import blpapi
-except ImportError: blpapi = pytest.importorskip('blpapi')
-
+from functools import lru_cache
 from itertools import starmap
 from collections import OrderedDict
 
 from xbbg import const
-from xbbg.core.timezone import DEFAULT_TZ
-from xbbg.core import intervals, overrides, conn
+from xbbg.core import intervals, overrides, conn, sessions
+
+# Element names - converted to `blpapi.Name` on first use
+RESPONSE_ERROR = 'responseError'
+SESSION_TERMINATED = 'SessionTerminated'
+CATEGORY = 'category'
+MESSAGE = 'message'
+BAR_DATA = 'barData'
+BAR_TICK = 'barTickData'
+TICK_DATA = 'tickData'
+
 
-RESPONSE_ERROR = blpapi.Name("responseError")
-SESSION_TERMINATED = blpapi.Name("SessionTerminated")
-CATEGORY = blpapi.Name("category")
-MESSAGE = blpapi.Name("message")
-BAR_DATA = blpapi.Name('barData')
-BAR_TICK = blpapi.Name('barTickData')
-TICK_DATA = blpapi.Name('tickData')
+@lru_cache(maxsize=None)
+def bbg_name(name: str):
+    """
+    Bloomberg name of element - faster to look up than str
+    """
+    return conn.blpapi.Name(name)
 
 
 def create_request(
@@ -28,7 +33,7 @@ def create_request(
         ovrds: list = None,
         append: dict = None,
         **kwargs,
-) -> blpapi.request.Request:
+) -> 'conn.blpapi.request.Request':
     """
     Create request for query
 
@@ -61,7 +66,7 @@ def create_request(
     return req
 
 
-def init_request(request: blpapi.request.Request, tickers, flds, **kwargs):
+def init_request(request: 'conn.blpapi.request.Request', tickers, flds, **kwargs):
     """
     Initiate Bloomberg request instance
 
@@ -116,56 +121,154 @@ def time_range(dt, ticker, session='allday', tz='UTC', **kwargs) -> intervals.Se
     Returns:
         intervals.Session
     """
-    ss = intervals.get_interval(ticker=ticker, session=session, **kwargs)
     ex_info = const.exch_info(ticker=ticker, **kwargs)
-    cur_dt = pd.Timestamp(dt).strftime('%Y-%m-%d')
+    if ex_info.empty: return intervals.SessNA
     time_fmt = '%Y-%m-%dT%H:%M:%S'
-    time_idx = (
-        pd.DatetimeIndex([
-            f'{cur_dt} {ss.start_time}',
-            f'{cur_dt} {ss.end_time}'],
-        )
-        .tz_localize(ex_info.tz)
-        .tz_convert(DEFAULT_TZ)
-        .tz_convert(tz)
+    if 'config' in kwargs:
+        # Custom exchange config is not in session calendar
+        rng = config_ranges(tickers=[ticker], dates=[dt], session=session, **kwargs)
+        start, end = rng.start_time[0], rng.end_time[0]
+    else:
+        start, end = sessions.session_time(exch=ex_info.name, session=session, dt=dt)
+    if start is pd.NaT: return intervals.SessNA
+    return intervals.Session(
+        start.tz_convert(tz).strftime(time_fmt),
+        end.tz_convert(tz).strftime(time_fmt),
     )
-    if time_idx[0] > time_idx[1]: time_idx -= pd.TimedeltaIndex(['1D', '0D'])
-    return intervals.Session(time_idx[0].strftime(time_fmt), time_idx[1].strftime(time_fmt))
 
 
-def rec_events(func, **kwargs):
+def time_ranges(tickers, dates, session='allday', tz='UTC', **kwargs) -> pd.DataFrame:
+    """
+    Time ranges of session for all combinations of tickers and dates -
+    same as `time_range` for each pair, looked up once per exchange
+
+    Args:
+        tickers: list of tickers
+        dates: list of dates
+        session: market session defined in xbbg/markets/exch.yml
+        tz: timezone of output
+        **kwargs:
+            ref: reference ticker or exchange - str or dict of ticker -> ref
+            config: custom exchange config - see `const.exch_info`
+
+    Returns:
+        pd.DataFrame: ticker, date, start_time and end_time -
+            NaT if exchange or session is not defined
+
+    Examples:
+        >>> time_ranges(
+        ...     tickers=['7974 JT Equity', 'SPY US Equity', 'TESTTICKER Corp'],
+        ...     dates=['2018-03-09', '2018-03-12'], session='day',
+        ... ).set_index(['ticker', 'date'])  # doctest: +NORMALIZE_WHITESPACE
+                                                  start_time                  end_time
+        ticker          date
+        7974 JT Equity  2018-03-09 2018-03-09 00:02:00+00:00 2018-03-09 05:58:00+00:00
+                        2018-03-12 2018-03-12 00:02:00+00:00 2018-03-12 05:58:00+00:00
+        SPY US Equity   2018-03-09 2018-03-09 14:31:00+00:00 2018-03-09 21:00:00+00:00
+                        2018-03-12 2018-03-12 13:31:00+00:00 2018-03-12 20:00:00+00:00
+        TESTTICKER Corp 2018-03-09                       NaT                       NaT
+                        2018-03-12                       NaT                       NaT
+        >>> rng = time_ranges(['ES1 Index'], ['2018-03-12'], session='allday', tz='America/New_York')
+        >>> rng.start_time[0], rng.end_time[0]
+        (Timestamp('2018-03-11 18:01:00-0400', tz='America/New_York'), Timestamp('2018-03-12 17:00:00-0400', tz='America/New_York'))
+        >>> time_range(dt='2018-03-12', ticker='ES1 Index', session='allday', tz='America/New_York')
+        Session(start_time='2018-03-11T18:01:00', end_time='2018-03-12T17:00:00')
+    """
+    if 'config' in kwargs:
+        return config_ranges(tickers=tickers, dates=dates, session=session, tz=tz, **kwargs)
+
+    if isinstance(tickers, str): tickers = [tickers]
+    dates = pd.DatetimeIndex(pd.to_datetime(list(np.atleast_1d(dates)))).normalize()
+    ex_info = const.exch_info_many(tickers=tickers, ref=kwargs.get('ref', None))
+
+    # Start / end times (ns in UTC) of each exchange for all dates
+    exch = pd.Index(ex_info.exch.unique())
+    rngs = np.full((exch.size, 2, dates.size), pd.NaT.value, dtype=np.int64)
+    for n, name in enumerate(exch):
+        start, end = sessions.session_times(exch=name, session=session, dates=dates)
+        rngs[n] = [start.asi8, end.asi8]
+
+    codes = exch.get_indexer(ex_info.exch)
+    res = rngs[codes]
+    return pd.DataFrame(dict(
+        ticker=np.repeat(np.array(tickers, dtype=object), dates.size),
+        date=np.tile(dates.values, len(tickers)),
+        start_time=pd.to_datetime(res[:, 0].ravel(), utc=True).tz_convert(tz),
+        end_time=pd.to_datetime(res[:, 1].ravel(), utc=True).tz_convert(tz),
+    ))
+
+
+def config_ranges(tickers, dates, session='allday', tz='UTC', **kwargs) -> pd.DataFrame:
+    """
+    Time ranges of session from custom exchange config (`config` in kwargs) -
+    same output as `time_ranges`, computed for each ticker without session calendar
+
+    Examples:
+        >>> from xbbg.io import param
+        >>>
+        >>> cfg_ = param.load_config('exch').copy()
+        >>> cfg_.loc['CME', 'allday'] = [1700, 1600]
+        >>> time_range(dt='2018-03-12', ticker='ES1 Index', tz='America/New_York', config=cfg_)
+        Session(start_time='2018-03-11T17:01:00', end_time='2018-03-12T16:00:00')
+        >>> time_ranges(['ES1 Index'], ['2018-03-12'], config=cfg_).end_time[0]
+        Timestamp('2018-03-12 20:00:00+0000', tz='UTC')
+    """
+    if isinstance(tickers, str): tickers = [tickers]
+    dates = pd.DatetimeIndex(pd.to_datetime(list(np.atleast_1d(dates)))).normalize()
+    res = np.full((len(tickers), 2, dates.size), pd.NaT.value, dtype=np.int64)
+    for n, ticker in enumerate(tickers):
+        ex_info = const.exch_info(ticker=ticker, **kwargs)
+        ss = intervals.get_interval(ticker=ticker, session=session, **kwargs)
+        if ex_info.empty or (ss.start_time is None): continue
+        res[n] = sessions.exch_minutes(ex_info=ex_info, ss=ss, dates=dates) * 60_000_000_000
+    return pd.DataFrame(dict(
+        ticker=np.repeat(np.array(tickers, dtype=object), dates.size),
+        date=np.tile(dates.values, len(tickers)),
+        start_time=pd.to_datetime(res[:, 0].ravel(), utc=True).tz_convert(tz),
+        end_time=pd.to_datetime(res[:, 1].ravel(), utc=True).tz_convert(tz),
+    ))
+
+
+def rec_events(func, status=None, **kwargs):
     """
     Receive events received from Bloomberg
 
     Args:
         func: must be generator function
+        status: dict to record whether response is complete, i.e.,
+                final response received without timeout or response errors
         **kwargs: arguments for input function
 
     Yields:
         Elements of Bloomberg responses
     """
+    if status is None: status = dict()
+    status['complete'] = False
     timeout_counts = 0
-    responses = [blpapi.Event.PARTIAL_RESPONSE, blpapi.Event.RESPONSE]
+    responses = [conn.blpapi.Event.PARTIAL_RESPONSE, conn.blpapi.Event.RESPONSE]
     timeout = kwargs.pop('timeout', 500)
+    has_error = False
     while True:
         ev = conn.bbg_session(**kwargs).nextEvent(timeout=timeout)
         if ev.eventType() in responses:
             for msg in ev:
+                if msg.hasElement(bbg_name(RESPONSE_ERROR)): has_error = True
                 for r in func(msg=msg, **kwargs):
                     yield r
-            if ev.eventType() == blpapi.Event.RESPONSE:
+            if ev.eventType() == conn.blpapi.Event.RESPONSE:
+                status['complete'] = not has_error
                 break
-        elif ev.eventType() == blpapi.Event.TIMEOUT:
+        elif ev.eventType() == conn.blpapi.Event.TIMEOUT:
             timeout_counts += 1
             if timeout_counts > 20:
                 break
         else:
             for _ in ev:
                 if getattr(ev, 'messageType', lambda: None)() \
-                    == SESSION_TERMINATED: break
+                    == bbg_name(SESSION_TERMINATED): break
 
 
-def process_ref(msg: blpapi.message.Message, **kwargs) -> dict:
+def process_ref(msg: 'conn.blpapi.message.Message', **kwargs) -> dict:
     """
     Process reference messages from Bloomberg
 
@@ -203,7 +306,7 @@ def process_ref(msg: blpapi.message.Message, **kwargs) -> dict:
                 ])
 
 
-def process_hist(msg: blpapi.message.Message, **kwargs) -> dict:
+def process_hist(msg: 'conn.blpapi.message.Message', **kwargs) -> dict:
     """
     Process historical data messages from Bloomberg
 
@@ -223,7 +326,7 @@ def process_hist(msg: blpapi.message.Message, **kwargs) -> dict:
             ])
 
 
-def process_bar(msg: blpapi.message.Message, typ='bar', **kwargs) -> OrderedDict:
+def process_bar(msg: 'conn.blpapi.message.Message', typ='bar', **kwargs) -> OrderedDict:
     """
     Process Bloomberg intraday bar messages
 
@@ -237,9 +340,9 @@ def process_bar(msg: blpapi.message.Message, typ='bar', **kwargs) -> OrderedDict
     kwargs.pop('(#_#)', None)
     check_error(msg=msg)
     if typ[0].lower() == 't':
-        lvls = [TICK_DATA, TICK_DATA]
+        lvls = [bbg_name(TICK_DATA), bbg_name(TICK_DATA)]
     else:
-        lvls = [BAR_DATA, BAR_TICK]
+        lvls = [bbg_name(BAR_DATA), bbg_name(BAR_TICK)]
 
     if msg.hasElement(lvls[0]):
         for bar in msg.getElement(lvls[0]).getElement(lvls[1]).values():
@@ -253,16 +356,16 @@ def check_error(msg):
     """
     Check error in message
     """
-    if msg.hasElement(RESPONSE_ERROR):
-        error = msg.getElement(RESPONSE_ERROR)
+    if msg.hasElement(bbg_name(RESPONSE_ERROR)):
+        error = msg.getElement(bbg_name(RESPONSE_ERROR))
         raise ValueError(
             f'[Intraday Bar Error] '
-            f'{error.getElementAsString(CATEGORY)}: '
-            f'{error.getElementAsString(MESSAGE)}'
+            f'{error.getElementAsString(bbg_name(CATEGORY))}: '
+            f'{error.getElementAsString(bbg_name(MESSAGE))}'
         )
 
 
-def elem_value(element: conn.blpapi.Element):
+def elem_value(element: 'conn.blpapi.Element'):
     """
     Get value from element
 
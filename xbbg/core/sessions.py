@@ -0,0 +1,471 @@
+import pandas as pd
+import numpy as np
+
+import os
+import json
+
+from types import MappingProxyType
+from xbbg import const
+from xbbg.io import files, logs, param
+from xbbg.core import intervals
+
+# Years of calendar saved by `build` - relative to current year
+CALENDAR_YEARS = (-1, 1)
+SESSIONS = ['allday', 'day', 'am', 'pm', 'night', 'pre', 'post']
+CALENDAR_VERSION = 1
+
+# Trading calendar - `weekmask` / `holidays` of exchanges in exch.yml
+WEEKMASK = '1111100'
+HOLIDAY_FLD = 'CALENDAR_NON_SETTLEMENT_DATES'
+
+# Session tables filled on demand - copy of saved `calendar` of current exch.yml
+_TABLES_ = dict()
+
+
+def holiday_file() -> str:
+    """
+    Holidays filled from Bloomberg - next to compiled market info
+    """
+    return f'{os.path.dirname(param.markets_file())}/holidays.json'
+
+
+def calendar_file() -> str:
+    """
+    Session calendar file - next to compiled market info
+    """
+    return f'{os.path.dirname(param.markets_file())}/sessions.json'
+
+
+def calendar() -> MappingProxyType:
+    """
+    Saved session calendar - (exchange, session, year) -> start / end minutes in UTC,
+    loaded from `calendar_file`, shared by all callers and read-only
+    """
+    return param.registry('sessions', cats=['exch'], loader=_load_calendar_)
+
+
+def tables() -> dict:
+    """
+    Session tables of current calendar - copy of `calendar` filled by `year_table`,
+    started again from `calendar` once exch.yml changes
+    """
+    cal = calendar()
+    if _TABLES_.get('calendar') is not cal: _TABLES_.update(calendar=cal, tables=dict(cal))
+    return _TABLES_['tables']
+
+
+def _load_calendar_() -> dict:
+    """
+    Load saved session calendar if exchange configs did not change
+    """
+    res = dict()
+    cal_file = calendar_file()
+    if not files.exists(cal_file): return res
+    try:
+        with open(cal_file, 'r') as fp: saved = json.load(fp)
+    except ValueError: return res
+    if saved.get('version') != CALENDAR_VERSION: return res
+    if saved.get('sources') != param.load_markets()['sources']['exch']: return res
+    for key, mins in saved.get('minutes', dict()).items():
+        exch, session, year = key.split('|')
+        res[exch, session, int(year)] = None if mins is None else _read_only_(np.array(mins, dtype=np.int64))
+    return MappingProxyType(res)
+
+
+def _read_only_(arr: np.ndarray) -> np.ndarray:
+    """
+    Make array read-only in place - shared by all callers
+    """
+    arr.flags.writeable = False
+    return arr
+
+
+def year_table(exch: str, session: str, year: int):
+    """
+    Start / end of session for all days of year
+
+    Args:
+        exch: exchange name defined in xbbg/markets/exch.yml
+        session: session, e.g., allday, day, am_open_30, etc.
+        year: year
+
+    Returns:
+        np.ndarray: 2 x days of minutes since epoch in UTC - None if session is not defined
+
+    Examples:
+        >>> pd.to_datetime(year_table('EquityUS', 'allday', 2018)[:, 69] * 60, unit='s', utc=True)
+        DatetimeIndex(['2018-03-11 08:01:00+00:00', '2018-03-12 00:00:00+00:00'], dtype='datetime64[ns, UTC]', freq=None)
+        >>> year_table('EquityUS', 'night', 2018) is None
+        True
+        >>> year_table('EquityUS', 'allday', 2018).flags.writeable
+        False
+    """
+    cal = tables()
+    key = (exch, session, int(year))
+    if key in cal: return cal[key]
+
+    ex_info = const.exch_info(ticker=exch)
+    ss = intervals.get_interval(ticker=exch, session=session)
+    if ex_info.empty or (ss.start_time is None):
+        cal[key] = None
+        return None
+
+    dates = pd.date_range(f'{year}-01-01', f'{year}-12-31', freq='D')
+    cal[key] = _read_only_(exch_minutes(ex_info=ex_info, ss=ss, dates=dates))
+    return cal[key]
+
+
+def exch_minutes(ex_info: pd.Series, ss: intervals.Session, dates) -> np.ndarray:
+    """
+    Start / end of session for dates from exchange info directly -
+    for exchange configs not in calendar, e.g., `config` of `const.exch_info`
+
+    Args:
+        ex_info: exchange info with tz
+        ss: session with start / end time
+        dates: pd.DatetimeIndex of dates
+
+    Returns:
+        np.ndarray: 2 x dates of minutes since epoch in UTC
+
+    Examples:
+        >>> info_ = pd.Series(dict(tz='America/New_York'))
+        >>> ss_ = intervals.Session('18:01', '17:00')
+        >>> mins_ = exch_minutes(info_, ss_, pd.DatetimeIndex(['2018-03-12']))
+        >>> pd.to_datetime(mins_[:, 0] * 60, unit='s', utc=True)
+        DatetimeIndex(['2018-03-11 22:01:00+00:00', '2018-03-12 21:00:00+00:00'], dtype='datetime64[ns, UTC]', freq=None)
+    """
+    start, end = [
+        (dates + pd.Timedelta(f'{hm}:00'))
+        .tz_localize(ex_info.tz, ambiguous=np.ones(dates.size, dtype=bool), nonexistent='shift_forward')
+        .tz_convert('UTC')
+        for hm in ss
+    ]
+    start = start.where(start <= end, start - pd.Timedelta('1D'))
+    return np.vstack([start.asi8, end.asi8]) // 60_000_000_000
+
+
+def session_time(exch: str, session: str, dt) -> tuple:
+    """
+    Start / end time of session in UTC for one date
+
+    Args:
+        exch: exchange name defined in xbbg/markets/exch.yml
+        session: session, e.g., allday, day, am_open_30, etc.
+        dt: date
+
+    Returns:
+        tuple: start and end time as pd.Timestamp in UTC - NaT if not defined
+
+    Examples:
+        >>> session_time('EquityJapan', 'day_open_30', '2018-03-09')
+        (Timestamp('2018-03-09 00:01:00+0000', tz='UTC'), Timestamp('2018-03-09 00:31:00+0000', tz='UTC'))
+    """
+    cur_dt = pd.Timestamp(dt)
+    mins = year_table(exch=exch, session=session, year=cur_dt.year) if exch else None
+    if mins is None: return pd.NaT, pd.NaT
+    return tuple(
+        pd.Timestamp(int(m) * 60_000_000_000, tz='UTC')
+        for m in mins[:, cur_dt.dayofyear - 1]
+    )
+
+
+def session_times(exch: str, session: str, dates) -> tuple:
+    """
+    Start / end times of session in UTC for given dates
+
+    Args:
+        exch: exchange name defined in xbbg/markets/exch.yml
+        session: session, e.g., allday, day, am_open_30, etc.
+        dates: list of dates
+
+    Returns:
+        tuple: start and end times as DatetimeIndex in UTC - NaT if not defined
+
+    Examples:
+        >>> start_, end_ = session_times('CME', 'allday', ['2018-03-09', '2018-03-12'])
+        >>> start_
+        DatetimeIndex(['2018-03-08 23:01:00+00:00', '2018-03-11 22:01:00+00:00'], dtype='datetime64[ns, UTC]', freq=None)
+        >>> end_
+        DatetimeIndex(['2018-03-09 22:00:00+00:00', '2018-03-12 21:00:00+00:00'], dtype='datetime64[ns, UTC]', freq=None)
+    """
+    if not isinstance(dates, pd.DatetimeIndex):
+        dates = pd.DatetimeIndex(pd.to_datetime(list(np.atleast_1d(dates))))
+    dates = dates.tz_localize(None).normalize() if dates.tz else dates.normalize()
+    res = np.full((2, dates.size), pd.NaT.value, dtype=np.int64)
+    if exch:
+        years, days = dates.year.values, dates.dayofyear.values - 1
+        for year in np.unique(years):
+            mins = year_table(exch=exch, session=session, year=year)
+            if mins is None: continue
+            idx = years == year
+            res[:, idx] = mins[:, days[idx]] * 60_000_000_000
+
+    return tuple(pd.DatetimeIndex(ns.view('M8[ns]')).tz_localize('UTC') for ns in res)
+
+
+def table(exchanges=None, sessions=None, years=None) -> pd.DataFrame:
+    """
+    Materialized session calendar
+
+    Args:
+        exchanges: list of exchanges - default all in xbbg/markets/exch.yml
+        sessions: list of sessions - default `SESSIONS`
+        years: list of years - default `CALENDAR_YEARS` around current year
+
+    Returns:
+        pd.DataFrame: exch, session, date, start_time and end_time (in UTC)
+
+    Examples:
+        >>> table(['EquityJapan'], ['am', 'pm'], [2018]).iloc[[0, 365], 1:]
+            session       date                start_time                  end_time
+        0        am 2018-01-01 2018-01-01 00:02:00+00:00 2018-01-01 02:30:00+00:00
+        365      pm 2018-01-01 2018-01-01 03:31:00+00:00 2018-01-01 05:58:00+00:00
+    """
+    if exchanges is None: exchanges = list(param.load_markets()['exch'])
+    if sessions is None: sessions = SESSIONS
+    if years is None:
+        cur_yr = pd.Timestamp('today').year
+        years = range(cur_yr + CALENDAR_YEARS[0], cur_yr + CALENDAR_YEARS[1] + 1)
+
+    res = []
+    for exch in exchanges:
+        for session in sessions:
+            for year in years:
+                mins = year_table(exch=exch, session=session, year=year)
+                if mins is None: continue
+                res.append(pd.DataFrame(dict(
+                    exch=exch, session=session,
+                    date=pd.date_range(f'{year}-01-01', f'{year}-12-31', freq='D'),
+                    start_time=pd.to_datetime(mins[0] * 60, unit='s', utc=True),
+                    end_time=pd.to_datetime(mins[1] * 60, unit='s', utc=True),
+                )))
+    if not res:
+        return pd.DataFrame(columns=['exch', 'session', 'date', 'start_time', 'end_time'])
+    return pd.concat(res, ignore_index=True)
+
+
+def build(exchanges=None, sessions=None, years=None, **kwargs) -> pd.DataFrame:
+    """
+    Build session calendar and save to `calendar_file`
+
+    Args:
+        exchanges: list of exchanges - default all in xbbg/markets/exch.yml
+        sessions: list of sessions - default `SESSIONS`
+        years: list of years - default `CALENDAR_YEARS` around current year
+
+    Returns:
+        pd.DataFrame: see `table`
+    """
+    logger = logs.get_logger(build, **kwargs)
+
+    res = table(exchanges=exchanges, sessions=sessions, years=years)
+    saved = dict(
+        version=CALENDAR_VERSION,
+        sources=param.load_markets()['sources']['exch'],
+        minutes={
+            f'{exch}|{session}|{year}': None if mins is None else mins.tolist()
+            for (exch, session, year), mins in tables().items()
+        },
+    )
+    cal_file = calendar_file()
+    try:
+        with files.atomic(cal_file) as tmp_file:
+            with open(tmp_file, 'w') as fp: json.dump(saved, fp, separators=(',', ':'))
+        logger.info(f'saved session calendar to {cal_file} ...')
+    except OSError as e:
+        logger.warning(f'cannot save session calendar to {cal_file}: {e}')
+    return res
+
+
+def trading_calendar() -> MappingProxyType:
+    """
+    Weekmask and holidays of each exchange - from exch.yml and `holiday_file`,
+    shared by all callers and read-only
+
+    Examples:
+        >>> trading_calendar()['CurrencyDubai']['weekmask']
+        '1111101'
+        >>> '2018-12-25' in trading_calendar()['EquityUS']['holidays']
+        True
+    """
+    return param.registry(
+        'holidays', cats=['exch'], paths=[holiday_file()], loader=_load_trading_calendar_,
+    )
+
+
+def _load_trading_calendar_() -> dict:
+    """
+    Load weekmasks and holidays of all exchanges
+    """
+    filled = dict()
+    if files.exists(holiday_file()):
+        try:
+            with open(holiday_file(), 'r') as fp: filled = json.load(fp)
+        except ValueError: pass
+
+    res = dict()
+    for exch, info in param.load_markets()['exch'].items():
+        res[exch] = MappingProxyType(dict(
+            weekmask=to_weekmask(info.get('weekmask', WEEKMASK)),
+            holidays=tuple(sorted(
+                set(map(str, info.get('holidays', None) or [])) | set(filled.get(exch, []))
+            )),
+        ))
+    return MappingProxyType(res)
+
+
+def to_weekmask(weekmask) -> str:
+    """
+    Weekmask in the form of '1111100' (Mon to Sun) - accepts the same inputs
+    as `pd.offsets.CustomBusinessDay`, and lists of names or flags from YAML
+
+    Examples:
+        >>> to_weekmask('Mon Tue Wed Thu Fri'), to_weekmask('1111100')
+        ('1111100', '1111100')
+        >>> to_weekmask(['Sun', 'Mon', 'Tue', 'Wed', 'Thu']), to_weekmask([1, 1, 1, 1, 1, 0, 0])
+        ('1111001', '1111100')
+        >>> to_weekmask(111110)
+        '0111110'
+    """
+    if isinstance(weekmask, int): weekmask = f'{weekmask:07d}'
+    if isinstance(weekmask, (list, tuple)) and all(isinstance(d, str) for d in weekmask):
+        weekmask = ' '.join(weekmask)
+    return ''.join('1' if d else '0' for d in np.busdaycalendar(weekmask=weekmask).weekmask)
+
+
+def trading_days(exch: str, start, end) -> pd.DatetimeIndex:
+    """
+    Trading days of exchange between start and end (inclusive)
+
+    Args:
+        exch: exchange name defined in xbbg/markets/exch.yml
+        start: start date
+        end: end date
+
+    Returns:
+        pd.DatetimeIndex
+
+    Examples:
+        >>> trading_days('EquityUS', '2018-12-21', '2018-12-27').strftime('%Y-%m-%d').tolist()
+        ['2018-12-21', '2018-12-24', '2018-12-26', '2018-12-27']
+        >>> trading_days('CurrencyDubai', '2018-12-21', '2018-12-23').strftime('%a').tolist()
+        ['Fri', 'Sun']
+        >>> trading_days('XXX', '2018-12-21', '2018-12-27').size
+        0
+    """
+    cal = trading_calendar().get(exch)
+    if cal is None: return pd.DatetimeIndex([])
+    return pd.bdate_range(
+        start=pd.Timestamp(start).normalize(), end=pd.Timestamp(end).normalize(),
+        freq='C', weekmask=cal['weekmask'], holidays=list(cal['holidays']),
+    )
+
+
+def is_trading_day(exch: str, dt) -> bool:
+    """
+    Whether date is a trading day of exchange - True if exchange is not defined
+
+    Examples:
+        >>> is_trading_day('EquityUS', '2018-12-22'), is_trading_day('EquityUS', '2018-12-24')
+        (False, True)
+        >>> is_trading_day('EquityUS', '2018-12-25'), is_trading_day('CurrencyDubai', '2018-12-23')
+        (False, True)
+    """
+    cal = trading_calendar().get(exch)
+    if cal is None: return True
+    cur_dt = pd.Timestamp(dt)
+    if cal['weekmask'][cur_dt.weekday()] != '1': return False
+    return cur_dt.strftime('%Y-%m-%d') not in cal['holidays']
+
+
+def plan(tickers, start, end, session='allday', **kwargs) -> pd.DataFrame:
+    """
+    Expand tickers and date range into trading sessions only -
+    weekends and holidays of each exchange are skipped
+
+    Args:
+        tickers: list of tickers
+        start: start date
+        end: end date
+        session: market session defined in xbbg/markets/exch.yml
+        **kwargs:
+            ref: reference ticker or exchange - str or dict of ticker -> ref
+
+    Returns:
+        pd.DataFrame: ticker, exch, date and start_time / end_time of session in UTC
+
+    Examples:
+        >>> plan(
+        ...     ['SPY US Equity', 'ES1 Index', 'XYZ Index'], start='2018-03-09', end='2018-03-12',
+        ... ).loc[:, ['ticker', 'date', 'start_time']]
+                  ticker       date                start_time
+        0  SPY US Equity 2018-03-09 2018-03-09 09:01:00+00:00
+        1  SPY US Equity 2018-03-12 2018-03-12 08:01:00+00:00
+        2      ES1 Index 2018-03-09 2018-03-08 23:01:00+00:00
+        3      ES1 Index 2018-03-12 2018-03-11 22:01:00+00:00
+    """
+    logger = logs.get_logger(plan, **kwargs)
+
+    if isinstance(tickers, str): tickers = [tickers]
+    ex_info = const.exch_info_many(tickers=tickers, ref=kwargs.get('ref', None))
+    res = []
+    for ticker, exch in ex_info.exch.items():
+        if not exch:
+            logger.error(f'cannot find exchange info for {ticker} ...')
+            continue
+        days = trading_days(exch=exch, start=start, end=end)
+        if days.empty: continue
+        start_time, end_time = session_times(exch=exch, session=session, dates=days)
+        res.append(pd.DataFrame(dict(
+            ticker=ticker, exch=exch, date=days, start_time=start_time, end_time=end_time,
+        )).dropna(subset=['start_time']))
+
+    cols = ['ticker', 'exch', 'date', 'start_time', 'end_time']
+    if not res: return pd.DataFrame(columns=cols)
+    return pd.concat(res, ignore_index=True).loc[:, cols]
+
+
+def fill_holidays(exch: str, start, end, ticker=None, **kwargs) -> list:
+    """
+    Fill holidays of exchange from Bloomberg calendar and save to `holiday_file`
+
+    Args:
+        exch: exchange name defined in xbbg/markets/exch.yml
+        start: start date
+        end: end date
+        ticker: ticker to query - calendar of ticker's exchange
+            if `calendar` is not defined for exchange in exch.yml
+        **kwargs: other kwargs for `blp.bds`
+
+    Returns:
+        list: holidays found
+    """
+    from xbbg import blp
+
+    logger = logs.get_logger(fill_holidays, **kwargs)
+
+    ex_info = param.load_markets()['exch'].get(exch, dict())
+    ovrds = dict(
+        CALENDAR_START_DATE=pd.Timestamp(start).strftime('%Y%m%d'),
+        CALENDAR_END_DATE=pd.Timestamp(end).strftime('%Y%m%d'),
+    )
+    if 'calendar' in ex_info: ovrds['SETTLEMENT_CALENDAR_CODE'] = ex_info['calendar']
+    elif ticker is None: raise ValueError(f'either calendar in exch.yml or ticker is required for {exch}')
+
+    data = blp.bds(ticker if ticker else 'USD Curncy', HOLIDAY_FLD, **ovrds, **kwargs)
+    if data.empty:
+        logger.warning(f'no holidays found for {exch} ...')
+        return []
+    found = pd.to_datetime(data.iloc[:, -1]).dt.strftime('%Y-%m-%d').tolist()
+
+    filled = dict()
+    if files.exists(holiday_file()):
+        with open(holiday_file(), 'r') as fp: filled = json.load(fp)
+    filled[exch] = sorted(set(filled.get(exch, [])) | set(found))
+    with files.atomic(holiday_file()) as tmp_file:
+        with open(tmp_file, 'w') as fp: json.dump(filled, fp, indent=1)
+
+    # Trading calendar is built again with holidays filled
+    param.reload('holidays')
+    return found
@@ -10,7 +10,8 @@ DEFAULT_TZ = pytz.FixedOffset(-time.timezone / 60)
 
 def get_tz(tz) -> str:
     """
-    Convert tz from ticker / shorthands to timezone
+    Convert tz from ticker / shorthands to timezone -
+    tickers are resolved once until exchange configs change
 
     Args:
         tz: ticker or timezone shorthands
@@ -25,21 +26,31 @@ def get_tz(tz) -> str:
         'America/New_York'
         >>> get_tz('BHP AU Equity')
         'Australia/Sydney'
+        >>> get_tz('Europe/London')
+        'Europe/London'
     """
-    from xbbg.const import exch_info
-
     if tz is None: return DEFAULT_TZ
+    if not isinstance(tz, str): return tz
+    if hasattr(TimeZone, tz): return getattr(TimeZone, tz)
+    if tz in pytz.all_timezones_set: return tz
+
+    from xbbg.io import param
 
-    to_tz = tz
-    if isinstance(tz, str):
-        if hasattr(TimeZone, tz):
-            to_tz = getattr(TimeZone, tz)
-        else:
-            exch = exch_info(ticker=tz)
-            if 'tz' in exch.index:
-                to_tz = exch.tz
+    # Memoized per ticker until exchange configs change
+    cache = param.registry('timezones', cats=['assets', 'exch'], loader=dict)
+    if tz not in cache: cache[tz] = _exch_tz_(tz)
+    return cache[tz]
 
-    return to_tz
+
+def _exch_tz_(ticker: str):
+    """
+    Timezone of exchange of ticker - ticker itself if not found
+    """
+    from xbbg.const import exch_info
+
+    exch = exch_info(ticker=ticker)
+    if 'tz' in exch.index: return exch.tz
+    return ticker
 
 
 def tz_convert(dt, to_tz, from_tz=None) -> str:
@@ -68,9 +79,47 @@ def tz_convert(dt, to_tz, from_tz=None) -> str:
     logger = logs.get_logger(tz_convert, level='debug')
     f_tz, t_tz = get_tz(from_tz), get_tz(to_tz)
 
-    from_dt = pd.Timestamp(str(dt), tz=f_tz)
+    from_dt = pd.Timestamp(dt)
+    from_dt = from_dt.tz_convert(f_tz) if from_dt.tz else from_dt.tz_localize(f_tz)
     logger.debug(f'converting {str(from_dt)} from {f_tz} to {t_tz} ...')
-    return str(pd.Timestamp(str(from_dt), tz=t_tz))
+    return str(from_dt.tz_convert(t_tz))
+
+
+def tz_convert_many(data, to_tz, from_tz=None):
+    """
+    Convert timestamps to tz in one go
+
+    Args:
+        data: DatetimeIndex / array of date times,
+              or DataFrame / Series with DatetimeIndex (index is converted)
+        to_tz: to tz
+        from_tz: from tz - will be ignored if tz from data is given
+
+    Returns:
+        same type as data - arrays are returned as DatetimeIndex
+
+    Examples:
+        >>> tz_convert_many(['2018-09-10 16:00', '2018-01-10 16:00'], to_tz='NY', from_tz='HK')
+        DatetimeIndex(['2018-09-10 04:00:00-04:00', '2018-01-10 03:00:00-05:00'], dtype='datetime64[ns, America/New_York]', freq=None)
+        >>> bars = pd.DataFrame(
+        ...     {'close': [1., 2.]},
+        ...     index=pd.DatetimeIndex(['2018-11-02 13:30', '2018-11-02 13:31']),
+        ... )
+        >>> tz_convert_many(bars, to_tz='SPY US Equity', from_tz='UTC')
+                                   close
+        2018-11-02 09:30:00-04:00    1.0
+        2018-11-02 09:31:00-04:00    2.0
+    """
+    f_tz, t_tz = get_tz(from_tz), get_tz(to_tz)
+
+    if isinstance(data, (pd.DataFrame, pd.Series)):
+        if data.empty and (not isinstance(data.index, pd.DatetimeIndex)): return data
+        res = data.copy(deep=False)
+        res.index = tz_convert_many(data.index, to_tz=t_tz, from_tz=f_tz)
+        return res
+
+    idx = pd.DatetimeIndex(data)
+    return (idx.tz_convert(f_tz) if idx.tz else idx.tz_localize(f_tz)).tz_convert(t_tz)
 
 
 class TimeZone(dict):
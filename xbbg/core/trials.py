@@ -1,6 +1,13 @@
+import pandas as pd
+
 import os
+import threading
+
+from itertools import product
+from functools import lru_cache, partial
+from contextlib import contextmanager
 
-from xbbg.io import files, db
+from xbbg.io import files, db, storage, backends
 from xbbg.core import utils
 from xbbg.core.overrides import BBG_ROOT
 
@@ -16,6 +23,38 @@ TRIALS_TABLE = """
     )
 """
 
+NO_DATA_TABLE = """
+    CREATE TABLE IF NOT EXISTS no_data (
+        func varchar(20),
+        ticker varchar(50),
+        fld varchar(50),
+        ovrd varchar(500),
+        start_dt varchar(10),
+        end_dt varchar(10),
+        updated varchar(19),
+        PRIMARY KEY (func, ticker, fld, ovrd, start_dt, end_dt)
+    )
+"""
+
+# Number of trials with no data before giving up
+MAX_TRIALS = 2
+
+TRIAL_KEYS = ['func', 'ticker', 'dt', 'typ']
+SELECT_TRIALS = 'SELECT cnt FROM trials WHERE func = ? AND ticker = ? AND dt = ? AND typ = ?'
+REPLACE_TRIALS = 'REPLACE INTO trials VALUES (?, ?, ?, ?, ?)'
+REPLACE_NO_DATA = 'REPLACE INTO no_data VALUES (?, ?, ?, ?, ?, ?, ?)'
+SELECT_TRIALS_MANY = """
+    SELECT t.func, t.ticker, t.dt, t.typ, t.cnt FROM temp.trial_keys k
+    JOIN trials t ON t.func = k.func AND t.ticker = k.ticker AND t.dt = k.dt AND t.typ = k.typ
+"""
+
+# Days to remember queries with no data - 0 to disable (default),
+#   can be changed with `empty_ttl` of each query
+EMPTY_TTL = 0.
+SQL_VARS = 500
+
+_BUFFER_ = threading.local()
+
 
 def root_path() -> str:
     """
@@ -24,17 +63,47 @@ def root_path() -> str:
     return os.environ.get(BBG_ROOT, '').replace('\\', '/')
 
 
+def pool(create=True):
+    """
+    Connection pool of `BBG_ROOT/Logs/xbbg.db` (or database of logs
+    of current storage backend) - connections are kept
+    per thread and process, with tables created once for each of them
+
+    Args:
+        create: create database if not exists
+
+    Returns:
+        db.Pool or None if `BBG_ROOT` is not set
+        (or database does not exist and `create` is False)
+
+    Examples:
+        >>> import tempfile
+        >>>
+        >>> os.environ['BBG_ROOT'] = tempfile.mkdtemp()
+        >>> pool(create=False) is None
+        True
+        >>> pool() is pool()
+        True
+    """
+    db_file = backends.current().log_file('xbbg.db')
+    if not db_file: return None
+
+    if (not db.is_memory(db_file)) and (not files.exists(db_file)):
+        if not create: return None
+        files.create_folder(db_file, is_file=True)
+    return db.pool(db_file, init=[TRIALS_TABLE, NO_DATA_TABLE])
+
+
 def convert_exisiting():
     """
     Update existing missing logs to database
     """
-    data_path = root_path()
-    if not data_path: return
+    trials_db = pool()
+    if trials_db is None: return
 
-    with db.SQLite(f'{data_path}/Logs/xbbg.db') as con:
-        con.execute(TRIALS_TABLE)
-        for item in all_trials():
-            con.execute(db.replace_into(table='trials', **item))
+    trials_db.executemany(REPLACE_TRIALS, [
+        [item[col] for col in TRIAL_KEYS + ['cnt']] for item in all_trials()
+    ])
 
 
 def all_trials() -> dict:
@@ -44,12 +113,12 @@ def all_trials() -> dict:
     Yields:
         dict
     """
-    data_path = root_path()
-    if data_path:
-        for sub1 in files.all_folders(f'{data_path}/Logs/bdib'):
-            for sub2 in files.all_folders(sub1, has_date=True):
-                for sub3 in files.all_folders(sub2):
-                    cnt = len(files.all_files(sub3, ext='log'))
+    log_path = backends.current().log_file('bdib')
+    if log_path:
+        for sub1 in files.iter_folders(log_path):
+            for sub2 in files.iter_folders(sub1, has_date=True):
+                for sub3 in files.iter_folders(sub2):
+                    cnt = sum(1 for _ in files.iter_files(sub3, ext='log', full_path=False))
                     if cnt:
                         yield dict(
                             func='bdib',
@@ -72,7 +141,7 @@ def trail_info(**kwargs) -> dict:
         kwargs['ticker'] = kwargs['ticker'].replace('/', '_')
     for dt in ['dt', 'start_dt', 'end_dt', 'start_date', 'end_date']:
         if dt not in kwargs: continue
-        kwargs[dt] = utils.fmt_dt(kwargs[dt])
+        kwargs[dt] = _fmt_dt_(kwargs[dt])
     return kwargs
 
 
@@ -95,40 +164,131 @@ def num_trials(**kwargs) -> int:
 
     Returns:
         int: number of trials already tried
+
+    Examples:
+        >>> import tempfile
+        >>>
+        >>> os.environ['BBG_ROOT'] = tempfile.mkdtemp()
+        >>> trial_ = dict(func='bdib', ticker='ES1 Index', dt='2018-08-01', typ='TRADE')
+        >>> num_trials(**trial_)
+        0
+        >>> update_trials(**trial_)
+        >>> update_trials(**trial_)
+        >>> num_trials(**trial_)
+        2
     """
-    data_path = root_path()
-    if not data_path: return 0
+    info = trail_info(**kwargs)
+    buffer = getattr(_BUFFER_, 'trials', None) or {}
+    key = tuple(info.get(col, '') for col in TRIAL_KEYS)
+    if key in buffer: return buffer[key]
 
-    db_file = f'{data_path}/Logs/xbbg.db'
-    files.create_folder(db_file, is_file=True)
-    with db.SQLite(db_file) as con:
-        con.execute(TRIALS_TABLE)
-        num = con.execute(db.select(
-            table='trials',
-            **trail_info(**kwargs),
-        )).fetchall()
-        if not num: return 0
-        return num[0][-1]
+    trials_db = pool()
+    if trials_db is None: return 0
+    num = trials_db.execute(SELECT_TRIALS, key)
+    if not num: return 0
+    return num[0][0]
 
 
 def update_trials(**kwargs):
     """
-    Update number of trials for missing values
+    Update number of trials for missing values - buffered within `batch`
     """
-    data_path = root_path()
-    if not data_path: return
-
     if 'cnt' not in kwargs:
         kwargs['cnt'] = num_trials(**kwargs) + 1
 
-    db_file = f'{data_path}/Logs/xbbg.db'
-    files.create_folder(db_file, is_file=True)
-    with db.SQLite(db_file) as con:
-        con.execute(TRIALS_TABLE)
-        con.execute(db.replace_into(
-            table='trials',
-            **trail_info(**kwargs),
-        ))
+    info = trail_info(**kwargs)
+    key = tuple(info.get(col, '') for col in TRIAL_KEYS)
+    buffer = getattr(_BUFFER_, 'trials', None)
+    if buffer is not None: buffer[key] = info['cnt']
+
+    trials_db = pool()
+    if trials_db is None: return
+    trials_db.write(REPLACE_TRIALS, list(key) + [info['cnt']])
+
+
+def num_trials_many(keys) -> list:
+    """
+    Number of trials of many keys in one query
+
+    Args:
+        keys: list of (func, ticker, dt, typ)
+
+    Returns:
+        list: number of trials of each key
+
+    Examples:
+        >>> import tempfile
+        >>>
+        >>> os.environ['BBG_ROOT'] = tempfile.mkdtemp()
+        >>> with batch():
+        ...     update_trials(func='bdib', ticker='ES1 Index', dt='2018-08-01', typ='TRADE')
+        ...     num_trials_many([('bdib', 'ES1 Index', '20180801', 'TRADE')])
+        [1]
+        >>> update_trials(func='bdib', ticker='ES1 Index', dt='2018-08-01', typ='TRADE')
+        >>> num_trials_many([
+        ...     ('bdib', 'ES1 Index', pd.Timestamp('2018-08-01'), 'TRADE'),
+        ...     ('bdib', 'ES1 Index', '2018-08-02', 'TRADE'),
+        ... ])
+        [2, 0]
+    """
+    keys = [trial_key(*key) for key in keys]
+    if not keys: return []
+
+    found = dict()
+    trials_db = pool(create=False)
+    if trials_db is not None:
+        found.update(
+            (row[:4], row[4]) for row in
+            trials_db.run(partial(_select_many_, keys=set(keys)), write=False)
+        )
+    found.update(getattr(_BUFFER_, 'trials', None) or {})
+    return [found.get(key, 0) for key in keys]
+
+
+def trial_key(func: str, ticker: str, dt, typ: str) -> tuple:
+    """
+    Key of trials in database format
+
+    Examples:
+        >>> trial_key('bdib', 'XX/YY Curncy', '20180801', 'TRADE')
+        ('bdib', 'XX_YY Curncy', '2018-08-01', 'TRADE')
+    """
+    return func, ticker.replace('/', '_'), _fmt_dt_(dt), typ
+
+
+@lru_cache(maxsize=4096)
+def _fmt_dt_(dt) -> str:
+    """
+    Date in database format - cached as the same dates repeat across tickers
+    """
+    return utils.fmt_dt(dt)
+
+
+def _select_many_(con, keys) -> list:
+    """
+    Select trials of keys through temp table
+    """
+    con.execute('CREATE TEMP TABLE IF NOT EXISTS trial_keys (func, ticker, dt, typ)')
+    con.execute('DELETE FROM temp.trial_keys')
+    con.executemany('INSERT INTO temp.trial_keys VALUES (?, ?, ?, ?)', keys)
+    return con.execute(SELECT_TRIALS_MANY).fetchall()
+
+
+@contextmanager
+def batch():
+    """
+    Buffer trial updates of current thread and write them in one transaction at exit
+    """
+    trials_db = pool()
+    if (trials_db is None) or (getattr(_BUFFER_, 'trials', None) is not None):
+        yield
+        return
+
+    _BUFFER_.trials = dict()
+    try:
+        with trials_db.batch(): yield
+    finally:
+        _BUFFER_.trials = None
 
 
 def current_missing(**kwargs) -> int:
@@ -138,21 +298,158 @@ def current_missing(**kwargs) -> int:
     Returns:
         int: number of trials already tried
     """
-    data_path = root_path()
-    if not data_path: return 0
-    return len(files.all_files(f'{data_path}/Logs/{missing_info(**kwargs)}'))
+    log_path = backends.current().log_file(missing_info(**kwargs))
+    if not log_path: return 0
+    return sum(1 for _ in files.iter_files(log_path, full_path=False))
 
 
 def update_missing(**kwargs):
     """
     Update number of trials for missing values
     """
-    data_path = root_path()
-    if not data_path: return
     if len(kwargs) == 0: return
+    log_path = backends.current().log_file(missing_info(**kwargs))
+    if not log_path: return
 
-    log_path = f'{data_path}/Logs/{missing_info(**kwargs)}'
-
-    cnt = len(files.all_files(log_path)) + 1
+    cnt = sum(1 for _ in files.iter_files(log_path, full_path=False)) + 1
     files.create_folder(log_path)
     open(f'{log_path}/{cnt}.log', 'a').close()
+
+
+def no_data(func: str, tickers: list, flds: list, start_dt='', end_dt='', **kwargs) -> set:
+    """
+    Known (ticker, field) pairs with no data within `empty_ttl` days
+    for the same function and overrides - date range of previous empty query
+    must cover current date range (if given)
+
+    Args:
+        func: function name - bdp, bds or bdh
+        tickers: tickers
+        flds: fields
+        start_dt: start date (for historical queries)
+        end_dt: end date (for historical queries)
+        **kwargs:
+            empty_ttl: days to remember empty results - default `EMPTY_TTL` (disabled)
+            reload: ignore known empty results
+            other overrides
+
+    Returns:
+        set of (ticker, field)
+
+    Examples:
+        >>> import tempfile
+        >>>
+        >>> os.environ['BBG_ROOT'] = tempfile.mkdtemp()
+        >>> update_no_data(
+        ...     func='bdh', pairs=[('XXX US Equity', 'Px_Last')],
+        ...     start_dt='20180101', end_dt='20180301', adjust='all', empty_ttl=1,
+        ... )
+        >>> sorted(no_data(
+        ...     func='bdh', tickers=['XXX US Equity', 'AAPL US Equity'], flds=['Px_Last'],
+        ...     start_dt='20180102', end_dt='20180201', adjust='all', empty_ttl=1,
+        ... ))
+        [('XXX US Equity', 'Px_Last')]
+        >>> no_data(
+        ...     func='bdh', tickers=['XXX US Equity'], flds=['Px_Last'],
+        ...     start_dt='20180102', end_dt='20180401', adjust='all', empty_ttl=1,
+        ... )
+        set()
+        >>> no_data(
+        ...     func='bdh', tickers=['XXX US Equity'], flds=['Px_Last'],
+        ...     start_dt='20180102', end_dt='20180201', adjust='all', empty_ttl=1, reload=True,
+        ... )
+        set()
+        >>> # Disabled by default
+        >>> no_data(
+        ...     func='bdh', tickers=['XXX US Equity'], flds=['Px_Last'],
+        ...     start_dt='20180102', end_dt='20180201', adjust='all',
+        ... )
+        set()
+        >>> # Kept in database of logs of memory backend without `BBG_ROOT`
+        >>> _ = os.environ.pop('BBG_ROOT')
+        >>> os.environ['BBG_BACKEND'] = 'memory'
+        >>> update_no_data(func='bdp', pairs=[('XXX US Equity', 'Name')], empty_ttl=1)
+        >>> no_data(func='bdp', tickers=['XXX US Equity'], flds=['name'], empty_ttl=1)
+        {('XXX US Equity', 'name')}
+        >>> _ = os.environ.pop('BBG_BACKEND')
+    """
+    ttl = kwargs.get('empty_ttl', EMPTY_TTL)
+    if (not ttl) or kwargs.get('reload', False): return set()
+
+    trials_db = pool(create=False)
+    if trials_db is None: return set()
+
+    tickers = utils.flatten(tickers)
+    flds = {fld.lower(): fld for fld in utils.flatten(flds)}
+    updated = (
+        pd.Timestamp('now', tz='UTC') - pd.Timedelta(days=ttl)
+    ).strftime('%Y-%m-%d %H:%M:%S')
+    ovrd = storage.ref_key(**kwargs)
+
+    res = set()
+    for n in range(0, len(tickers), SQL_VARS):
+        sub = tickers[n:(n + SQL_VARS)]
+        qry = f"""
+            SELECT ticker, fld FROM no_data
+            WHERE func = ? AND ovrd = ? AND start_dt <= ? AND end_dt >= ?
+            AND updated >= ? AND ticker IN ({', '.join(['?'] * len(sub))})
+        """
+        for ticker, fld in trials_db.execute(qry, [func, ovrd, start_dt, end_dt, updated] + sub):
+            if fld.lower() in flds: res.add((ticker, flds[fld.lower()]))
+    return res
+
+
+def update_no_data(func: str, pairs, start_dt='', end_dt='', **kwargs):
+    """
+    Record (ticker, field) pairs with no data in one transaction -
+    only for complete responses from Bloomberg and if `empty_ttl` is set
+
+    Args:
+        func: function name - bdp, bds or bdh
+        pairs: list of (ticker, field)
+        start_dt: start date (for historical queries)
+        end_dt: end date (for historical queries)
+        **kwargs: overrides
+    """
+    if not kwargs.get('empty_ttl', EMPTY_TTL): return
+    pairs = list(pairs)
+    if not pairs: return
+    trials_db = pool()
+    if trials_db is None: return
+
+    updated = utils.cur_time(typ='time', tz='UTC')
+    ovrd = storage.ref_key(**kwargs)
+    trials_db.executemany(REPLACE_NO_DATA, [
+        (func, ticker, fld, ovrd, start_dt, end_dt, updated)
+        for ticker, fld in pairs
+    ])
+
+
+def empty_pairs(tickers, flds, data: pd.DataFrame) -> list:
+    """
+    (ticker, field) pairs without data in raw results
+
+    Args:
+        tickers: tickers
+        flds: fields
+        data: raw results from Bloomberg with columns of ticker and field
+
+    Returns:
+        list of (ticker, field)
+
+    Examples:
+        >>> res_ = pd.DataFrame([
+        ...     dict(ticker='SPY US Equity', field='NAME', value='SPDR S&P 500 ETF TRUST'),
+        ... ])
+        >>> empty_pairs(['SPY US Equity', 'XXX US Equity'], ['Name'], data=res_)
+        [('XXX US Equity', 'Name')]
+        >>> empty_pairs(['XXX US Equity'], ['Name'], data=pd.DataFrame())
+        [('XXX US Equity', 'Name')]
+    """
+    if data.empty or any(col not in data for col in ['ticker', 'field']): found = set()
+    else: found = set(zip(data.ticker, data.field.str.lower()))
+    return [
+        (ticker, fld)
+        for ticker, fld in product(utils.flatten(tickers), utils.flatten(flds))
+        if (ticker, fld.lower()) not in found
+    ]
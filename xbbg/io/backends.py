@@ -0,0 +1,397 @@
+import pandas as pd
+
+import os
+import pickle
+import threading
+
+from abc import ABC, abstractmethod
+from contextlib import contextmanager
+
+from xbbg.io import files, db, locks, formats
+from xbbg.core import overrides
+
+# Set os.environ['BBG_BACKEND'] = 'local' (default), 'sqlite' or 'memory'
+#     to choose where cached data is kept
+BBG_BACKEND = 'BBG_BACKEND'
+
+CACHE_TABLE = """
+    CREATE TABLE IF NOT EXISTS cache (
+        key     TEXT PRIMARY KEY,
+        data    BLOB,
+        updated TEXT
+    )
+"""
+SQL_VARS = 500
+
+# Root of cache keys of in-memory backend if `BBG_ROOT` is not set
+MEM_ROOT = 'memory:'
+
+_BACKENDS_ = dict()
+
+
+class StorageBackend(ABC):
+    """
+    Storage backend of cached data
+
+    Keys are locations from `storage.bar_file` / `storage.ref_file` under `root` -
+    backends other than local file system use them as plain keys.
+    Bulk variants loop over single operations unless backends
+    have faster ways to do them.
+    """
+
+    @property
+    def root(self) -> str:
+        """
+        Root of cache keys - `BBG_ROOT`, empty if data is not cached
+        """
+        return os.environ.get(overrides.BBG_ROOT, '').replace('\\', '/')
+
+    def log_file(self, name: str) -> str:
+        """
+        File of logs / indices next to cached data, e.g., database of trials -
+        under `root/Logs`, empty if not kept
+
+        Args:
+            name: file name
+        """
+        return f'{self.root}/Logs/{name}' if self.root else ''
+
+    @abstractmethod
+    def get(self, key: str, start=None, end=None, tz=None) -> pd.DataFrame:
+        """
+        Get data of key - empty DataFrame if not found
+
+        Args:
+            key: cache key
+            start: start time of intraday bars - None for beginning of data
+            end: end time of intraday bars - None for end of data
+            tz: timezone of start and end if not given
+        """
+
+    @abstractmethod
+    def put(self, key: str, data: pd.DataFrame, **kwargs):
+        """
+        Save data to key
+
+        Args:
+            key: cache key
+            data: data
+            **kwargs: cache writer settings - see `formats.CACHE_OPTS`
+        """
+
+    @abstractmethod
+    def exists(self, key: str) -> bool:
+        """
+        Whether key is cached
+        """
+
+    @abstractmethod
+    def list(self, prefix='') -> list:
+        """
+        Sorted keys starting with prefix
+        """
+
+    @abstractmethod
+    def delete(self, key: str):
+        """
+        Remove key from cache
+        """
+
+    def get_many(self, keys, **kwargs) -> dict:
+        """
+        Data of keys found in cache
+
+        Returns:
+            dict: key -> data
+        """
+        res = {}
+        for key in keys:
+            if not self.exists(key): continue
+            data = self.get(key, **kwargs)
+            if not data.empty: res[key] = data
+        return res
+
+    def put_many(self, items: dict, **kwargs):
+        """
+        Save data of multiple keys
+
+        Args:
+            items: key -> data
+            **kwargs: cache writer settings - see `formats.CACHE_OPTS`
+        """
+        for key, data in items.items(): self.put(key, data, **kwargs)
+
+    def exists_many(self, keys) -> list:
+        """
+        Whether each key is cached
+        """
+        return [self.exists(key) for key in keys]
+
+    def lock(self, key: str, **kwargs):
+        """
+        Lock key while downloading and saving data - across processes by default
+        """
+        return locks.key_lock(key, **kwargs)
+
+
+class LocalBackend(StorageBackend):
+    """
+    Local file system - parquet files for intraday bars and pickles otherwise
+
+    Examples:
+        >>> import tempfile
+        >>> from xbbg.tests import fixtures
+        >>>
+        >>> root_ = tempfile.mkdtemp().replace('\\\\', '/')
+        >>> fixtures.check_backend(LocalBackend(), root_)
+        [True, False]
+        ['/Equity/AAPL US Equity/DVD_Hist_All/ovrd=None.pkl', '/Equity/AAPL US Equity/TRADE/2018-11-02.parq']
+        (3, 6)
+        [True, True]
+    """
+
+    def get(self, key: str, start=None, end=None, tz=None) -> pd.DataFrame:
+        if not self.exists(key): return pd.DataFrame()
+        if key.endswith('.parq'):
+            return formats.read_bars(data_file=key, start=start, end=end, tz=tz)
+        return pd.DataFrame(formats.load_pickle(key))
+
+    def put(self, key: str, data: pd.DataFrame, **kwargs):
+        if not key: return
+        if key.endswith('.parq'): formats.save_parquet(data=data, data_file=key, **kwargs)
+        else: formats.save_pickle(data=data, data_file=key, **kwargs)
+
+    def exists(self, key: str) -> bool:
+        return bool(key) and os.path.isfile(key)
+
+    def list(self, prefix='') -> list:
+        path = prefix if os.path.isdir(prefix) else os.path.dirname(prefix)
+        if not os.path.isdir(path): return []
+        res = []
+        for cur_path, _, names in os.walk(path):
+            for name in names:
+                if name[0] == '~': continue
+                key = f'{cur_path}/{name}'.replace('\\', '/')
+                if key.startswith(prefix): res.append(key)
+        return sorted(res)
+
+    def delete(self, key: str):
+        if self.exists(key): os.remove(key)
+
+
+class SQLiteBackend(StorageBackend):
+    """
+    Single SQLite file - fewer files and faster lookups on network drives
+
+    Examples:
+        >>> import tempfile
+        >>> from xbbg.tests import fixtures
+        >>>
+        >>> root_ = tempfile.mkdtemp().replace('\\\\', '/')
+        >>> fixtures.check_backend(SQLiteBackend(f'{root_}/cache.db'), root_)
+        [True, False]
+        ['/Equity/AAPL US Equity/DVD_Hist_All/ovrd=None.pkl', '/Equity/AAPL US Equity/TRADE/2018-11-02.parq']
+        (3, 6)
+        [True, True]
+    """
+
+    def __init__(self, db_file=None):
+        """
+        Args:
+            db_file: database file - default `BBG_ROOT/Logs/cache.db`
+        """
+        self._db_file_ = db_file
+
+    @property
+    def db_file(self) -> str:
+        if self._db_file_: return self._db_file_
+        return self.log_file('cache.db')
+
+    def pool(self, create=True):
+        """
+        Connection pool of database - None if not kept
+        (or database does not exist and `create` is False)
+
+        Args:
+            create: create database if not exists
+        """
+        db_file = self.db_file
+        if not db_file: return None
+
+        if (not db.is_memory(db_file)) and (not files.exists(db_file)):
+            if not create: return None
+            files.create_folder(db_file, is_file=True)
+        return db.pool(db_file, init=[CACHE_TABLE])
+
+    def get(self, key: str, start=None, end=None, tz=None) -> pd.DataFrame:
+        return self.get_many([key], start=start, end=end, tz=tz).get(key, pd.DataFrame())
+
+    def put(self, key: str, data: pd.DataFrame, **kwargs):
+        self.put_many({key: data}, **kwargs)
+
+    def exists(self, key: str) -> bool:
+        return self.exists_many([key])[0]
+
+    def list(self, prefix='') -> list:
+        cache_db = self.pool(create=False)
+        if cache_db is None: return []
+        return [r[0] for r in cache_db.execute(
+            'SELECT key FROM cache WHERE substr(key, 1, ?) = ? ORDER BY key',
+            [len(prefix), prefix],
+        )]
+
+    def delete(self, key: str):
+        cache_db = self.pool(create=False)
+        if cache_db is not None: cache_db.execute('DELETE FROM cache WHERE key = ?', [key])
+
+    def get_many(self, keys, start=None, end=None, tz=None) -> dict:
+        res = {}
+        for key, blob in self._select_(keys, col='data'):
+            data = pickle.loads(blob)
+            if (start is not None) or (end is not None):
+                data = data.loc[slice(*formats.time_range(start=start, end=end, tz=tz))]
+            if not data.empty: res[key] = data
+        return res
+
+    def put_many(self, items: dict, **kwargs):
+        items = {key: data for key, data in items.items() if key}
+        if not items: return
+        cache_db = self.pool()
+        if cache_db is None: return
+
+        opts = formats.cache_opts(**kwargs)
+        updated = pd.Timestamp('now', tz='UTC').strftime('%Y-%m-%d %H:%M:%S')
+        cache_db.executemany('REPLACE INTO cache VALUES (?, ?, ?)', [
+            (
+                key,
+                pickle.dumps(
+                    formats.downcast(data) if opts['downcast'] else data,
+                    protocol=pickle.HIGHEST_PROTOCOL,
+                ),
+                updated,
+            )
+            for key, data in items.items()
+        ])
+
+    def exists_many(self, keys) -> list:
+        found = {key for key, _ in self._select_(keys, col='1')}
+        return [key in found for key in keys]
+
+    def _select_(self, keys, col: str) -> list:
+        """
+        Select column of keys in chunks of `SQL_VARS`
+        """
+        keys = [key for key in keys if key]
+        if not keys: return []
+        cache_db = self.pool(create=False)
+        if cache_db is None: return []
+
+        res = []
+        for n in range(0, len(keys), SQL_VARS):
+            sub = keys[n:(n + SQL_VARS)]
+            res.extend(cache_db.execute(
+                f'SELECT key, {col} FROM cache WHERE key IN ({", ".join(["?"] * len(sub))})',
+                sub,
+            ))
+        return res
+
+
+class MemoryBackend(StorageBackend):
+    """
+    In-process memory - for tests and short-lived sessions,
+    data is shared as is without copies
+
+    Nothing is written to disk: keys are under `MEM_ROOT` if `BBG_ROOT` is not set,
+    databases of logs (e.g., trials) are kept in shared memory and other logs are not kept
+
+    Examples:
+        >>> from xbbg.tests import fixtures
+        >>>
+        >>> fixtures.check_backend(MemoryBackend(), '/data/bbg')
+        [True, False]
+        ['/Equity/AAPL US Equity/DVD_Hist_All/ovrd=None.pkl', '/Equity/AAPL US Equity/TRADE/2018-11-02.parq']
+        (3, 6)
+        [True, True]
+        >>> from xbbg.io import storage
+        >>> from xbbg.core import trials
+        >>>
+        >>> os.environ['BBG_ROOT'], os.environ['BBG_BACKEND'] = '', 'memory'
+        >>> storage.bar_file('ES1 Index', dt='2018-08-01')
+        'memory:/Index/ES1 Index/TRADE/2018-08-01.parq'
+        >>> trial_ = dict(func='bdib', ticker='ES1 Index', dt='2018-08-01', typ='TRADE')
+        >>> trials.update_trials(**trial_)
+        >>> trials.num_trials(**trial_)
+        1
+        >>> db.is_memory(trials.pool().db_file)
+        True
+        >>> current().log_file('ref_keys.jsonl')
+        ''
+        >>> _ = os.environ.pop('BBG_BACKEND')
+    """
+
+    def __init__(self):
+        self._data_ = dict()
+        self._locks_ = dict()
+        self._mutex_ = threading.Lock()
+
+    @property
+    def root(self) -> str:
+        return super().root or MEM_ROOT
+
+    def log_file(self, name: str) -> str:
+        if not name.endswith('.db'): return ''
+        return f'file:xbbg-{id(self)}-{name}?mode=memory&cache=shared'
+
+    def get(self, key: str, start=None, end=None, tz=None) -> pd.DataFrame:
+        data = self._data_.get(key, pd.DataFrame())
+        if data.empty or ((start is None) and (end is None)): return data
+        return data.loc[slice(*formats.time_range(start=start, end=end, tz=tz))]
+
+    def put(self, key: str, data: pd.DataFrame, **kwargs):
+        if not key: return
+        self._data_[key] = formats.downcast(data) if formats.cache_opts(**kwargs)['downcast'] else data
+
+    def exists(self, key: str) -> bool:
+        return key in self._data_
+
+    def list(self, prefix='') -> list:
+        return sorted(key for key in list(self._data_) if key.startswith(prefix))
+
+    def delete(self, key: str):
+        self._data_.pop(key, None)
+
+    @contextmanager
+    def lock(self, key: str, **kwargs):
+        with self._mutex_:
+            lock = self._locks_.setdefault(key, threading.Lock())
+        with lock: yield True
+
+
+BACKENDS = dict(local=LocalBackend, sqlite=SQLiteBackend, memory=MemoryBackend)
+
+
+def current() -> StorageBackend:
+    """
+    Storage backend in use - set by `use` or `BBG_BACKEND` in `os.environ`
+
+    Examples:
+        >>> os.environ['BBG_BACKEND'] = 'memory'
+        >>> current().__class__.__name__
+        'MemoryBackend'
+        >>> use(LocalBackend())
+        >>> current().__class__.__name__
+        'LocalBackend'
+        >>> _ = os.environ.pop('BBG_BACKEND')
+    """
+    name = os.environ.get(BBG_BACKEND, 'local')
+    if name not in _BACKENDS_:
+        if name not in BACKENDS: raise KeyError(f'unknown storage backend: {name}')
+        _BACKENDS_[name] = BACKENDS[name]()
+    return _BACKENDS_[name]
+
+
+def use(backend: StorageBackend):
+    """
+    Use given backend instance for current `BBG_BACKEND`
+    """
+    _BACKENDS_[os.environ.get(BBG_BACKEND, 'local')] = backend
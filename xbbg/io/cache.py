@@ -0,0 +1,336 @@
+import pandas as pd
+import numpy as np
+
+import os
+import re
+
+from xbbg.io import files, logs, storage
+from xbbg.core import overrides
+
+EXC_FOLDERS = ['Logs', 'markets']
+BAR_FILE = re.compile(r'^(\d{4}-\d{2}-\d{2})\.parq$')
+ASOF_FILE = re.compile(r'^asof=(\d{4}-\d{2}-\d{2}), (.*)$')
+REF_KEY = re.compile(r'^ovrd=(None|[0-9a-f]{16})\.\w+$')
+CACHE_COLS = [
+    'path', 'asset', 'ticker', 'sub', 'name',
+    'kind', 'key', 'asof', 'bytes', 'atime', 'mtime',
+]
+UNITS = dict(B=1, KB=2 ** 10, MB=2 ** 20, GB=2 ** 30, TB=2 ** 40)
+
+
+def root_path() -> str:
+    """
+    Root data path of Bloomberg
+    """
+    return os.environ.get(overrides.BBG_ROOT, '').replace('\\', '/')
+
+
+def scan(root=None, workers=1) -> pd.DataFrame:
+    """
+    Scan all cached files under `BBG_ROOT`,
+    i.e., files of `BBG_ROOT/{asset}/{ticker}/{fld or typ}/`
+
+    Args:
+        root: root path - default `BBG_ROOT`
+        workers: number of threads to scan folders in parallel (for network drives)
+
+    Returns:
+        pd.DataFrame: one row per file with columns of `CACHE_COLS`
+            kind: `bar` for intraday bars, `ref` otherwise
+            key:  file name without `asof=` part (for refs) or typ (for bars)
+            asof: as-of date of refs or date of bars
+            last accessed / modified time are in seconds since epoch
+
+    Examples:
+        >>> from xbbg.tests import fixtures
+        >>>
+        >>> pd.options.display.width = 120
+        >>> pd.options.display.max_columns = 10
+        >>> tmp_ = fixtures.sample_cache()
+        >>> root_ = tmp_.name.replace('\\\\', '/')
+        >>> scan(root_).loc[:, ['ticker', 'sub', 'kind', 'key', 'asof', 'bytes']]
+                   ticker           sub kind                        key        asof  bytes
+        0  AAPL US Equity  DVD_Hist_All  ref  DVD_Start_Dt=20180101.pkl  2021-01-02     10
+        1  AAPL US Equity  DVD_Hist_All  ref  DVD_Start_Dt=20180101.pkl  2021-01-05     10
+        2  AAPL US Equity  DVD_Hist_All  ref  DVD_Start_Dt=20190101.pkl  2021-01-02     10
+        3  AAPL US Equity         TRADE  bar                      TRADE  2018-11-02    100
+        4  AAPL US Equity         TRADE  bar                      TRADE  2021-01-04    100
+        5       ES1 Index         TRADE  bar                      TRADE  2021-01-04    200
+        >>> tmp_.cleanup()
+    """
+    if root is None: root = root_path()
+    if not root or not os.path.isdir(root): return pd.DataFrame(columns=CACHE_COLS)
+
+    root = root.replace('\\', '/').rstrip('/')
+    recs = []
+    for entry in files.walk(
+        root, max_depth=4, workers=workers,
+        exclude=[f'{root}/{folder}' for folder in EXC_FOLDERS],
+    ):
+        path = entry.path.replace('\\', '/')
+        parts = path[len(root) + 1:].split('/')
+        if len(parts) != 4: continue
+        st = entry.stat()
+        recs.append((path, *parts, st.st_size, st.st_atime, st.st_mtime))
+
+    res = pd.DataFrame(recs, columns=[
+        'path', 'asset', 'ticker', 'sub', 'name', 'bytes', 'atime', 'mtime',
+    ])
+    if res.empty: return pd.DataFrame(columns=CACHE_COLS)
+
+    bars = res['name'].str.extract(BAR_FILE)[0]
+    refs = res['name'].str.extract(ASOF_FILE)
+    is_bar = bars.notna()
+    return (
+        res
+        .assign(
+            kind=np.where(is_bar, 'bar', 'ref'),
+            key=np.where(is_bar, res['sub'], refs[1].fillna(res['name'])),
+            asof=bars.fillna(refs[0]),
+        )
+        .sort_values(['asset', 'ticker', 'sub', 'key', 'asof'])
+        .reset_index(drop=True)
+        .loc[:, CACHE_COLS]
+    )
+
+
+def usage(by='asset', root=None, cache=None) -> pd.DataFrame:
+    """
+    Cache size accounting
+
+    Args:
+        by: column(s) to group by - asset, ticker, sub (field / typ) or kind
+        root: root path - default `BBG_ROOT`
+        cache: result of `scan` to avoid scanning again
+
+    Returns:
+        pd.DataFrame: number of files and bytes, largest first
+
+    Examples:
+        >>> from xbbg.tests import fixtures
+        >>>
+        >>> tmp_ = fixtures.sample_cache()
+        >>> root_ = tmp_.name
+        >>> usage(root=root_).reset_index()
+            asset  files  bytes
+        0  Equity      5    230
+        1   Index      1    200
+        >>> usage(by=['ticker', 'sub'], root=root_).reset_index()
+                   ticker           sub  files  bytes
+        0  AAPL US Equity         TRADE      2    200
+        1       ES1 Index         TRADE      1    200
+        2  AAPL US Equity  DVD_Hist_All      3     30
+        >>> tmp_.cleanup()
+    """
+    if cache is None: cache = scan(root=root)
+    return (
+        cache
+        .groupby(by)
+        .agg(files=('path', 'count'), bytes=('bytes', 'sum'))
+        .sort_values('bytes', ascending=False, kind='mergesort')
+    )
+
+
+def keep_latest(keep=1, root=None, cache=None, dry_run=False, **kwargs) -> pd.DataFrame:
+    """
+    Keep latest as-of files for each reference key and remove the rest
+
+    Args:
+        keep: number of latest as-of files to keep
+        root: root path - default `BBG_ROOT`
+        cache: result of `scan` to avoid scanning again
+        dry_run: only return files to be removed
+
+    Returns:
+        pd.DataFrame: removed files
+
+    Examples:
+        >>> from xbbg.tests import fixtures
+        >>>
+        >>> tmp_ = fixtures.sample_cache()
+        >>> root_ = tmp_.name
+        >>> keep_latest(root=root_).loc[:, ['key', 'asof']]
+                                 key        asof
+        0  DVD_Start_Dt=20180101.pkl  2021-01-02
+        >>> keep_latest(root=root_).empty
+        True
+        >>> tmp_.cleanup()
+    """
+    if cache is None: cache = scan(root=root)
+    refs = cache.loc[(cache.kind == 'ref') & cache['asof'].notna()]
+    rank = refs.groupby(['asset', 'ticker', 'sub', 'key'])['asof'].rank(method='first', ascending=False)
+    return remove(refs.loc[rank > keep], dry_run=dry_run, **kwargs)
+
+
+def keep_years(years, kind='bar', root=None, cache=None, dry_run=False, **kwargs) -> pd.DataFrame:
+    """
+    Remove files with dates older than N years
+
+    Args:
+        years: number of years to keep
+        kind: `bar` or `ref`
+        root: root path - default `BBG_ROOT`
+        cache: result of `scan` to avoid scanning again
+        dry_run: only return files to be removed
+
+    Returns:
+        pd.DataFrame: removed files
+
+    Examples:
+        >>> from xbbg.tests import fixtures
+        >>>
+        >>> tmp_ = fixtures.sample_cache()
+        >>> root_ = tmp_.name
+        >>> keep_years(years=1, root=root_, dry_run=True).loc[:, ['ticker', 'asof']]
+                   ticker        asof
+        3  AAPL US Equity  2018-11-02
+        4  AAPL US Equity  2021-01-04
+        5       ES1 Index  2021-01-04
+        >>> tmp_.cleanup()
+    """
+    if cache is None: cache = scan(root=root)
+    start_dt = (pd.Timestamp('today') - pd.DateOffset(years=years)).strftime('%Y-%m-%d')
+    old = cache.loc[(cache.kind == kind) & (cache['asof'] < start_dt)]
+    return remove(old, dry_run=dry_run, **kwargs)
+
+
+def evict(budget, root=None, cache=None, dry_run=False, **kwargs) -> pd.DataFrame:
+    """
+    Remove least recently used files until cache fits in budget
+
+    Last used time is the later of last accessed and last modified time -
+    be aware that last accessed time is updated at most once a day
+    on most file systems (`relatime`) and never with `noatime`
+
+    Args:
+        budget: max size of cache - number of bytes or str, e.g., 500MB, 2GB
+        root: root path - default `BBG_ROOT`
+        cache: result of `scan` to avoid scanning again
+        dry_run: only return files to be removed
+
+    Returns:
+        pd.DataFrame: removed files
+
+    Examples:
+        >>> from xbbg.tests import fixtures
+        >>>
+        >>> tmp_ = fixtures.sample_cache()
+        >>> root_ = tmp_.name
+        >>> evict(budget=300, root=root_).loc[:, ['ticker', 'asof', 'bytes']]
+                   ticker        asof  bytes
+        3  AAPL US Equity  2018-11-02    100
+        0  AAPL US Equity  2021-01-02     10
+        2  AAPL US Equity  2021-01-02     10
+        4  AAPL US Equity  2021-01-04    100
+        >>> usage(by='kind', root=root_)['bytes'].sum()
+        210
+        >>> tmp_.cleanup()
+    """
+    if cache is None: cache = scan(root=root)
+    last_used = np.maximum(cache.atime, cache.mtime).sort_values(kind='mergesort')
+    lru = cache.loc[last_used.index]
+    excess = lru['bytes'].sum() - parse_bytes(budget)
+    to_free = lru['bytes'].cumsum().shift(fill_value=0) < excess
+    return remove(lru.loc[to_free], dry_run=dry_run, **kwargs)
+
+
+def remove(cache: pd.DataFrame, dry_run=False, **kwargs) -> pd.DataFrame:
+    """
+    Remove files in cache list
+
+    Args:
+        cache: subset of result of `scan`
+        dry_run: only return files to be removed
+
+    Returns:
+        pd.DataFrame: removed files
+    """
+    logger = logs.get_logger(remove, **kwargs)
+    if dry_run or cache.empty: return cache
+
+    removed = []
+    for path in cache.path:
+        try:
+            os.remove(path)
+            removed.append(True)
+        except OSError as e:
+            logger.warning(f'cannot remove {path}: {e}')
+            removed.append(False)
+    num_bytes = cache['bytes'][removed].sum()
+    logger.info(f'removed {sum(removed)} files / {num_bytes} bytes')
+    return cache.loc[removed]
+
+
+def migrate_refs(root=None, cache=None, dry_run=False, **kwargs) -> pd.DataFrame:
+    """
+    Rename reference files from legacy names to canonical cache keys
+
+    Files with names not parsable or with canonical files already in place are kept
+
+    Args:
+        root: root path - default `BBG_ROOT`
+        cache: result of `scan` to avoid scanning again
+        dry_run: only return files to be renamed
+
+    Returns:
+        pd.DataFrame: renamed files with new names in column `new_path`
+
+    Examples:
+        >>> from xbbg.tests import fixtures
+        >>>
+        >>> tmp_ = fixtures.sample_cache()
+        >>> root_ = tmp_.name.replace('\\\\', '/')
+        >>> res = migrate_refs(root=root_)
+        >>> res['new_path'].str.split('/').str[-1].tolist()
+        ['asof=2021-01-02, ovrd=0caa7165138e5bd5.pkl', 'asof=2021-01-05, ovrd=0caa7165138e5bd5.pkl', 'asof=2021-01-02, ovrd=34dc771335abb765.pkl']
+        >>> scan(root_).query('kind == "ref"')['key'].unique().tolist()
+        ['ovrd=0caa7165138e5bd5.pkl', 'ovrd=34dc771335abb765.pkl']
+        >>> storage.ref_index(data_path=root_)['ovrd=34dc771335abb765']
+        {'dvd_start_dt': '20190101'}
+        >>> migrate_refs(root=root_).empty
+        True
+        >>> tmp_.cleanup()
+    """
+    logger = logs.get_logger(migrate_refs, **kwargs)
+    if root is None: root = root_path()
+    if cache is None: cache = scan(root=root)
+
+    refs = cache.loc[(cache.kind == 'ref') & ~cache['key'].str.match(REF_KEY)]
+    res = []
+    for path, key, asof in refs[['path', 'key', 'asof']].itertuples(index=False):
+        info, ext = os.path.splitext(key)
+        ovrd = storage.parse_info(info)
+        if not ovrd:
+            logger.warning(f'cannot parse overrides of {path} ...')
+            continue
+        new_key = storage.ref_key(**ovrd)
+        new_name = f'{new_key}{ext}' if pd.isna(asof) else f'asof={asof}, {new_key}{ext}'
+        new_path = f'{os.path.dirname(path)}/{new_name}'
+        if os.path.exists(new_path):
+            logger.warning(f'{new_path} already exists - keep {path} ...')
+            continue
+        if not dry_run:
+            storage.index_key(new_key, data_path=root, **ovrd)
+            os.replace(path, new_path)
+        res.append((path, new_path))
+
+    action = 'would rename' if dry_run else 'renamed'
+    logger.info(f'{action} {len(res)} files')
+    return pd.DataFrame(res, columns=['path', 'new_path'])
+
+
+def parse_bytes(size) -> int:
+    """
+    Parse size in bytes
+
+    Examples:
+        >>> parse_bytes(1024)
+        1024
+        >>> parse_bytes('500MB')
+        524288000
+        >>> parse_bytes('1.5 GB')
+        1610612736
+    """
+    if isinstance(size, (int, float)): return int(size)
+    num, unit = re.match(r'^\s*([\d.]+)\s*([KMGT]?B)?\s*$', size.upper()).groups()
+    return int(float(num) * UNITS[unit or 'B'])
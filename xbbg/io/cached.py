@@ -4,7 +4,7 @@ from itertools import product
 from collections import namedtuple
 
 from xbbg.core import utils
-from xbbg.io import files, logs, storage
+from xbbg.io import logs, storage, backends
 
 ToQuery = namedtuple('ToQuery', ['tickers', 'flds', 'cached_data'])
 EXC_COLS = ['tickers', 'flds', 'raw', 'log', 'col_maps']
@@ -32,15 +32,16 @@ def bdp_bds_cache(func, tickers, flds, **kwargs) -> ToQuery:
     flds = utils.flatten(flds)
     loaded = pd.DataFrame(data=0, index=tickers, columns=flds)
 
-    for ticker, fld in product(tickers, flds):
-        data_file = storage.ref_file(
-            ticker=ticker, fld=fld, ext='pkl', **{
-                k: v for k, v in kwargs.items() if k not in EXC_COLS
-            }
-        )
-        if not files.exists(data_file): continue
+    ref_kw = {k: v for k, v in kwargs.items() if k not in EXC_COLS}
+    data_files = {
+        (ticker, fld): storage.ref_file(ticker=ticker, fld=fld, ext='pkl', **ref_kw)
+        for ticker, fld in product(tickers, flds)
+    }
+    found = backends.current().get_many(list(filter(bool, data_files.values())))
+    for (ticker, fld), data_file in data_files.items():
+        if data_file not in found: continue
         logger.debug(f'reading from {data_file} ...')
-        cache_data.append(pd.read_pickle(data_file))
+        cache_data.append(found[data_file])
         loaded.loc[ticker, fld] = 1
 
     to_qry = loaded.where(loaded == 0)\
@@ -1,15 +1,30 @@
 import pandas as pd
 
+import os
+import time
 import sqlite3
 import json
+import threading
+
+from contextlib import contextmanager
 
 WAL_MODE = 'PRAGMA journal_mode=WAL'
 ALL_TABLES = 'SELECT name FROM sqlite_master WHERE type="table"'
 
+# Seconds to wait for locks held by other connections before `database is locked`,
+# then number of retries with exponential backoff starting from `RETRY_WAIT` seconds
+BUSY_TIMEOUT = 30.
+RETRIES = 5
+RETRY_WAIT = .1
+
+_POOLS_ = dict()
+_POOLS_LOCK_ = threading.Lock()
+
 
 class Singleton(type):
 
     _instances_ = {}
+    _lock_ = threading.Lock()
 
     def __call__(cls, *args, **kwargs):
         # Default values for class init
@@ -19,8 +34,9 @@ class Singleton(type):
 
         # Singleton instance
         key = json.dumps(kw)
-        if key not in cls._instances_:
-            cls._instances_[key] = super(Singleton, cls).__call__(**kw)
+        with cls._lock_:
+            if key not in cls._instances_:
+                cls._instances_[key] = super(Singleton, cls).__call__(**kw)
         return cls._instances_[key]
 
 
@@ -49,13 +65,36 @@ class SQLite(metaclass=Singleton):
         0      1
         1      2
         2      3
+        >>> [chunk.rowid.tolist() for chunk in db_.select_iter(table='xone', chunksize=2)]
+        [[1, 2], [3]]
+        >>> db_.select(table='xone', cond='rowid > 1', rowid=3)
+           rowid
+        0      3
+        >>> with SQLite(db_file_) as con_:
+        ...     _ = con_.execute('DROP TABLE IF EXISTS recent')
+        ...     _ = con_.execute('CREATE TABLE recent (name text, modified_date text)')
+        >>> db_.replace_into(table='recent', name='old', modified_date='2018-01-01')
+        >>> db_.replace_into(table='recent', name='new', modified_date=pd.Timestamp('today'))
+        >>> db_.select_recent(table='recent', dateperiod='1M').name.tolist()
+        ['new']
     """
 
     def __init__(self, db_file, keep_live=False):
 
         self.db_file = db_file
         self.keep_live = keep_live
-        self._con_ = None
+        self._local_ = threading.local()
+
+    @property
+    def _con_(self):
+        # Connections are kept per thread and cannot be shared by forked processes
+        if getattr(self._local_, 'pid', None) != os.getpid(): return None
+        return getattr(self._local_, 'con', None)
+
+    @_con_.setter
+    def _con_(self, con):
+        self._local_.con = con
+        self._local_.pid = os.getpid()
 
     def tables(self) -> list:
         """
@@ -71,10 +110,34 @@ class SQLite(metaclass=Singleton):
         SELECT query
         """
         keep_live = self.is_live
-        q_str = select(table=table, cond=cond, **kwargs)
-        data = self.con.execute(q_str).fetchall()
+        cur = self.con.execute(*select_params(table=table, cond=cond, **kwargs))
+        data = pd.DataFrame(cur.fetchall(), columns=[d[0] for d in cur.description])
         if not keep_live: self.close()
-        return pd.DataFrame(data, columns=self.columns(table=table))
+        return data
+
+    def select_iter(self, table: str, cond='', chunksize=10000, **kwargs):
+        """
+        SELECT query in chunks
+
+        Args:
+            table: table name
+            cond: conditions
+            chunksize: max number of rows of each chunk
+            **kwargs: other select criteria
+
+        Yields:
+            pd.DataFrame
+        """
+        keep_live = self.is_live
+        try:
+            cur = self.con.execute(*select_params(table=table, cond=cond, **kwargs))
+            cols = [d[0] for d in cur.description]
+            while True:
+                rows = cur.fetchmany(chunksize)
+                if not rows: break
+                yield pd.DataFrame(rows, columns=cols)
+        finally:
+            if not keep_live: self.close()
 
     def select_recent(
             self,
@@ -105,11 +168,13 @@ class SQLite(metaclass=Singleton):
             )[0]
             .strftime('%Y-%m-%d')
         )
-        return (
-            self.select(table=table, cond=cond, **kwargs)
-            .query(f'{date_col} >= {start_dt}')
-            .reset_index(drop=True)
-        )
+        keep_live = self.is_live
+        qry, params = select_params(table=table, cond=cond, **kwargs)
+        qry += f' {"AND" if "WHERE" in qry else "WHERE"} `{date_col}` >= ?'
+        cur = self.con.execute(qry, params + [start_dt])
+        data = pd.DataFrame(cur.fetchall(), columns=[d[0] for d in cur.description])
+        if not keep_live: self.close()
+        return data
 
     def columns(self, table: str):
         """
@@ -134,16 +199,17 @@ class SQLite(metaclass=Singleton):
             keep_live = self.is_live
             cols = ', '.join(map(lambda v: f'`{v}`', data.columns))
             vals = ', '.join(['?'] * data.shape[1])
-            # noinspection PyTypeChecker
             self.con.executemany(
                 f'REPLACE INTO `{table}` ({cols}) values ({vals})',
-                data.apply(tuple, axis=1).tolist()
+                data.itertuples(index=False, name=None),
             )
         else:
             keep_live = self.is_live or kwargs.get('_live_', False)
-            self.con.execute(replace_into(table=table, **{
-                k: v for k, v in kwargs.items() if k != '_live_'
-            }))
+            kwargs = {k: v for k, v in kwargs.items() if k != '_live_'}
+            self.con.execute(
+                replace_params(table=table, cols=list(kwargs)),
+                list(map(db_param, kwargs.values())),
+            )
         if not keep_live: self.close()
 
     @property
@@ -159,8 +225,7 @@ class SQLite(metaclass=Singleton):
     @property
     def con(self) -> sqlite3.Connection:
         if not self.is_live:
-            self._con_ = sqlite3.connect(self.db_file)
-            self._con_.execute(WAL_MODE)
+            self._con_ = connect(self.db_file, isolation_level='')
         return self._con_
 
     def close(self, keep_live=False):
@@ -179,6 +244,219 @@ class SQLite(metaclass=Singleton):
         self.close(keep_live=self.keep_live)
 
 
+def connect(db_file: str, isolation_level=None) -> sqlite3.Connection:
+    """
+    New connection with WAL and busy timeout
+
+    Args:
+        db_file: database file or `file:` URI, e.g., shared in-memory database
+        isolation_level: None for autocommit - see `sqlite3.connect`
+    """
+    con = sqlite3.connect(
+        db_file, timeout=BUSY_TIMEOUT, isolation_level=isolation_level, uri=True,
+    )
+    con.execute(f'PRAGMA busy_timeout={int(BUSY_TIMEOUT * 1000)}')
+    con.execute(WAL_MODE)
+    con.execute('PRAGMA synchronous=NORMAL')
+    return con
+
+
+def is_memory(db_file: str) -> bool:
+    """
+    Whether database is in memory
+
+    Examples:
+        >>> is_memory('file:xbbg?mode=memory&cache=shared'), is_memory('/data/bbg/Logs/xbbg.db')
+        (True, False)
+    """
+    return db_file.startswith('file:') and ('mode=memory' in db_file)
+
+
+def is_locked(e: Exception) -> bool:
+    """
+    Whether error is caused by locks of other connections
+    """
+    return isinstance(e, sqlite3.OperationalError) and any(
+        msg in str(e) for msg in ['locked', 'busy']
+    )
+
+
+class Pool(object):
+    """
+    Connections of one database - one per thread and process - in autocommit mode,
+    with retries when database is locked and batched writes
+
+    Examples:
+        >>> import tempfile
+        >>> from concurrent.futures import ThreadPoolExecutor
+        >>>
+        >>> db_file_ = f'{tempfile.mkdtemp()}/xbbg.db'
+        >>> pool_ = pool(db_file_, init=['CREATE TABLE IF NOT EXISTS xone (rowid int PRIMARY KEY)'])
+        >>> pool_ is pool(db_file_)
+        True
+        >>> with ThreadPoolExecutor(max_workers=4) as exe_:
+        ...     _ = list(exe_.map(lambda n: pool_.write('REPLACE INTO xone VALUES (?)', [n]), range(20)))
+        >>> pool_.execute('SELECT count(*) FROM xone')
+        [(20,)]
+        >>> with pool_.batch():
+        ...     for n in range(20, 30): pool_.write('REPLACE INTO xone VALUES (?)', [n])
+        ...     pool_.execute('SELECT count(*) FROM xone')
+        [(20,)]
+        >>> pool_.execute('SELECT count(*) FROM xone')
+        [(30,)]
+        >>> # Rows of `executemany` are written all or none
+        >>> pool_.executemany('INSERT INTO xone VALUES (?)', [[30], [31], [0]])
+        Traceback (most recent call last):
+        ...
+        sqlite3.IntegrityError: UNIQUE constraint failed: xone.rowid
+        >>> pool_.execute('SELECT count(*) FROM xone')
+        [(30,)]
+    """
+
+    def __init__(self, db_file: str, init=None):
+        """
+        Args:
+            db_file: database file
+            init: statements to run once for each new connection, e.g., CREATE TABLE
+        """
+        self.db_file = db_file
+        self.init = list(init or [])
+        self._local_ = threading.local()
+
+    def connection(self) -> sqlite3.Connection:
+        """
+        Connection of current thread
+        """
+        # Connections cannot be shared by forked processes
+        if getattr(self._local_, 'pid', None) != os.getpid():
+            self._local_.con = None
+            self._local_.pid = os.getpid()
+        con = getattr(self._local_, 'con', None)
+        if con is None:
+            con = connect(self.db_file)
+            for qry in self.init: retry(con.execute, qry)
+            self._local_.con = con
+        return con
+
+    def execute(self, qry: str, params=()) -> list:
+        """
+        Execute single statement (committed right away) with retries
+
+        Returns:
+            list: all rows
+        """
+        return retry(lambda: self.connection().execute(qry, params).fetchall())
+
+    def executemany(self, qry: str, rows):
+        """
+        Execute statement for many rows in one explicit transaction - connections
+        are in autocommit mode, where `with con:` would commit each row on its own
+        """
+        rows = list(rows)
+        if rows: self.run(lambda con: con.executemany(qry, rows))
+
+    def run(self, func, write=True):
+        """
+        Run func(connection) in one transaction - retried as a whole if locked
+
+        Args:
+            func: function of connection
+            write: take write lock at beginning of transaction to avoid deadlocks
+        """
+        def _run_():
+            con = self.connection()
+            con.execute('BEGIN IMMEDIATE' if write else 'BEGIN')
+            try:
+                res = func(con)
+                con.execute('COMMIT')
+                return res
+            except Exception:
+                con.execute('ROLLBACK')
+                raise
+
+        return retry(_run_)
+
+    def write(self, qry: str, params=()):
+        """
+        Write statement - buffered within `batch`
+        """
+        buffer = getattr(self._local_, 'buffer', None)
+        if buffer is not None: buffer.append((qry, params))
+        else: self.execute(qry, params)
+
+    @contextmanager
+    def batch(self):
+        """
+        Buffer writes of current thread and commit them in one transaction at exit
+        """
+        if getattr(self._local_, 'buffer', None) is not None:
+            yield
+            return
+
+        self._local_.buffer = []
+        try:
+            yield
+        finally:
+            buffer, self._local_.buffer = self._local_.buffer, None
+            if buffer: self.run(lambda con: _write_all_(con, buffer))
+
+
+def _write_all_(con: sqlite3.Connection, buffer: list):
+    """
+    Write buffered statements - consecutive rows of the same statement at once
+    """
+    n = 0
+    while n < len(buffer):
+        qry = buffer[n][0]
+        m = n
+        while (m < len(buffer)) and (buffer[m][0] == qry): m += 1
+        con.executemany(qry, [params for _, params in buffer[n:m]])
+        n = m
+
+
+def retry(func, *args, **kwargs):
+    """
+    Call func and retry with exponential backoff if database is locked
+    """
+    for n in range(RETRIES + 1):
+        try:
+            return func(*args, **kwargs)
+        except sqlite3.OperationalError as e:
+            if (not is_locked(e)) or (n == RETRIES): raise
+            time.sleep(RETRY_WAIT * 2 ** n)
+
+
+def pool(db_file: str, init=None) -> Pool:
+    """
+    Shared connection pool of database file
+
+    Args:
+        db_file: database file
+        init: statements to run once for each new connection -
+            must be the same as existing pool of the file (if given)
+
+    Raises:
+        ValueError: if pool of the file exists with different `init`
+
+    Examples:
+        >>> import tempfile
+        >>>
+        >>> db_file_ = f'{tempfile.mkdtemp()}/xbbg.db'
+        >>> pool_ = pool(db_file_, init=['CREATE TABLE IF NOT EXISTS xone (rowid int)'])
+        >>> pool(db_file_, init=['CREATE TABLE IF NOT EXISTS xone (rowid int)']) is pool_
+        True
+        >>> pool(db_file_, init=['CREATE TABLE IF NOT EXISTS xtwo (rowid int)'])
+        Traceback (most recent call last):
+        ...
+        ValueError: pool of ... exists with different init statements
+    """
+    with _POOLS_LOCK_:
+        if db_file not in _POOLS_: _POOLS_[db_file] = Pool(db_file=db_file, init=init)
+        elif (init is not None) and (list(init) != _POOLS_[db_file].init):
+            raise ValueError(f'pool of {db_file} exists with different init statements')
+        return _POOLS_[db_file]
+
+
 def db_value(val) -> str:
     """
     Database value as in query string
@@ -188,6 +466,57 @@ def db_value(val) -> str:
     return json.dumps(val, default=str)
 
 
+def db_param(val):
+    """
+    Database value as bound parameter
+
+    Examples:
+        >>> db_param(1), db_param('ES1 Index'), db_param(pd.Timestamp('2018-08-01'))
+        (1, 'ES1 Index', '2018-08-01 00:00:00')
+    """
+    if (val is None) or isinstance(val, (int, float, str, bytes)): return val
+    if hasattr(val, 'item'): return val.item()
+    return str(val)
+
+
+def select_params(table: str, cond='', **kwargs) -> tuple:
+    """
+    SELECT statement with bound parameters
+
+    Args:
+        table: table name
+        cond: conditions
+        **kwargs: data as kwargs
+
+    Returns:
+        tuple: (query, params)
+
+    Examples:
+        >>> select_params('daily', cond='price > 3000', ticker='ES1 Index')
+        ('SELECT * FROM `daily` WHERE price > 3000 AND `ticker` = ?', ['ES1 Index'])
+        >>> select_params('daily')
+        ('SELECT * FROM `daily`', [])
+    """
+    where = ' AND '.join(filter(bool, [cond] + [f'`{key}` = ?' for key in kwargs]))
+    qry = f'SELECT * FROM `{table}`'
+    if where: qry += f' WHERE {where}'
+    return qry, list(map(db_param, kwargs.values()))
+
+
+def replace_params(table: str, cols: list) -> str:
+    """
+    REPLACE INTO statement with bound parameters
+
+    Examples:
+        >>> replace_params('daily', cols=['ticker', 'price'])
+        'REPLACE INTO `daily` (`ticker`, `price`) VALUES (?, ?)'
+    """
+    return (
+        f'REPLACE INTO `{table}` ({", ".join(f"`{col}`" for col in cols)}) '
+        f'VALUES ({", ".join(["?"] * len(cols))})'
+    )
+
+
 def select(table: str, cond='', **kwargs) -> str:
     """
     Query string of SELECT statement
@@ -3,9 +3,12 @@ import pandas as pd
 import os
 import re
 import time
+import fnmatch
+import threading
 
-from typing import List
+from typing import List, Iterator
 from pathlib import Path
+from contextlib import contextmanager
 
 DATE_FMT = r'\d{4}-(0?[1-9]|1[012])-(0?[1-9]|[12][0-9]|3[01])'
 
@@ -18,7 +21,7 @@ def exists(path) -> bool:
         path: path or file
     """
     if not path: return False
-    return Path(path).is_dir() or Path(path).is_file()
+    return os.path.exists(path)
 
 
 def abspath(cur_file, parent=0) -> Path:
@@ -50,6 +53,41 @@ def create_folder(path_name: str, is_file=False):
     p.mkdir(parents=True, exist_ok=True)
 
 
+@contextmanager
+def atomic(path_name: str):
+    """
+    Write to temp file in the same folder and rename to `path_name` when done,
+    so that readers never see partially written files
+
+    Args:
+        path_name: full path name
+
+    Yields:
+        str: temp file name to write to
+
+    Examples:
+        >>> import tempfile
+        >>>
+        >>> tmp_path = tempfile.mkdtemp()
+        >>> with atomic(f'{tmp_path}/sample.txt') as tmp_file:
+        ...     with open(tmp_file, 'w') as fp: _ = fp.write('sample')
+        ...     exists(f'{tmp_path}/sample.txt')
+        False
+        >>> exists(f'{tmp_path}/sample.txt')
+        True
+        >>> all_files(tmp_path, full_path=False)
+        ['sample.txt']
+    """
+    create_folder(path_name, is_file=True)
+    p = Path(path_name)
+    tmp_file = str(p.parent / f'~{p.name}.{os.getpid()}.{threading.get_ident()}.tmp')
+    try:
+        yield tmp_file
+        os.replace(tmp_file, path_name)
+    finally:
+        if os.path.exists(tmp_file): os.remove(tmp_file)
+
+
 def all_files(
         path_name, keyword='', ext='', full_path=True,
         has_date=False, date_fmt=DATE_FMT
@@ -69,17 +107,10 @@ def all_files(
     Returns:
         list: all file names with criteria fulfilled
     """
-    p = Path(path_name)
-    if not p.is_dir(): return []
-
-    keyword = f'*{keyword}*' if keyword else '*'
-    keyword += f'.{ext}' if ext else '.*'
-    r = re.compile(f'.*{date_fmt}.*')
-    return [
-        str(f).replace('\\', '/') if full_path else f.name
-        for f in p.glob(keyword)
-        if f.is_file() and (f.name[0] != '~') and ((not has_date) or r.match(f.name))
-    ]
+    return list(iter_files(
+        path_name=path_name, keyword=keyword, ext=ext, full_path=full_path,
+        has_date=has_date, date_fmt=date_fmt,
+    ))
 
 
 def all_folders(
@@ -98,15 +129,134 @@ def all_folders(
     Returns:
         list: all folder names fulfilled criteria
     """
-    p = Path(path_name)
-    if not p.is_dir(): return []
+    return list(iter_folders(
+        path_name=path_name, keyword=keyword, has_date=has_date, date_fmt=date_fmt,
+    ))
 
+
+def iter_files(
+        path_name, keyword='', ext='', full_path=True,
+        has_date=False, date_fmt=DATE_FMT
+) -> Iterator[str]:
+    """
+    Iterate files with criteria - same as `all_files` but as generator
+
+    Examples:
+        >>> sorted(iter_files(f'{abspath(__file__, 1)}/tests/data', keyword='rms', full_path=False))
+        ['sample_rms_ib0.pkl', 'sample_rms_ib1.pkl']
+        >>> list(iter_files(f'{abspath(__file__, 1)}/tests/data', ext='parq', has_date=True))
+        []
+    """
+    pattern = (f'*{keyword}*' if keyword else '*') + (f'.{ext}' if ext else '.*')
     r = re.compile(f'.*{date_fmt}.*')
-    return [
-        str(f).replace('\\', '/')
-        for f in p.glob(f'*{keyword}*' if keyword else '*')
-        if f.is_dir() and (f.name[0] != '~') and ((not has_date) or r.match(f.name))
-    ]
+    for entry in scan_dir(path_name):
+        if not entry.is_file(): continue
+        if not fnmatch.fnmatch(entry.name, pattern): continue
+        if has_date and (not r.match(entry.name)): continue
+        yield entry.path.replace('\\', '/') if full_path else entry.name
+
+
+def iter_folders(
+        path_name, keyword='', has_date=False, date_fmt=DATE_FMT
+) -> Iterator[str]:
+    """
+    Iterate folders with criteria - same as `all_folders` but as generator
+
+    Examples:
+        >>> [f.split('/')[-1] for f in iter_folders(f'{abspath(__file__, 1)}/tests/data')]
+        ['Equity']
+    """
+    pattern = f'*{keyword}*' if keyword else '*'
+    r = re.compile(f'.*{date_fmt}.*')
+    for entry in scan_dir(path_name):
+        if not entry.is_dir(): continue
+        if not fnmatch.fnmatch(entry.name, pattern): continue
+        if has_date and (not r.match(entry.name)): continue
+        yield entry.path.replace('\\', '/')
+
+
+def scan_dir(path_name) -> Iterator[os.DirEntry]:
+    """
+    Entries of folder (temp entries excluded) - types of `DirEntry`
+    come from directory listing and stats are cached, so no extra system calls
+
+    Args:
+        path_name: full path name
+
+    Yields:
+        os.DirEntry
+    """
+    try:
+        with os.scandir(path_name) as it:
+            for entry in it:
+                if entry.name[0] != '~': yield entry
+    except (FileNotFoundError, NotADirectoryError, PermissionError):
+        return
+
+
+def walk(path_name, max_depth=None, workers=1, exclude=()) -> Iterator[os.DirEntry]:
+    """
+    Files under folder recursively (hidden and temp entries excluded)
+
+    Args:
+        path_name: full path name
+        max_depth: max levels of folders to go into - 1 for files of path only
+        workers: number of threads to scan folders in parallel,
+                 useful on network drives with high latency
+        exclude: folders to skip (full path names)
+
+    Yields:
+        os.DirEntry: in no particular order if workers > 1
+
+    Examples:
+        >>> data_path = f'{abspath(__file__, 1)}/tests/data'
+        >>> len(list(walk(data_path, max_depth=1))) > 10
+        True
+        >>> sorted(e.name for e in walk(data_path, workers=4)) == sorted(
+        ...     e.name for e in walk(data_path)
+        ... )
+        True
+        >>> list(walk(f'{data_path}/not_exists'))
+        []
+    """
+    exclude = {str(p).replace('\\', '/').rstrip('/') for p in exclude}
+    if workers <= 1:
+        stack = [(path_name, 1)]
+        while stack:
+            cur_path, depth = stack.pop()
+            file_entries, dir_entries = _scan_(cur_path, exclude)
+            yield from file_entries
+            if (max_depth is None) or (depth < max_depth):
+                stack.extend((d.path, depth + 1) for d in dir_entries)
+        return
+
+    from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        pending = {pool.submit(_scan_, path_name, exclude): 1}
+        while pending:
+            done, _ = wait(list(pending), return_when=FIRST_COMPLETED)
+            for fut in done:
+                depth = pending.pop(fut)
+                file_entries, dir_entries = fut.result()
+                yield from file_entries
+                if (max_depth is None) or (depth < max_depth):
+                    for d in dir_entries:
+                        pending[pool.submit(_scan_, d.path, exclude)] = depth + 1
+
+
+def _scan_(path_name, exclude) -> tuple:
+    """
+    Files and sub folders of folder
+    """
+    file_entries, dir_entries = [], []
+    for entry in scan_dir(path_name):
+        if entry.name[0] == '.': continue
+        if entry.is_dir():
+            if entry.path.replace('\\', '/') not in exclude: dir_entries.append(entry)
+        elif entry.is_file():
+            file_entries.append(entry)
+    return file_entries, dir_entries
 
 
 def sort_by_modified(files_or_folders: list) -> list:
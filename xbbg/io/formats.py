@@ -0,0 +1,284 @@
+import pandas as pd
+import numpy as np
+
+from xbbg.io import files
+
+PKG_PATH = files.abspath(__file__, 1)
+
+# Cache writer settings - can be updated once per deployment, e.g.,
+#   formats.CACHE_OPTS.update(codec='zstd', codec_level=3)
+# or passed as kwargs of each query
+#
+#   codec:       parquet compression - snappy, zstd, lz4, gzip, brotli or None
+#   codec_level: compression level (only for codecs supporting levels)
+#   use_dict:    dictionary encoding for parquet columns
+#   row_group:   max number of rows per parquet row group (None = pyarrow default)
+#   downcast:    downcast numeric columns (float64 -> float32 only if all values are unchanged)
+#   pkl_codec:   pickle compression - gzip, bz2, xz, zstd or None
+CACHE_OPTS = dict(
+    codec='snappy',
+    codec_level=None,
+    use_dict=True,
+    row_group=None,
+    downcast=False,
+    pkl_codec=None,
+)
+
+PKL_MAGIC = {
+    b'\x1f\x8b': 'gzip',
+    b'BZh': 'bz2',
+    b'\xfd7zXZ\x00': 'xz',
+    b'\x28\xb5\x2f\xfd': 'zstd',
+}
+
+
+def read_bars(data_file: str, start=None, end=None, tz=None) -> pd.DataFrame:
+    """
+    Read intraday bars within time range - only row groups overlapping with
+    the range (from min / max statistics of time index) are loaded
+
+    Args:
+        data_file: file location
+        start: start time - None for beginning of data
+        end: end time - None for end of data
+        tz: timezone of start and end if not given
+
+    Returns:
+        pd.DataFrame
+
+    Examples:
+        >>> import tempfile
+        >>>
+        >>> sample = pd.read_parquet(f'{PKG_PATH}/tests/data/aapl.parq')
+        >>> tmp_file = f'{tempfile.mkdtemp()}/aapl.parq'
+        >>> save_parquet(sample, tmp_file, row_group=10)
+        >>> read_bars(tmp_file, '2018-11-02 15:45', '2018-11-02 15:47', tz='America/New_York')
+                                     open     high     low   close  volume  numEvents
+        2018-11-02 15:45:00-04:00  206.09  206.200  205.89  205.94  193197       1040
+        2018-11-02 15:46:00-04:00  205.93  205.945  205.75  205.82  140783        873
+        2018-11-02 15:47:00-04:00  205.82  206.010  205.76  205.77  192227       1161
+        >>> read_bars(tmp_file, '2018-11-02 15:58', tz='America/New_York').shape
+        (2, 6)
+        >>> read_bars(tmp_file).shape
+        (29, 6)
+    """
+    import pyarrow.parquet as pq
+
+    t_rng = time_range(start=start, end=end, tz=tz)
+    pf = pq.ParquetFile(data_file)
+    if (start is None) and (end is None): data = pf.read().to_pandas()
+    else: data = pf.read_row_groups(row_groups(pf, *t_rng)).to_pandas()
+
+    if data.empty: return data
+    return data.loc[t_rng[0]:t_rng[1]]
+
+
+def row_groups(pf, start=None, end=None) -> list:
+    """
+    Row groups of parquet file overlapping with time range
+    (all row groups if time index has no statistics)
+
+    Args:
+        pf: pyarrow.parquet.ParquetFile
+        start: start time - None for beginning of data
+        end: end time - None for end of data
+
+    Returns:
+        list
+
+    Examples:
+        >>> import tempfile
+        >>> import pyarrow.parquet as pq
+        >>>
+        >>> sample = pd.read_parquet(f'{PKG_PATH}/tests/data/aapl.parq')
+        >>> tmp_ = tempfile.TemporaryDirectory()
+        >>> save_parquet(sample, f'{tmp_.name}/aapl.parq', row_group=10)
+        >>> pf_ = pq.ParquetFile(f'{tmp_.name}/aapl.parq')
+        >>> pf_.num_row_groups
+        3
+        >>> row_groups(pf_, *time_range('2018-11-02 15:45', '2018-11-02 15:47', tz='America/New_York'))
+        [1]
+        >>> row_groups(pf_, *time_range('2018-11-02 19:38', '2018-11-02 19:42', tz='UTC'))
+        [0, 1]
+        >>> row_groups(pf_, *time_range(end='2018-11-02 15:30', tz='America/New_York'))
+        []
+        >>> tmp_.cleanup()
+    """
+    idx_cols = (pf.schema_arrow.pandas_metadata or {}).get('index_columns', [])
+    if (not idx_cols) or (not isinstance(idx_cols[0], str)): return list(range(pf.num_row_groups))
+
+    col = pf.schema_arrow.get_field_index(idx_cols[0])
+    typ = pf.schema_arrow.field(col).type
+    return [
+        rg for rg in range(pf.num_row_groups)
+        if _overlap_(pf.metadata.row_group(rg).column(col).statistics, typ, start, end)
+    ]
+
+
+def time_range(start=None, end=None, tz=None) -> list:
+    """
+    Start and end time as timestamps - tz is used if not given in start / end
+
+    Examples:
+        >>> time_range('2018-11-02 09:30', tz='America/New_York')
+        [Timestamp('2018-11-02 09:30:00-0400', tz='America/New_York'), None]
+    """
+    return [
+        None if t is None else (
+            pd.Timestamp(t, tz=tz) if pd.Timestamp(t).tz is None else pd.Timestamp(t)
+        )
+        for t in [start, end]
+    ]
+
+
+def _overlap_(stats, typ, start, end) -> bool:
+    """
+    Whether row group statistics overlap with time range
+    """
+    if (stats is None) or (not stats.has_min_max): return True
+    rg_min, rg_max = _stat_time_(stats.min, typ), _stat_time_(stats.max, typ)
+    if (start is not None) and (rg_max < _as_of_(start, rg_max)): return False
+    if (end is not None) and (rg_min > _as_of_(end, rg_min)): return False
+    return True
+
+
+def _stat_time_(value, typ) -> pd.Timestamp:
+    """
+    Statistics of time index in timezone of data - depending on pyarrow versions,
+    statistics are given as int (in unit of column) or datetime (naive or in UTC)
+
+    Examples:
+        >>> import pyarrow as pa
+        >>>
+        >>> ny_ = pa.timestamp('ns', tz='America/New_York')
+        >>> _stat_time_(1541187060000000000, ny_)
+        Timestamp('2018-11-02 15:31:00-0400', tz='America/New_York')
+        >>> _stat_time_(pd.Timestamp('2018-11-02 19:31').to_pydatetime(), ny_)
+        Timestamp('2018-11-02 15:31:00-0400', tz='America/New_York')
+        >>> _stat_time_(pd.Timestamp('2018-11-02 19:31', tz='UTC'), ny_)
+        Timestamp('2018-11-02 15:31:00-0400', tz='America/New_York')
+        >>> _stat_time_(1541187060000, pa.timestamp('ms'))
+        Timestamp('2018-11-02 19:31:00')
+    """
+    tz = getattr(typ, 'tz', None)
+    if isinstance(value, (int, np.integer)): res = pd.Timestamp(int(value), unit=getattr(typ, 'unit', 'ns'))
+    else: res = pd.Timestamp(value)
+    if not tz: return res.tz_localize(None) if res.tz else res
+    # Time of tz-aware columns is stored in UTC
+    return (res if res.tz else res.tz_localize('UTC')).tz_convert(tz)
+
+
+def _as_of_(t: pd.Timestamp, ref: pd.Timestamp) -> pd.Timestamp:
+    """
+    Time comparable with reference - wall time for tz-naive data
+    """
+    if ref.tz is None: return t.tz_localize(None) if t.tz else t
+    return t if t.tz else t.tz_localize(ref.tz)
+
+
+def cache_opts(**kwargs) -> dict:
+    """
+    Cache writer settings - kwargs take priority over `CACHE_OPTS`
+
+    Returns:
+        dict
+
+    Examples:
+        >>> cache_opts(codec='zstd', codec_level=3, DVD_Start_Dt='20180101')
+        {'codec': 'zstd', 'codec_level': 3, 'use_dict': True, 'row_group': None, 'downcast': False, 'pkl_codec': None}
+    """
+    return {k: kwargs.get(k, v) for k, v in CACHE_OPTS.items()}
+
+
+def downcast(data: pd.DataFrame) -> pd.DataFrame:
+    """
+    Downcast numeric columns to smallest dtypes without loss of information -
+    float columns are only downcast if all values are exactly representable
+
+    Args:
+        data: pd.DataFrame
+
+    Returns:
+        pd.DataFrame
+
+    Examples:
+        >>> sample = pd.read_parquet(f'{PKG_PATH}/tests/data/aapl.parq')
+        >>> sample.pipe(downcast).dtypes
+        open         float64
+        high         float64
+        low          float64
+        close        float64
+        volume         int32
+        numEvents      int16
+        dtype: object
+        >>> pd.DataFrame({'px': [1.5, np.nan, .25], 'yld': [.1, .2, .3]}).pipe(downcast).dtypes
+        px     float32
+        yld    float64
+        dtype: object
+    """
+    res = data.copy()
+    for col, dtyp in data.dtypes.items():
+        if dtyp.kind == 'f':
+            values = data[col].to_numpy()
+            # Same as np.array_equal(..., equal_nan=True), which needs numpy >= 1.19
+            back, na = values.astype('float32').astype(values.dtype), np.isnan(values)
+            if (np.isnan(back) == na).all() and (back[~na] == values[~na]).all():
+                res[col] = values.astype('float32')
+        elif dtyp.kind in 'iu': res[col] = pd.to_numeric(data[col], downcast='integer')
+    return res
+
+
+def save_parquet(data: pd.DataFrame, data_file: str, **kwargs):
+    """
+    Save data as parquet with cache writer settings
+
+    Args:
+        data: data
+        data_file: file location
+        **kwargs: cache writer settings - see `CACHE_OPTS`
+    """
+    opts = cache_opts(**kwargs)
+    if opts['downcast']: data = downcast(data)
+
+    pq_kw = dict(compression=opts['codec'], use_dictionary=opts['use_dict'])
+    if opts['codec_level'] is not None: pq_kw['compression_level'] = opts['codec_level']
+    if opts['row_group']: pq_kw['row_group_size'] = opts['row_group']
+
+    with files.atomic(data_file) as tmp_file:
+        data.to_parquet(tmp_file, **pq_kw)
+
+
+def save_pickle(data: pd.DataFrame, data_file: str, **kwargs):
+    """
+    Save data as pickle with cache writer settings
+
+    Args:
+        data: data
+        data_file: file location
+        **kwargs: cache writer settings - see `CACHE_OPTS`
+    """
+    opts = cache_opts(**kwargs)
+    if opts['downcast']: data = downcast(data)
+
+    with files.atomic(data_file) as tmp_file:
+        data.to_pickle(tmp_file, compression=opts['pkl_codec'])
+
+
+def load_pickle(data_file: str) -> pd.DataFrame:
+    """
+    Load pickle file - compression is detected from file header
+
+    Args:
+        data_file: file location
+
+    Returns:
+        pd.DataFrame
+
+    Examples:
+        >>> sample = load_pickle(f'{PKG_PATH}/tests/data/sample_bdp.pkl')
+        >>> sample.ticker.tolist()
+        ['SPY US Equity', 'QQQ US Equity']
+    """
+    with open(data_file, 'rb') as fp: header = fp.read(6)
+    codec = next((c for m, c in PKL_MAGIC.items() if header.startswith(m)), None)
+    return pd.read_pickle(data_file, compression=codec)
@@ -0,0 +1,157 @@
+import os
+import time
+import hashlib
+
+from contextlib import contextmanager
+
+from xbbg.io import files, logs
+from xbbg.core import overrides
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+    import msvcrt
+
+# Locks are striped - keys share `LOCK_STRIPES` lock files
+#   so that number of lock files stays bounded
+LOCK_STRIPES = 1024
+LOCK_TIMEOUT = 60.
+LOCK_INTERVAL = .1
+
+
+class FileLock(object):
+    """
+    Advisory inter-process lock based on lock file,
+    released automatically by OS if process dies
+
+    Examples:
+        >>> import tempfile
+        >>>
+        >>> tmp_ = tempfile.TemporaryDirectory()
+        >>> lock_file_ = f'{tmp_.name}/sample.lock'
+        >>> with FileLock(lock_file_) as lock_:
+        ...     lock_.locked
+        ...     FileLock(lock_file_, timeout=.2).acquire()
+        True
+        False
+        >>> with FileLock(lock_file_, timeout=.2) as lock_:
+        ...     lock_.locked
+        True
+        >>> tmp_.cleanup()
+    """
+
+    def __init__(self, lock_file: str, timeout=LOCK_TIMEOUT, interval=LOCK_INTERVAL):
+        """
+        Args:
+            lock_file: lock file name
+            timeout: max seconds to wait for lock - None to wait forever
+            interval: seconds between trials
+        """
+        self.lock_file = lock_file
+        self.timeout = timeout
+        self.interval = interval
+        self._fd_ = None
+
+    @property
+    def locked(self) -> bool:
+        return self._fd_ is not None
+
+    def acquire(self) -> bool:
+        """
+        Acquire lock - wait up to `timeout` seconds
+
+        Returns:
+            bool: whether lock is acquired
+        """
+        if self.locked: return True
+        files.create_folder(self.lock_file, is_file=True)
+        start = time.monotonic()
+        while True:
+            fd = os.open(self.lock_file, os.O_RDWR | os.O_CREAT)
+            try:
+                if fcntl: fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                else: msvcrt.locking(fd, msvcrt.LK_NBLCK, 1)
+                self._fd_ = fd
+                return True
+            except OSError:
+                os.close(fd)
+            if (self.timeout is not None) and (time.monotonic() - start >= self.timeout):
+                return False
+            time.sleep(self.interval)
+
+    def release(self):
+        """
+        Release lock
+        """
+        if not self.locked: return
+        try:
+            if fcntl: fcntl.flock(self._fd_, fcntl.LOCK_UN)
+            else:
+                os.lseek(self._fd_, 0, os.SEEK_SET)
+                msvcrt.locking(self._fd_, msvcrt.LK_UNLCK, 1)
+        finally:
+            os.close(self._fd_)
+            self._fd_ = None
+
+    def __enter__(self):
+        self.acquire()
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.release()
+
+
+def lock_file(key: str) -> str:
+    """
+    Lock file for given cache key (file name) under `BBG_ROOT/Logs/locks` -
+    one of `LOCK_STRIPES` files picked by hash of key
+
+    Args:
+        key: cache key
+
+    Returns:
+        str: lock file name - empty if `BBG_ROOT` is not defined
+
+    Examples:
+        >>> os.environ['BBG_ROOT'] = ''
+        >>> lock_file('/data/bbg/Index/ES1 Index/TRADE/2018-08-01.parq')
+        ''
+        >>> os.environ['BBG_ROOT'] = '/data/bbg'
+        >>> lock_file('/data/bbg/Index/ES1 Index/TRADE/2018-08-01.parq')
+        '/data/bbg/Logs/locks/0587.lock'
+    """
+    data_path = os.environ.get(overrides.BBG_ROOT, '').replace('\\', '/')
+    if (not data_path) or (not key): return ''
+    stripe = int(hashlib.md5(key.encode('utf-8')).hexdigest(), 16) % LOCK_STRIPES
+    return f'{data_path}/Logs/locks/{stripe:04d}.lock'
+
+
+@contextmanager
+def key_lock(key: str, **kwargs):
+    """
+    Lock cache key across processes, e.g., while downloading and saving data,
+    so that other processes asking for the same key wait and read from cache
+    instead of querying Bloomberg again
+
+    Args:
+        key: cache key (file name)
+        **kwargs:
+            lock_timeout: max seconds to wait - proceed without lock after timeout
+
+    Yields:
+        bool: whether lock is acquired
+    """
+    cur_file = lock_file(key)
+    if not cur_file:
+        yield False
+        return
+
+    logger = logs.get_logger(key_lock, **kwargs)
+    lock = FileLock(cur_file, timeout=kwargs.get('lock_timeout', LOCK_TIMEOUT))
+    if not lock.acquire():
+        logger.warning(f'timeout waiting for lock of {key} - proceed without lock ...')
+    try:
+        yield lock.locked
+    finally:
+        lock.release()
@@ -1,13 +1,37 @@
 import pandas as pd
 
 import os
+import sys
+import json
+import time
+import hashlib
+import threading
 
 from typing import Union
-from ruamel.yaml import YAML
 from xbbg.io import files
 
 PKG_PATH = files.abspath(__file__, 1)
 
+# Seconds between checks of config files for changes - `reload` to force
+CONFIG_CHECK = 5.
+
+# Market configs compiled into `markets/cached/markets.json` - shipped with package,
+#   compiled again at runtime under `BBG_ROOT` or user cache folder if configs changed
+MARKET_CATS = ['assets', 'exch', 'ccy']
+MARKETS_VERSION = 1
+PKG_MARKETS = f'{PKG_PATH}/markets/cached/markets.json'
+
+# Columns to explode asset configs by
+ASSET_INFO = {
+    'Index': ['tickers'],
+    'Comdty': ['tickers', 'key_month'],
+    'Curncy': ['tickers'],
+    'Equity': ['exch_codes'],
+}
+
+_REGISTRY_ = dict()
+_REGISTRY_LOCK_ = threading.RLock()
+
 
 def config_files(cat: str) -> list:
     """
@@ -29,57 +53,349 @@ def config_files(cat: str) -> list:
     ]
 
 
+def config_version(cats: list, paths=()) -> tuple:
+    """
+    Version of config files - file names and last modified times
+
+    Args:
+        cats: categories
+        paths: other files
+
+    Returns:
+        tuple
+    """
+    return tuple(
+        (cf, os.path.getmtime(cf))
+        for cf in [cf for cat in cats for cf in config_files(cat=cat)] + list(paths)
+        if files.exists(cf)
+    )
+
+
+def registry(name: str, cats: list, loader, paths=()):
+    """
+    Process-level registry of objects built from config files -
+    built once and built again only if config files changed,
+    which is checked at most every `CONFIG_CHECK` seconds
+
+    Objects are shared across callers and must not be modified
+
+    Args:
+        name: name of object
+        cats: config categories object depends on
+        loader: function to build object
+        paths: other files object depends on
+
+    Returns:
+        object built by loader
+
+    Examples:
+        >>> calls = []
+        >>> load = lambda: calls.append(1) or len(calls)
+        >>> registry('sample', cats=['exch'], loader=load)
+        1
+        >>> registry('sample', cats=['exch'], loader=load)
+        1
+        >>> reload()
+        >>> registry('sample', cats=['exch'], loader=load)
+        2
+    """
+    key = (name, os.environ.get('BBG_ROOT', ''))
+    now = time.monotonic()
+    entry = _REGISTRY_.get(key)
+    if entry and (now - entry[1] < CONFIG_CHECK): return entry[2]
+
+    with _REGISTRY_LOCK_:
+        entry = _REGISTRY_.get(key)
+        version = config_version(cats=cats, paths=paths)
+        if entry and (entry[0] == version): obj = entry[2]
+        else: obj = loader()
+        _REGISTRY_[key] = (version, time.monotonic(), obj)
+    return obj
+
+
+def reload(name=None):
+    """
+    Drop objects in registry - built again from config files on next use
+
+    Args:
+        name: name of object to drop - all objects if None
+    """
+    with _REGISTRY_LOCK_:
+        if name is None: _REGISTRY_.clear()
+        for key in [key for key in _REGISTRY_ if key[0] == name]: _REGISTRY_.pop(key)
+
+
 def load_config(cat: str) -> pd.DataFrame:
     """
-    Load market info that can apply pd.Series directly
+    Load market info that can apply pd.Series directly -
+    shared by all callers and read-only
 
     Args:
         cat: category name
 
     Returns:
         pd.DataFrame
+
+    Examples:
+        >>> exch_ = load_config('exch')
+        >>> exch_.loc['EquityUS', 'tz']
+        'America/New_York'
+        >>> exch_.loc['EquityUS', 'tz'] = 'Asia/Tokyo'
+        Traceback (most recent call last):
+        ...
+        ValueError: assignment destination is read-only
+        >>> load_config('exch') is exch_
+        True
     """
-    cfg_files = config_files(cat=cat)
-    cache_cfg = f'{PKG_PATH}/markets/cached/{cat}_cfg.pkl'
-    last_mod = max(map(files.modified_time, cfg_files))
-    if files.exists(cache_cfg) and files.modified_time(cache_cfg) > last_mod:
-        return pd.read_pickle(cache_cfg)
-
-    config = (
-        pd.concat([
-            load_yaml(cf).apply(pd.Series)
-            for cf in cfg_files
-        ], sort=False)
+    return registry(
+        f'config/{cat}', cats=[cat], loader=lambda: read_only(_load_config_(cat=cat))
     )
-    files.create_folder(cache_cfg, is_file=True)
-    config.to_pickle(cache_cfg)
-    return config
+
+
+def _load_config_(cat: str) -> pd.DataFrame:
+    """
+    Load config from compiled market info - YAML files for other categories
+    """
+    if cat in MARKET_CATS: config = load_markets()[cat]
+    else: config = merge_configs([_load_yaml_(cf) for cf in config_files(cat=cat)])
+    return pd.DataFrame.from_dict(config, orient='index')
 
 
 def load_yaml(yaml_file: str) -> pd.Series:
     """
-    Load yaml from cache
+    Load yaml file - shared by all callers and read-only,
+    loaded again only if file changed
 
     Args:
         yaml_file: YAML file name
 
     Returns:
         pd.Series
+
+    Examples:
+        >>> exch_file_ = f'{PKG_PATH}/markets/exch.yml'
+        >>> load_yaml(exch_file_).EquityUS['tz']
+        'America/New_York'
+        >>> load_yaml(exch_file_) is load_yaml(exch_file_)
+        True
     """
-    cache_file = (
-        yaml_file
-        .replace('/markets/', '/markets/cached/')
-        .replace('.yml', '.pkl')
+    return registry(
+        f'yaml/{yaml_file}', cats=[], paths=[yaml_file],
+        loader=lambda: read_only(pd.Series(_load_yaml_(yaml_file=yaml_file))),
     )
-    cur_mod = files.modified_time(yaml_file)
-    if files.exists(cache_file) and files.modified_time(cache_file) > cur_mod:
-        return pd.read_pickle(cache_file)
+
+
+def read_only(data):
+    """
+    Make values of pd.DataFrame / pd.Series read-only in place -
+    for objects shared through `registry`
+
+    Returns:
+        data
+
+    Examples:
+        >>> sample = read_only(pd.DataFrame({'a': [1, 2], 'b': [1., 2.]}))
+        >>> sample['a'].values.flags.writeable, sample['b'].values.flags.writeable
+        (False, False)
+    """
+    # Block managers are `_data` with `blocks` only before pandas 1.1
+    mgr = data._mgr if hasattr(data, '_mgr') else getattr(data, '_data', None)
+    arrays = getattr(mgr, 'arrays', None)
+    if arrays is None: arrays = [blk.values for blk in getattr(mgr, 'blocks', [])]
+    for arr in arrays:
+        if hasattr(arr, 'flags'): arr.flags.writeable = False
+    return data
+
+
+def _load_yaml_(yaml_file: str) -> dict:
+    """
+    Load yaml file as plain python objects
+    """
+    from ruamel.yaml import YAML
 
     with open(yaml_file, 'r') as fp:
-        data = pd.Series(YAML().load(fp))
-        files.create_folder(cache_file, is_file=True)
-        data.to_pickle(cache_file)
-        return data
+        return json.loads(json.dumps(YAML().load(fp) or dict(), default=str))
+
+
+def load_markets() -> dict:
+    """
+    Compiled market info of asset, exchange and currency configs -
+    shared by all callers and must not be modified
+
+    Returns:
+        dict: category -> plain python objects, see `compile_markets`
+
+    Examples:
+        >>> markets = load_markets()
+        >>> markets['exch']['EquityUS']['tz']
+        'America/New_York'
+        >>> [row for row in markets['assets']['Equity'] if row['exch_codes'] == 'JT'][0]['exch']
+        'EquityJapan'
+        >>> markets['ccy']['AUDUSD']
+        {'ticker': 'AUD Curncy', 'power': -1}
+    """
+    return registry('markets', cats=MARKET_CATS, loader=_load_markets_)
+
+
+def _load_markets_() -> dict:
+    """
+    Load compiled market info - from `markets_file` or the one shipped with package,
+    compile again if config files changed (package folder is never written)
+    """
+    out_file = markets_file()
+    sources = market_sources()
+    for cf in [out_file, PKG_MARKETS]:
+        if not files.exists(cf): continue
+        try:
+            with open(cf, 'r') as fp: markets = json.load(fp)
+            if markets.get('version') == MARKETS_VERSION and markets.get('sources') == sources:
+                return markets
+        except ValueError: pass
+
+    markets = compile_markets()
+    try:
+        save_markets(markets=markets, out_file=out_file)
+    except OSError:
+        # Read-only cache folder - compile again next time
+        pass
+    return markets
+
+
+def save_markets(markets: dict, out_file: str):
+    """
+    Save compiled market info - maintainers refresh the file shipped with package by
+    `save_markets(compile_markets(), PKG_MARKETS)` after changing package configs
+    """
+    with files.atomic(out_file) as tmp_file:
+        with open(tmp_file, 'w') as fp: json.dump(markets, fp, separators=(',', ':'))
+
+
+def markets_file() -> str:
+    """
+    Compiled market info file written at runtime - see `cache_path`
+
+    Examples:
+        >>> os.environ['BBG_ROOT'] = '/data/bbg'
+        >>> markets_file()
+        '/data/bbg/markets/cached/markets.json'
+        >>> _ = os.environ.pop('BBG_ROOT')
+        >>> markets_file().startswith(PKG_PATH)
+        False
+    """
+    return f'{cache_path()}/markets.json'
+
+
+def cache_path() -> str:
+    """
+    Folder of files compiled at runtime - `BBG_ROOT/markets/cached`,
+    or user cache folder if `BBG_ROOT` is not set
+    """
+    root = os.environ.get('BBG_ROOT', '').replace('\\', '/')
+    if root: return f'{root}/markets/cached'
+    if sys.platform == 'win32':
+        base = os.environ.get('LOCALAPPDATA', os.path.expanduser('~'))
+    else:
+        base = os.environ.get('XDG_CACHE_HOME', '') or os.path.expanduser('~/.cache')
+    return f'{base}/xbbg'.replace('\\', '/')
+
+
+def market_sources() -> dict:
+    """
+    Checksums of config files of each category
+    """
+    res = dict()
+    for cat in MARKET_CATS:
+        res[cat] = []
+        for cf in config_files(cat=cat):
+            with open(cf, 'rb') as fp: res[cat].append(hashlib.sha1(fp.read()).hexdigest())
+    return res
+
+
+def compile_markets() -> dict:
+    """
+    Compile asset, exchange and currency configs - package files first,
+    then user configs under `BBG_ROOT/markets` to override or expand them
+
+    Assets are exploded to one row per ticker / exchange code (and key month),
+    exchanges and currencies are merged by name
+
+    Returns:
+        dict: version, sources and info of each category
+
+    Examples:
+        >>> markets = compile_markets()
+        >>> markets['version'], sorted(markets['sources'])
+        (1, ['assets', 'ccy', 'exch'])
+        >>> [
+        ...     (row['exch'], row['key_month'])
+        ...     for row in markets['assets']['Comdty'] if row['tickers'] == 'IOE'
+        ... ]
+        [('CommoditiesDalian', 'J'), ('CommoditiesDalian', 'K'), ('CommoditiesDalian', 'U')]
+    """
+    res = dict(version=MARKETS_VERSION, sources=market_sources())
+    assets = [_load_yaml_(cf) for cf in config_files(cat='assets')]
+    res['assets'] = {
+        asset: drop_duplicates([
+            row
+            for cfg in assets
+            for rec in cfg.get(asset, None) or []
+            for row in explode(rec, columns=cols)
+        ])
+        for asset, cols in ASSET_INFO.items()
+    }
+    for cat in ['exch', 'ccy']:
+        res[cat] = merge_configs([_load_yaml_(cf) for cf in config_files(cat=cat)])
+    return res
+
+
+def explode(rec: dict, columns: list) -> list:
+    """
+    Explode record by list values of columns
+
+    Examples:
+        >>> explode({'tickers': ['A', 'B'], 'key_month': ['J', 'K'], 'exch': 'X'}, ['tickers', 'key_month'])
+        ... # doctest: +NORMALIZE_WHITESPACE
+        [{'tickers': 'A', 'key_month': 'J', 'exch': 'X'}, {'tickers': 'B', 'key_month': 'J', 'exch': 'X'},
+         {'tickers': 'A', 'key_month': 'K', 'exch': 'X'}, {'tickers': 'B', 'key_month': 'K', 'exch': 'X'}]
+    """
+    res = [rec]
+    for col in columns[::-1]:
+        res = [
+            dict(row, **{col: val})
+            for row in res
+            for val in (
+                (row[col] or [None]) if isinstance(row.get(col), list)
+                else [row.get(col)] if col in row else [None]
+            )
+        ]
+    return [{k: v for k, v in row.items() if v is not None} for row in res]
+
+
+def drop_duplicates(rows: list) -> list:
+    """
+    Drop duplicated rows - last ones are kept
+
+    Examples:
+        >>> drop_duplicates([{'a': 1}, {'a': 2}, {'a': 1, 'b': None}])
+        [{'a': 2}, {'a': 1, 'b': None}]
+    """
+    res, seen = [], set()
+    for row in rows[::-1]:
+        key = json.dumps({k: v for k, v in row.items() if v is not None}, sort_keys=True)
+        if key in seen: continue
+        seen.add(key)
+        res.append(row)
+    return res[::-1]
+
+
+def merge_configs(configs: list) -> dict:
+    """
+    Merge configs by name - later ones override earlier ones
+    """
+    res = dict()
+    for cfg in configs:
+        for name, info in cfg.items(): res[name] = info
+    return res
 
 
 def to_hours(num_ts: Union[str, list, int, float]) -> Union[str, list]:
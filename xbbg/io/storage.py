@@ -1,13 +1,27 @@
 import pandas as pd
 
-import os
+import json
+import hashlib
+
+from functools import lru_cache
 
 from xbbg import const
-from xbbg.io import files, logs
-from xbbg.core import utils, overrides
+from xbbg.io import files, logs, formats, backends
+from xbbg.core import utils, overrides, sessions
 
 PKG_PATH = files.abspath(__file__, 1)
 
+# Rows per row group of intraday bars (1 hour of 1-min bars) - small row groups
+# with min / max statistics of time index allow partial reads of sessions
+BAR_ROW_GROUP = 60
+
+# Cache keys of reference data - see `ref_key`
+#   LEGACY_REFS: whether to look up files named by legacy convention (`ref_info`)
+REF_NONE = 'ovrd=None'
+REF_INDEX = 'Logs/ref_keys.jsonl'
+LEGACY_REFS = True
+_REF_INDEX_ = dict()
+
 
 def bar_file(ticker: str, dt, typ='TRADE') -> str:
     """
@@ -22,6 +36,8 @@ def bar_file(ticker: str, dt, typ='TRADE') -> str:
         file location
 
     Examples:
+        >>> import os
+        >>>
         >>> os.environ['BBG_ROOT'] = ''
         >>> bar_file(ticker='ES1 Index', dt='2018-08-01') == ''
         True
@@ -29,7 +45,7 @@ def bar_file(ticker: str, dt, typ='TRADE') -> str:
         >>> bar_file(ticker='ES1 Index', dt='2018-08-01')
         '/data/bbg/Index/ES1 Index/TRADE/2018-08-01.parq'
     """
-    data_path = os.environ.get(overrides.BBG_ROOT, '').replace('\\', '/')
+    data_path = backends.current().root
     if not data_path: return ''
     asset = ticker.split()[-1]
     proper_ticker = ticker.replace('/', '_')
@@ -43,6 +59,10 @@ def ref_file(
     """
     Data file location for Bloomberg reference data
 
+    File names are canonical keys of overrides (see `ref_key`) -
+    files named by the legacy convention (see `ref_info`) are still
+    picked up if `LEGACY_REFS` is True until migrated by `cache.migrate_refs`
+
     Args:
         ticker: ticker name
         fld: field
@@ -55,6 +75,7 @@ def ref_file(
         str: file location
 
     Examples:
+        >>> import os
         >>> import shutil
         >>>
         >>> os.environ['BBG_ROOT'] = ''
@@ -73,8 +94,8 @@ def ref_file(
         >>> ref_file(
         ...     'BLT LN Equity', fld='DVD_Hist_All', has_date=True,
         ...     cache=True, DVD_Start_Dt='20180101',
-        ... ).replace(cur_dt_, '[cur_date]')[:-5]
-        '/data/bbg/Equity/BLT LN Equity/DVD_Hist_All/asof=[cur_date], DVD_Start_Dt=20180101'
+        ... ).replace(cur_dt_, '[cur_date]')
+        '/data/bbg/Equity/BLT LN Equity/DVD_Hist_All/asof=[cur_date], ovrd=0caa7165138e5bd5.parq'
         >>> sample = 'asof=2018-11-02, DVD_Start_Dt=20180101, DVD_End_Dt=20180501.pkl'
         >>> root_path = 'xbbg/tests/data'
         >>> sub_path = f'{root_path}/Equity/AAPL US Equity/DVD_Hist_All'
@@ -87,7 +108,7 @@ def ref_file(
         ...     'AAPL US Equity', 'DVD_Hist_All', DVD_Start_Dt='20180101',
         ...     has_date=True, cache=True, ext='pkl'
         ... )
-        >>> new_file.split('/')[-1] == f'asof={cur_dt_}, DVD_Start_Dt=20180101.pkl'
+        >>> new_file.split('/')[-1] == f'asof={cur_dt_}, {ref_key(DVD_Start_Dt=20180101)}.pkl'
         True
         >>> old_file = 'asof=2018-11-02, DVD_Start_Dt=20180101, DVD_End_Dt=20180501.pkl'
         >>> old_full = '/'.join(new_file.split('/')[:-1] + [old_file])
@@ -107,28 +128,214 @@ def ref_file(
         >>> exist_file == updated_file
         True
     """
-    data_path = os.environ.get(overrides.BBG_ROOT, '').replace('\\', '/')
+    data_path = backends.current().root
     if (not data_path) or (not cache): return ''
 
     proper_ticker = ticker.replace('/', '_')
     cache_days = kwargs.pop('cache_days', 10)
     root = f'{data_path}/{ticker.split()[-1]}/{proper_ticker}/{fld}'
-
-    ref_kw = {k: v for k, v in kwargs.items() if k not in overrides.PRSV_COLS}
-    if len(ref_kw) > 0: info = utils.to_str(ref_kw)[1:-1].replace('|', '_')
-    else: info = 'ovrd=None'
+    info = ref_key(**kwargs)
+    names = [info]
+    if LEGACY_REFS and (info != REF_NONE): names.append(ref_info(**kwargs))
 
     # Check date info
+    cache_backend = backends.current()
     if has_date:
-        cache_file = f'{root}/asof=[cur_date], {info}.{ext}'
         cur_dt = utils.cur_time()
         start_dt = pd.date_range(end=cur_dt, freq=f'{cache_days}D', periods=2)[0]
-        for dt in pd.date_range(start=start_dt, end=cur_dt, normalize=True)[1:][::-1]:
-            cur_file = cache_file.replace('[cur_date]', dt.strftime("%Y-%m-%d"))
-            if files.exists(cur_file): return cur_file
-        return cache_file.replace('[cur_date]', cur_dt)
+        cache_files = [
+            f'{root}/asof={dt.strftime("%Y-%m-%d")}, {name}.{ext}'
+            for dt in pd.date_range(start=start_dt, end=cur_dt, normalize=True)[1:][::-1]
+            for name in names
+        ]
+        for cur_file, cached in zip(cache_files, cache_backend.exists_many(cache_files)):
+            if cached: return cur_file
+        return f'{root}/asof={cur_dt}, {info}.{ext}'
+
+    cache_files = [f'{root}/{name}.{ext}' for name in names]
+    if len(cache_files) > 1:
+        cached = cache_backend.exists_many(cache_files)
+        if cached[1] and (not cached[0]): return cache_files[1]
+    return cache_files[0]
+
+
+def ref_ovrd(**kwargs) -> dict:
+    """
+    Canonical overrides of reference data - sorted by lower case names
+    (Bloomberg names are case insensitive) with values normalized as str
+
+    Args:
+        **kwargs: overrides passed to ref function
+
+    Returns:
+        dict
+
+    Examples:
+        >>> ref_ovrd(DVD_Start_Dt=20180101, cache=True, Per=' W ')
+        {'dvd_start_dt': '20180101', 'per': 'W'}
+        >>> ref_ovrd(DVD_Start_Dt=pd.Timestamp('2018-01-01'), Flds=['a', 'b'])
+        {'dvd_start_dt': '20180101', 'flds': 'a,b'}
+    """
+    return dict(sorted(
+        (k.lower(), _norm_value_(v)) for k, v in kwargs.items()
+        if (k not in overrides.PRSV_COLS) and (k[0] != '_')
+    ))
+
+
+def _norm_value_(value) -> str:
+    """
+    Normalize override value as str
+    """
+    if isinstance(value, (list, tuple)): return ','.join(map(_norm_value_, value))
+    if hasattr(value, 'strftime'): return value.strftime('%Y%m%d')
+    return str(value).strip()
+
 
-    return f'{root}/{info}.{ext}'
+def ref_key(**kwargs) -> str:
+    """
+    Canonical cache key of reference data - hash of canonical overrides,
+    so that the same overrides give the same key regardless of order,
+    case of names and types of values
+
+    Args:
+        **kwargs: overrides passed to ref function
+
+    Returns:
+        str
+
+    Examples:
+        >>> ref_key(DVD_Start_Dt='20180101', DVD_End_Dt='20180501', cache=True)
+        'ovrd=279d8137b8811b10'
+        >>> ref_key(dvd_end_dt=20180501, DVD_START_DT=20180101)
+        'ovrd=279d8137b8811b10'
+        >>> ref_key(cache=True)
+        'ovrd=None'
+    """
+    ovrd = ref_ovrd(**kwargs)
+    if not ovrd: return REF_NONE
+    return _hash_key_(json.dumps(ovrd, separators=(',', ':')))
+
+
+@lru_cache(maxsize=1024)
+def _hash_key_(canonical: str) -> str:
+    """
+    Hash of canonical overrides
+    """
+    return f'ovrd={hashlib.sha1(canonical.encode("utf-8")).hexdigest()[:16]}'
+
+
+def index_key(key: str, data_path=None, **kwargs):
+    """
+    Add key with readable overrides to sidecar index `BBG_ROOT/Logs/ref_keys.jsonl`
+    (once per process for each key) - called when reference data is saved
+
+    Index file is read once per process and kept in memory -
+    keys added by other processes in the meantime may be added again,
+    which is harmless
+
+    Args:
+        key: cache key from `ref_key`
+        data_path: root data path - default logs of current storage backend
+        **kwargs: overrides passed to ref function
+    """
+    if key == REF_NONE: return
+    index_file = _index_file_(data_path)
+    if not index_file: return
+
+    if index_file not in _REF_INDEX_: _REF_INDEX_[index_file] = ref_index(data_path=data_path)
+    index = _REF_INDEX_[index_file]
+    if key in index: return
+
+    files.create_folder(index_file, is_file=True)
+    index[key] = ref_ovrd(**kwargs)
+    line = json.dumps(dict(key=key, ovrd=index[key])) + '\n'
+    # Single small appends are atomic - duplicated lines are harmless
+    with open(index_file, 'a') as fp: fp.write(line)
+
+
+def ref_index(data_path=None) -> dict:
+    """
+    Readable index of cache keys
+
+    Args:
+        data_path: root data path - default logs of current storage backend
+
+    Returns:
+        dict: key -> canonical overrides
+
+    Examples:
+        >>> import tempfile
+        >>>
+        >>> root_ = tempfile.mkdtemp()
+        >>> key_ = ref_key(DVD_Start_Dt='20180101')
+        >>> index_key(key_, data_path=root_, DVD_Start_Dt='20180101')
+        >>> ref_index(data_path=root_)
+        {'ovrd=0caa7165138e5bd5': {'dvd_start_dt': '20180101'}}
+    """
+    index_file = _index_file_(data_path)
+    if (not index_file) or (not files.exists(index_file)): return {}
+
+    res = {}
+    with open(index_file, 'r') as fp:
+        for line in fp:
+            try: item = json.loads(line)
+            except ValueError: continue
+            res[item['key']] = item['ovrd']
+    return res
+
+
+def _index_file_(data_path=None) -> str:
+    """
+    Index file of cache keys - empty if not kept
+    """
+    if data_path is None: return backends.current().log_file(REF_INDEX.split('/')[-1])
+    return f'{data_path}/{REF_INDEX}' if data_path else ''
+
+
+def ref_info(**kwargs) -> str:
+    """
+    Legacy overrides info used as cache key of reference data
+
+    Args:
+        **kwargs: overrides passed to ref function
+
+    Returns:
+        str
+
+    Examples:
+        >>> ref_info(DVD_Start_Dt='20180101', cache=True)
+        'DVD_Start_Dt=20180101'
+        >>> ref_info(cache=True)
+        'ovrd=None'
+    """
+    ref_kw = {k: v for k, v in kwargs.items() if k not in overrides.PRSV_COLS}
+    if len(ref_kw) > 0: return utils.to_str(ref_kw)[1:-1].replace('|', '_')
+    return REF_NONE
+
+
+def parse_info(info: str) -> dict:
+    """
+    Parse legacy overrides info back to overrides
+
+    Args:
+        info: file name without `asof=` part and extension
+
+    Returns:
+        dict: empty if not parsable
+
+    Examples:
+        >>> parse_info('DVD_Start_Dt=20180101, DVD_End_Dt=20180501')
+        {'DVD_Start_Dt': '20180101', 'DVD_End_Dt': '20180501'}
+        >>> parse_info('ovrd=None')
+        {}
+    """
+    if info == REF_NONE: return {}
+    res = {}
+    for item in info.split(', '):
+        key, sep, value = item.partition('=')
+        if not sep: return {}
+        res[key] = value
+    return res
 
 
 def save_intraday(data: pd.DataFrame, ticker: str, dt, typ='TRADE', **kwargs):
@@ -142,6 +349,8 @@ def save_intraday(data: pd.DataFrame, ticker: str, dt, typ='TRADE', **kwargs):
         typ: [TRADE, BID, ASK, BID_BEST, ASK_BEST, BEST_BID, BEST_ASK]
 
     Examples:
+        >>> import os
+        >>>
         >>> os.environ['BBG_ROOT'] = f'{PKG_PATH}/tests/data'
         >>> sample = pd.read_parquet(f'{PKG_PATH}/tests/data/aapl.parq')
         >>> save_intraday(sample, 'AAPL US Equity', '2018-11-02')
@@ -166,15 +375,13 @@ def save_intraday(data: pd.DataFrame, ticker: str, dt, typ='TRADE', **kwargs):
     exch = const.exch_info(ticker=ticker, **kwargs)
     if exch.empty: return
 
-    end_time = pd.Timestamp(
-        const.market_timing(ticker=ticker, dt=dt, timing='FINISHED', **kwargs)
-    ).tz_localize(exch.tz)
-    now = pd.Timestamp('now', tz=exch.tz) - pd.Timedelta('1H')
+    end_time = sessions.session_time(exch=exch.name, session='allday', dt=dt)[1]
+    now = pd.Timestamp('now', tz='UTC') - pd.Timedelta('1H')
 
     if end_time > now:
         logger.debug(f'skip saving cause market close ({end_time}) < now - 1H ({now}) ...')
         return
 
     logger.info(f'saving data to {data_file} ...')
-    files.create_folder(data_file, is_file=True)
-    data.to_parquet(data_file)
+    if formats.cache_opts(**kwargs)['row_group'] is None: kwargs['row_group'] = BAR_ROW_GROUP
+    backends.current().put(data_file, data.sort_index(), **kwargs)
@@ -119,6 +119,91 @@ def apply_fx(
     return data.mul(add_fx.iloc[:, -1].pow(power), axis=0).dropna(how='all')
 
 
+def apply_fx_many(
+        data: pd.DataFrame,
+        ccy_map: dict,
+        fx_panel: pd.DataFrame,
+        power=-1.,
+) -> pd.DataFrame:
+    """
+    Apply FX to many columns of data at once
+
+    Each column is aligned to latest available price of its FX
+    with one sorted as-of lookup and converted in one go
+
+    Args:
+        data: price data - columns of tickers
+        ccy_map: column -> FX column in `fx_panel` or fixed FX rate,
+                 columns not in map (or not numeric) are kept as is
+        fx_panel: FX price data - columns of FX (close prices are used for intraday data)
+        power: apply for FX price
+
+    Returns:
+        Price * FX ** Power
+
+    Examples:
+        >>> pd.options.display.precision = 2
+        >>> rms = (
+        ...     pd.read_pickle('xbbg/tests/data/sample_rms_ib1.pkl')
+        ...     .pipe(get_series, col='close')
+        ...     .apply(pd.to_numeric, errors='ignore')
+        ...     .rename_axis(columns=None)
+        ...     .pipe(dropna)
+        ... ).tail()
+        >>> eur = pd.read_pickle('xbbg/tests/data/sample_eur_ib.pkl')
+        >>> (
+        ...     rms
+        ...     .assign(fixed=rms.iloc[:, 0], local=rms.iloc[:, 0], name='RMS')
+        ...     .pipe(
+        ...         apply_fx_many, fx_panel=eur,
+        ...         ccy_map={'RMS FP Equity': 'EUR Curncy', 'fixed': 1.1090, 'name': 'EUR Curncy'},
+        ...     )
+        ... )
+                                   RMS FP Equity   fixed  local name
+        2020-01-17 16:26:00+00:00         653.98  654.10  725.4  RMS
+        2020-01-17 16:27:00+00:00         653.80  653.92  725.2  RMS
+        2020-01-17 16:28:00+00:00         653.98  654.10  725.4  RMS
+        2020-01-17 16:29:00+00:00         653.57  653.74  725.0  RMS
+        2020-01-17 16:35:00+00:00         654.05  654.28  725.6  RMS
+    """
+    if isinstance(data, pd.Series): data = pd.DataFrame(data)
+    if data.empty: return data
+
+    fx_panel = fx_panel.pipe(get_series)
+    if not fx_panel.index.is_monotonic_increasing: fx_panel = fx_panel.sort_index()
+
+    # Numeric columns mapped to FX columns or fixed rates - others are kept as is
+    fx_cols, fixed, cols, loc = [], [], [], []
+    for col in data.columns:
+        if not pd.api.types.is_numeric_dtype(data[col]): continue
+        ccy = ccy_map.get(col)
+        if isinstance(ccy, str) and (ccy in fx_panel.columns):
+            if ccy not in fx_cols: fx_cols.append(ccy)
+            loc.append(fx_cols.index(ccy))
+        elif isinstance(ccy, (int, float, np.number)):
+            loc.append(-1 - len(fixed))
+            fixed.append(ccy)
+        else: continue
+        cols.append(col)
+    if not cols: return data
+
+    # Latest FX price at or before each time
+    fx_idx, data_idx = fx_panel.index, data.index
+    if isinstance(fx_idx, pd.DatetimeIndex) and isinstance(data_idx, pd.DatetimeIndex):
+        fx_idx, data_idx = fx_idx.asi8, data_idx.asi8
+    pos = np.searchsorted(fx_idx, data_idx, side='right') - 1
+    fx_px = fx_panel.loc[:, fx_cols].ffill().to_numpy(dtype=float)[pos]
+    fx_px[pos < 0] = np.nan
+
+    # Fixed rates are indexed from the end
+    rates = np.hstack([
+        fx_px, np.broadcast_to(np.array(fixed[::-1], dtype=float), (data.shape[0], len(fixed))),
+    ])[:, loc]
+    res = data.copy()
+    res[cols] = data.loc[:, cols].to_numpy(dtype=float) * np.power(rates, power)
+    return res.dropna(how='all')
+
+
 def daily_stats(data: Union[pd.Series, pd.DataFrame], **kwargs) -> pd.DataFrame:
     """
     Daily stats for given data
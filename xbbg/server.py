@@ -0,0 +1,449 @@
+import pandas as pd
+
+import os
+import sys
+import json
+import time
+import stat
+import tempfile
+import threading
+
+from collections import OrderedDict
+
+from xbbg.io import logs
+
+# Cache server is opt-in - set a secret shared by clients and server:
+#   os.environ['BBG_SERVER_KEY'] = 'your-secret'
+# and optionally os.environ['BBG_SERVER'] = '/your/socket/file'
+#   (default: xbbg.sock in a private folder of current user under temp folder)
+#
+# Queries go through `multiprocessing.connection` instead of the pynng publisher
+#   of `feeds/pub.py`: Pub0 only broadcasts one way while clients here need replies,
+#   pynng / trio / orjson are not requirements of xbbg and orjson cannot carry DataFrames.
+#   The standard library gives request / reply with HMAC handshake of `authkey`.
+BBG_SERVER = 'BBG_SERVER'
+BBG_SERVER_KEY = 'BBG_SERVER_KEY'
+
+FUNCS = ['bdp', 'bds', 'bdh']
+SERVER_TTL = 300.
+MAX_ITEMS = 10000
+
+# True in server process - queries go to Bloomberg directly
+IS_SERVER = False
+
+
+def address() -> str:
+    """
+    Address of cache server - Unix socket file or Windows named pipe
+
+    Examples:
+        >>> os.environ['BBG_SERVER'] = '/tmp/xbbg.sock'
+        >>> address()
+        '/tmp/xbbg.sock'
+        >>> _ = os.environ.pop('BBG_SERVER')
+        >>> sys.platform == 'win32' or address() == f'{socket_dir()}/xbbg.sock'
+        True
+    """
+    if BBG_SERVER in os.environ: return os.environ[BBG_SERVER]
+    if sys.platform == 'win32': return r'\\.\pipe\xbbg'
+    return f'{socket_dir()}/xbbg.sock'
+
+
+def socket_dir() -> str:
+    """
+    Private folder of current user for default socket - created with mode 0700
+    (temp folder on Windows is already under profile of current user)
+
+    Examples:
+        >>> d_ = socket_dir()
+        >>> d_.endswith(f'xbbg-{user_id()}')
+        True
+        >>> sys.platform == 'win32' or oct(stat.S_IMODE(os.stat(d_).st_mode)) == '0o700'
+        True
+    """
+    path = f'{tempfile.gettempdir()}/xbbg-{user_id()}'
+    os.makedirs(path, mode=0o700, exist_ok=True)
+    if (sys.platform != 'win32') and (not is_private(path)):
+        raise PermissionError(f'{path} is not a private folder of current user')
+    return path
+
+
+def user_id() -> str:
+    """
+    Id of current user - uid on POSIX and user name on Windows (no `os.getuid`)
+    """
+    if hasattr(os, 'getuid'): return str(os.getuid())
+    import getpass
+
+    return getpass.getuser()
+
+
+def is_private(path: str) -> bool:
+    """
+    Whether path is owned by current user and not accessible by others -
+    symbolic links are never private, and nothing is on Windows
+    where owners and permissions are not in `os.stat`
+
+    Examples:
+        >>> d_ = tempfile.mkdtemp()
+        >>> is_private(d_) == (sys.platform != 'win32')
+        True
+        >>> os.chmod(d_, 0o777)
+        >>> is_private(d_)
+        False
+        >>> is_private(f'{d_}/missing.sock')
+        False
+        >>> os.rmdir(d_)
+    """
+    if not hasattr(os, 'getuid'): return False
+    try: st = os.lstat(path)
+    except OSError: return False
+    if stat.S_ISLNK(st.st_mode): return False
+    return (st.st_uid == os.getuid()) and (stat.S_IMODE(st.st_mode) & 0o077 == 0)
+
+
+def authkey() -> bytes:
+    """
+    Secret shared between clients and server - no default
+
+    Examples:
+        >>> os.environ['BBG_SERVER_KEY'] = 'secret'
+        >>> authkey()
+        b'secret'
+        >>> _ = os.environ.pop('BBG_SERVER_KEY')
+        >>> authkey()
+        b''
+    """
+    return os.environ.get(BBG_SERVER_KEY, '').encode('utf-8')
+
+
+def available() -> bool:
+    """
+    Whether cache server is enabled and running - only if `BBG_SERVER_KEY` is set,
+    and the socket is owned by current user and not accessible by others.
+    Named pipes on Windows are only used if `BBG_SERVER` is set explicitly.
+
+    Examples:
+        >>> os.environ['BBG_SERVER'] = f'{tempfile.mkdtemp()}/xbbg.sock'
+        >>> open(os.environ['BBG_SERVER'], 'w').close()
+        >>> available()
+        False
+        >>> os.environ['BBG_SERVER_KEY'] = 'secret'
+        >>> os.chmod(os.environ['BBG_SERVER'], 0o600)
+        >>> available()
+        True
+        >>> os.chmod(os.environ['BBG_SERVER'], 0o666)
+        >>> available() == (sys.platform == 'win32')
+        True
+        >>> os.remove(os.environ.pop('BBG_SERVER'))
+        >>> _ = os.environ.pop('BBG_SERVER_KEY')
+    """
+    if IS_SERVER or (not authkey()): return False
+    if sys.platform == 'win32': return BBG_SERVER in os.environ
+    try: addr = address()
+    except PermissionError as e:
+        logs.get_logger(available).warning(f'cache server is not used: {e}')
+        return False
+    if not os.path.exists(addr): return False
+    if not is_private(addr):
+        logs.get_logger(available).warning(
+            f'cache server is not used: {addr} is not owned by current user or open to others'
+        )
+        return False
+    return True
+
+
+def query_key(func: str, **kwargs) -> str:
+    """
+    Canonical key of query
+
+    Examples:
+        >>> query_key('bdp', tickers=['SPY US Equity'], flds='Crncy')
+        '{"flds": "Crncy", "func": "bdp", "tickers": ["SPY US Equity"]}'
+    """
+    return json.dumps(dict(func=func, **kwargs), sort_keys=True, default=str)
+
+
+def query(func: str, **kwargs):
+    """
+    Query through cache server
+
+    Args:
+        func: one of `FUNCS`
+        **kwargs: kwargs of function - must be JSON serializable (others are sent as str)
+
+    Returns:
+        pd.DataFrame or None if server is not available
+    """
+    if (func not in FUNCS) or kwargs.get('raw', False) or (not available()): return None
+    # Queries on own sessions / ports are not shared
+    if any(k in kwargs for k in ['sess', 'port']): return None
+
+    from multiprocessing.connection import Client
+
+    logger = logs.get_logger(query, **kwargs)
+    try:
+        req = query_key(func, **kwargs).encode('utf-8')
+        with Client(address(), authkey=authkey()) as con:
+            con.send_bytes(req)
+            typ, payload = con.recv_bytes(), con.recv_bytes()
+    except (OSError, EOFError) as e:
+        logger.debug(f'cache server is not available: {e}')
+        return None
+
+    if typ == b'error':
+        logger.warning(f'cache server error: {payload.decode("utf-8")} - query locally ...')
+        return None
+    try:
+        return from_bytes(typ, payload)
+    except ValueError as e:
+        logger.warning(f'{e} - query locally ...')
+        return None
+
+
+def to_bytes(data: pd.DataFrame) -> tuple:
+    """
+    Serialize data as Arrow IPC stream - clients never unpickle data from server
+
+    Returns:
+        tuple: (format, payload)
+
+    Raises:
+        TypeError: if data is not supported by Arrow - clients then query locally
+
+    Examples:
+        >>> sample = pd.DataFrame({'px_last': [1., 2.]}, index=['SPY US Equity', 'QQQ US Equity'])
+        >>> typ_, payload_ = to_bytes(sample)
+        >>> typ_
+        b'arrow'
+        >>> from_bytes(typ_, payload_).equals(sample)
+        True
+        >>> to_bytes(pd.DataFrame({'mixed': [1, 'a']}))
+        Traceback (most recent call last):
+        ...
+        TypeError: data is not supported by Arrow: ...
+    """
+    import pyarrow as pa
+
+    try:
+        table = pa.Table.from_pandas(data)
+    except (pa.ArrowInvalid, pa.ArrowTypeError, pa.ArrowNotImplementedError) as e:
+        raise TypeError(f'data is not supported by Arrow: {e}')
+
+    sink = pa.BufferOutputStream()
+    with pa.ipc.new_stream(sink, table.schema) as writer:
+        writer.write_table(table)
+    return b'arrow', sink.getvalue().to_pybytes()
+
+
+def from_bytes(typ: bytes, payload: bytes) -> pd.DataFrame:
+    """
+    Deserialize data from server - only Arrow IPC streams are accepted
+
+    Examples:
+        >>> from_bytes(b'pickle', b'')
+        Traceback (most recent call last):
+        ...
+        ValueError: unsupported format from cache server: pickle
+    """
+    if typ != b'arrow':
+        raise ValueError(f'unsupported format from cache server: {typ.decode("utf-8", "replace")}')
+
+    import pyarrow as pa
+
+    return pa.ipc.open_stream(payload).read_all().to_pandas()
+
+
+class CacheServer(object):
+    """
+    Shared cache of reference / historical data for processes on the same host -
+    queries are run one at a time on the Bloomberg session of the server,
+    and identical queries in flight are only sent once
+
+    Examples:
+        >>> calls = []
+        >>> def sample(tickers, flds, **kwargs):
+        ...     time.sleep(.2)
+        ...     calls.append(tickers)
+        ...     return pd.DataFrame({flds: [len(calls)]}, index=[tickers])
+        >>>
+        >>> from xbbg.tests import fixtures
+        >>>
+        >>> os.environ['BBG_SERVER'] = fixtures.server_address()
+        >>> os.environ['BBG_SERVER_KEY'] = 'secret'
+        >>> srv = CacheServer(funcs=dict(bdp=sample))
+        >>> srv.start()
+        >>> res = []
+        >>> workers = [
+        ...     threading.Thread(target=lambda: res.append(
+        ...         query('bdp', tickers='SPY US Equity', flds='px_last')
+        ...     ))
+        ...     for _ in range(3)
+        ... ]
+        >>> for w in workers: w.start()
+        >>> for w in workers: w.join()
+        >>> calls
+        ['SPY US Equity']
+        >>> [r.iloc[0, 0] for r in res]
+        [1, 1, 1]
+        >>> query('bdp', tickers='SPY US Equity', flds='px_last', reload=True).iloc[0, 0]
+        2
+        >>> query('bdh', tickers='SPY US Equity') is None
+        True
+        >>> query('bds', tickers='SPY US Equity', flds='dvd_hist') is None
+        True
+        >>> srv.stop()
+        >>> _ = os.environ.pop('BBG_SERVER')
+        >>> _ = os.environ.pop('BBG_SERVER_KEY')
+    """
+
+    def __init__(self, funcs=None, ttl=SERVER_TTL, max_items=MAX_ITEMS, **kwargs):
+        """
+        Args:
+            funcs: dict of functions - default `FUNCS` of `xbbg.blp`
+            ttl: seconds to keep results in memory
+            max_items: max number of results in memory (least recently used dropped)
+        """
+        if funcs is None:
+            from xbbg import blp
+
+            funcs = {func: getattr(blp, func) for func in FUNCS}
+        self.funcs = funcs
+        self.ttl = ttl
+        self.max_items = max_items
+        self.kwargs = kwargs
+        self._cache_ = OrderedDict()
+        self._inflight_ = dict()
+        self._mutex_ = threading.Lock()
+        self._bbg_ = threading.Lock()
+        self._listener_ = None
+
+    def start(self):
+        """
+        Listen in background thread
+        """
+        from multiprocessing.connection import Listener
+
+        if not authkey(): raise ValueError(f'{BBG_SERVER_KEY} is not set')
+        addr = address()
+        if sys.platform == 'win32':
+            self._listener_ = Listener(addr, authkey=authkey())
+        else:
+            if os.path.exists(addr): os.remove(addr)
+            # Socket is only accessible by current user from the start
+            umask = os.umask(0o177)
+            try: self._listener_ = Listener(addr, authkey=authkey())
+            finally: os.umask(umask)
+        threading.Thread(target=self.serve, daemon=True).start()
+
+    def stop(self):
+        """
+        Stop listening
+        """
+        if self._listener_ is None: return
+        self._listener_.close()
+        self._listener_ = None
+
+    def serve(self):
+        """
+        Accept connections until stopped
+        """
+        logger = logs.get_logger(CacheServer, **self.kwargs)
+        listener = self._listener_
+        while True:
+            try:
+                con = listener.accept()
+            except OSError:
+                if self._listener_ is None: return
+                continue
+            except Exception as e:
+                # Failed authentication etc.
+                logger.warning(f'rejected connection: {e}')
+                continue
+            threading.Thread(target=self.handle, args=(con,), daemon=True).start()
+
+    def handle(self, con):
+        """
+        Handle requests of one connection
+        """
+        logger = logs.get_logger(CacheServer, **self.kwargs)
+        with con:
+            while True:
+                try: req = con.recv_bytes()
+                except (OSError, EOFError): return
+                try:
+                    typ, payload = self.result(req.decode('utf-8'))
+                except Exception as e:
+                    logger.error(f'failed to run {req[:200]}: {e}')
+                    typ, payload = b'error', str(e).encode('utf-8')
+                con.send_bytes(typ)
+                con.send_bytes(payload)
+
+    def result(self, key: str) -> tuple:
+        """
+        Cached result of query - run query if not cached or expired
+        """
+        from concurrent.futures import Future
+
+        kwargs = json.loads(key)
+        func = kwargs.pop('func')
+        if func not in self.funcs: raise KeyError(f'{func} is not supported')
+        reload = kwargs.get('reload', False)
+
+        with self._mutex_:
+            cached = None if reload else self._cache_.get(key)
+            if cached and (time.monotonic() - cached[0] < self.ttl):
+                self._cache_.move_to_end(key)
+                return cached[1]
+            fut = self._inflight_.get(key)
+            owner = fut is None
+            if owner: fut = self._inflight_[key] = Future()
+
+        if not owner: return fut.result()
+        try:
+            with self._bbg_:
+                res = to_bytes(pd.DataFrame(self.funcs[func](**kwargs)))
+            with self._mutex_:
+                self._cache_[key] = (time.monotonic(), res)
+                while len(self._cache_) > self.max_items: self._cache_.popitem(last=False)
+            fut.set_result(res)
+            return res
+        except Exception as e:
+            fut.set_exception(e)
+            raise
+        finally:
+            with self._mutex_: self._inflight_.pop(key, None)
+
+
+def main():
+
+    import argparse
+
+    from xbbg import server
+
+    parser = argparse.ArgumentParser(description='Shared cache server of Bloomberg queries')
+    parser.add_argument('--ttl', type=float, default=SERVER_TTL, help='seconds to keep results')
+    parser.add_argument('--max-items', type=int, default=MAX_ITEMS, help='max results in memory')
+    parser.add_argument('--log', default='info', help='log level')
+    args = parser.parse_args()
+
+    # Module is `__main__` when run as script - flag the imported one used by `xbbg.blp`
+    server.IS_SERVER = True
+    srv = server.CacheServer(ttl=args.ttl, max_items=args.max_items, log=args.log)
+    srv.start()
+    logs.get_logger(main, log=args.log).info(f'cache server listening on {address()} ...')
+    try:
+        while True: time.sleep(1)
+    finally:
+        srv.stop()
+        if (sys.platform != 'win32') and os.path.exists(address()): os.remove(address())
+
+
+if __name__ == '__main__':
+
+    # Example:
+    #   python -m xbbg.server --ttl=600
+    try:
+        main()
+    except KeyboardInterrupt:
+        pass
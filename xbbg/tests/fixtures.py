@@ -0,0 +1,74 @@
+import pandas as pd
+
+import os
+import sys
+import tempfile
+
+from xbbg.io import formats
+
+CACHE_TREE = [
+    ('Equity/AAPL US Equity/DVD_Hist_All/asof=2021-01-02, DVD_Start_Dt=20180101.pkl', 10, 1),
+    ('Equity/AAPL US Equity/DVD_Hist_All/asof=2021-01-05, DVD_Start_Dt=20180101.pkl', 10, 4),
+    ('Equity/AAPL US Equity/DVD_Hist_All/asof=2021-01-02, DVD_Start_Dt=20190101.pkl', 10, 2),
+    ('Equity/AAPL US Equity/TRADE/2018-11-02.parq', 100, 0),
+    ('Equity/AAPL US Equity/TRADE/2021-01-04.parq', 100, 3),
+    ('Index/ES1 Index/TRADE/2021-01-04.parq', 200, 5),
+    ('Logs/xbbg.db', 1000, 6),
+]
+
+
+def sample_cache() -> tempfile.TemporaryDirectory:
+    """
+    Temporary cache tree for testing - files of `CACHE_TREE`
+    (path, size, last used time in seconds after 1e9)
+
+    Returns:
+        tempfile.TemporaryDirectory: call `cleanup()` when done
+
+    Examples:
+        >>> tmp_ = sample_cache()
+        >>> len(os.listdir(f'{tmp_.name}/Equity/AAPL US Equity/DVD_Hist_All'))
+        3
+        >>> tmp_.cleanup()
+        >>> os.path.exists(tmp_.name)
+        False
+    """
+    tmp = tempfile.TemporaryDirectory()
+    for name, size, tm in CACHE_TREE:
+        cur_file = f'{tmp.name}/{name}'
+        os.makedirs(os.path.dirname(cur_file), exist_ok=True)
+        with open(cur_file, 'wb') as fp: fp.write(b'0' * size)
+        os.utime(cur_file, times=(1e9 + tm, 1e9 + tm))
+    return tmp
+
+
+def check_backend(backend, root: str):
+    """
+    Common checks of storage backends - put / exists / list / get
+    of sample intraday bars and reference data under `root`
+
+    Args:
+        backend: instance of `backends.StorageBackend`
+        root: root of cache keys
+    """
+    bars = pd.read_parquet(f'{formats.PKG_PATH}/tests/data/aapl.parq')
+    ref = formats.load_pickle(f'{formats.PKG_PATH}/tests/data/sample_bdp.pkl')
+    bar_key = f'{root}/Equity/AAPL US Equity/TRADE/2018-11-02.parq'
+    ref_key = f'{root}/Equity/AAPL US Equity/DVD_Hist_All/ovrd=None.pkl'
+    backend.put_many({bar_key: bars, ref_key: ref})
+    print(backend.exists_many([bar_key, f'{root}/Equity/SPY US Equity/TRADE/2018-11-02.parq']))
+    print([key[len(root):] for key in backend.list(f'{root}/Equity/AAPL US Equity')])
+    print(backend.get(
+        bar_key, start='2018-11-02 15:45', end='2018-11-02 15:47', tz='America/New_York'
+    ).shape)
+    res = backend.get_many([bar_key, ref_key])
+    print([res[bar_key].equals(bars), res[ref_key].equals(ref)])
+
+
+def server_address() -> str:
+    """
+    Address of cache server for testing - named pipe on Windows
+    and socket file in new temp folder otherwise
+    """
+    if sys.platform == 'win32': return rf'\\.\pipe\xbbg-test-{os.getpid()}'
+    return f'{tempfile.mkdtemp()}/xbbg.sock'
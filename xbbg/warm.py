@@ -0,0 +1,266 @@
+import pandas as pd
+
+import time
+
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from xbbg import const
+from xbbg.io import logs, storage, backends
+from xbbg.core import trials, sessions
+
+READY_DELAY = '1H'
+
+
+def load_universe(univ_file: str) -> pd.DataFrame:
+    """
+    Load universe file for cache warmer
+
+    Universe file is a YAML list of tickers or
+    dicts of `ticker` with optional `typ` (str or list) and `ref`, e.g.:
+
+        - SPY US Equity
+        - ticker: ES1 Index
+          typ: [TRADE, BID, ASK]
+        - ticker: ESM0 Index
+          ref: ES1 Index
+
+    Args:
+        univ_file: YAML file of universe
+
+    Returns:
+        pd.DataFrame: one row per ticker / typ
+    """
+    from ruamel.yaml import YAML
+
+    with open(univ_file, 'r') as fp:
+        univ = YAML().load(fp)
+    return to_universe(univ)
+
+
+def to_universe(univ) -> pd.DataFrame:
+    """
+    Normalize universe definitions
+
+    Args:
+        univ: list of tickers or dicts
+
+    Returns:
+        pd.DataFrame
+
+    Examples:
+        >>> to_universe([
+        ...     'SPY US Equity',
+        ...     dict(ticker='ES1 Index', typ=['TRADE', 'BID']),
+        ... ]).loc[:, ['ticker', 'typ']]
+                  ticker    typ
+        0  SPY US Equity  TRADE
+        1      ES1 Index  TRADE
+        2      ES1 Index    BID
+    """
+    res = []
+    for item in univ or []:
+        if isinstance(item, str): item = dict(ticker=item)
+        typs = item.get('typ', 'TRADE')
+        if isinstance(typs, str): typs = [typs]
+        for typ in typs:
+            res.append(dict(ticker=item['ticker'], typ=typ, ref=item.get('ref', '')))
+    return pd.DataFrame(res, columns=['ticker', 'typ', 'ref'])
+
+
+def schedule(univ: pd.DataFrame, dt, **kwargs) -> pd.DataFrame:
+    """
+    Time (in UTC) when intraday bars of each ticker are ready to be cached,
+    i.e., `READY_DELAY` after session end defined in `exch.yml` -
+    tickers of exchanges not trading on the date are dropped
+
+    Args:
+        univ: universe from `to_universe`
+        dt: date
+
+    Returns:
+        pd.DataFrame: sorted by ready time
+
+    Examples:
+        >>> univ_ = to_universe(['SPY US Equity', '7974 JT Equity', 'TESTTICKER Corp'])
+        >>> schedule(univ_, dt='2018-10-17').loc[:, ['ticker', 'exch', 'ready']]
+                   ticker         exch                     ready
+        1  7974 JT Equity  EquityJapan 2018-10-17 07:45:00+00:00
+        0   SPY US Equity     EquityUS 2018-10-18 01:00:00+00:00
+        >>> schedule(univ_, dt='2018-10-20').shape[0]
+        0
+    """
+    logger = logs.get_logger(schedule, **kwargs)
+
+    ex_info = const.exch_info_many(
+        tickers=univ.ticker.tolist(), ref=dict(zip(univ.ticker, univ.ref)),
+    )
+    for ticker in ex_info.index[ex_info.exch == ''].unique():
+        logger.error(f'cannot find exchange info for {ticker} ...')
+
+    exch, ready = ex_info.exch.tolist(), {}
+    for name in ex_info.exch.unique():
+        if not name: continue
+        # Weekends and holidays of exchange
+        if not sessions.is_trading_day(exch=name, dt=dt):
+            logger.info(f'{name} is not trading on {pd.Timestamp(dt):%Y-%m-%d} ...')
+            continue
+        end_time = sessions.session_time(exch=name, session='allday', dt=dt)[1]
+        ready[name] = end_time + pd.Timedelta(READY_DELAY)
+
+    return (
+        univ
+        .assign(exch=exch)
+        .loc[lambda df: df.exch.isin(list(ready))]
+        .assign(ready=lambda df: df.exch.map(ready))
+        .sort_values('ready', kind='mergesort')
+    )
+
+
+def _warm_(items: list, dt, **kwargs) -> list:
+    """
+    Download and cache intraday bars of many tickers / typs for one date
+    (runs in worker process with its own Bloomberg session) -
+    trials of empty queries are written in one transaction
+
+    Args:
+        items: list of (ticker, typ, ref)
+        dt: date
+
+    Returns:
+        list: number of bars saved for each item - -1 if failed
+    """
+    from xbbg import blp
+
+    logger = logs.get_logger(warm, **kwargs)
+
+    res = []
+    with trials.batch():
+        for ticker, typ, ref in items:
+            job_kw = dict(kwargs, ref=ref) if ref else kwargs
+            try: res.append(blp.bdib(ticker=ticker, dt=dt, typ=typ, **job_kw).shape[0])
+            except Exception as e:
+                logger.error(f'failed to download {ticker} / {typ}: {e}')
+                res.append(-1)
+    return res
+
+
+def chunks(items: list, num: int) -> list:
+    """
+    Split items into at most `num` chunks of similar sizes
+
+    Examples:
+        >>> chunks(list('abcde'), num=2)
+        [['a', 'c', 'e'], ['b', 'd']]
+        >>> chunks(['a'], num=4)
+        [['a']]
+    """
+    return [items[n::num] for n in range(min(num, len(items)))]
+
+
+def warm(univ: pd.DataFrame, dt, workers=4, wait=True, **kwargs) -> pd.DataFrame:
+    """
+    Download and cache intraday bars for universe once markets are finished -
+    tickers ready at the same time are split among workers in batches
+
+    Args:
+        univ: universe from `to_universe`
+        dt: date
+        workers: max number of concurrent downloads (processes)
+        wait: wait for markets to finish - otherwise skip tickers not ready yet
+        **kwargs: other kwargs for `blp.bdib`
+
+    Returns:
+        pd.DataFrame: number of bars saved for each ticker / typ
+    """
+    logger = logs.get_logger(warm, **kwargs)
+
+    jobs = schedule(univ=univ, dt=dt, **kwargs)
+    cached = backends.current().exists_many([
+        storage.bar_file(ticker=ticker, dt=dt, typ=typ)
+        for ticker, typ in jobs[['ticker', 'typ']].itertuples(index=False)
+    ])
+    jobs = jobs.loc[[not c for c in cached]]
+    # Skip keys already tried without data
+    tried = trials.num_trials_many([
+        ('bdib', ticker, dt, typ)
+        for ticker, typ in jobs[['ticker', 'typ']].itertuples(index=False)
+    ])
+    jobs = jobs.loc[[n < trials.MAX_TRIALS for n in tried]]
+    if jobs.empty: return pd.DataFrame(columns=['ticker', 'typ', 'bars'])
+
+    res = []
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = {}
+        for ready, grp in jobs.groupby('ready', sort=True):
+            items = list(grp[['ticker', 'typ', 'ref']].itertuples(index=False, name=None))
+            secs = (ready - pd.Timestamp('now', tz='UTC')).total_seconds()
+            if secs > 0:
+                if not wait:
+                    logger.debug(f'skip {len(items)} tickers - not ready until {ready} ...')
+                    continue
+                logger.info(f'waiting {secs:.0f}s for {len(items)} tickers ...')
+                time.sleep(secs)
+            for chunk in chunks(items, num=workers):
+                futures[pool.submit(_warm_, items=chunk, dt=dt, **kwargs)] = chunk
+
+        for fut in as_completed(futures):
+            chunk = futures[fut]
+            try: bars = fut.result()
+            except Exception as e:
+                logger.error(f'failed to download {len(chunk)} tickers: {e}')
+                bars = [-1] * len(chunk)
+            res.extend(
+                dict(ticker=ticker, typ=typ, bars=num)
+                for (ticker, typ, _), num in zip(chunk, bars)
+            )
+
+    return pd.DataFrame(res, columns=['ticker', 'typ', 'bars'])
+
+
+def run(univ_file: str, dt=None, workers=4, once=False, **kwargs):
+    """
+    Cache warmer - warm given date (default today) and
+    keep warming following business days unless `once` is True
+
+    Args:
+        univ_file: YAML file of universe
+        dt: first date to warm
+        workers: max number of concurrent downloads
+        once: only warm given date
+    """
+    logger = logs.get_logger(run, **kwargs)
+
+    cur_dt = pd.Timestamp('today' if dt is None else dt).normalize()
+    while True:
+        if cur_dt.weekday() < 5:
+            univ = load_universe(univ_file)
+            logger.info(f'warming {univ.shape[0]} tickers for {cur_dt:%Y-%m-%d} ...')
+            res = warm(univ=univ, dt=cur_dt, workers=workers, **kwargs)
+            logger.info(f'saved {(res.bars > 0).sum()} / {res.shape[0]} for {cur_dt:%Y-%m-%d}')
+        if once: break
+        cur_dt += pd.Timedelta('1D')
+
+
+def main():
+
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Warm intraday bar cache after market close')
+    parser.add_argument('univ_file', help='YAML file of universe')
+    parser.add_argument('--dt', default=None, help='first date to warm (default today)')
+    parser.add_argument('--workers', type=int, default=4, help='max concurrent downloads')
+    parser.add_argument('--once', action='store_true', help='only warm given date')
+    parser.add_argument('--log', default='info', help='log level')
+    args = parser.parse_args()
+
+    run(univ_file=args.univ_file, dt=args.dt, workers=args.workers, once=args.once, log=args.log)
+
+
+if __name__ == '__main__':
+
+    # Example:
+    #   python -m xbbg.warm universe.yml --workers=4
+    try:
+        main()
+    except KeyboardInterrupt:
+        pass